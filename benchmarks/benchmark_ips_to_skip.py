@@ -0,0 +1,118 @@
+"""
+Compare the per-line cost of skipping IPs through the `IPS_TO_SKIP` regular expression against the compiled file.
+
+Each variant runs `_dandi_extraction.awk` over the same synthetic log, in which every line is a successful GET of a
+blob (the worst case, since every line reaches the IP check). The skip list holds exact IPs and octet-aligned CIDR
+ranges so that an equivalent regular expression can be written for it, and the outputs of both variants are checked
+to be identical.
+
+Usage: python benchmarks/benchmark_ips_to_skip.py [--lines 200000] [--entries 500] [--awk gawk]
+"""
+
+import argparse
+import os
+import pathlib
+import random
+import subprocess
+import tempfile
+import time
+
+_SCRIPT_FILE_PATH = (
+    pathlib.Path(__file__).parent.parent / "src" / "dandi_s3_log_extraction" / "extractors" / "_dandi_extraction.awk"
+)
+_LINE_TEMPLATE = (
+    "8787a3c41bf7ce0d54359d9348ad5b08e16bd5bb8ae5aa4e1508b435773a066e dandiarchive [01/Jan/2020:05:06:35 +0000] "
+    '{ip} - J42N2W7ET0EC03CV REST.GET.OBJECT blobs/{a}/{b}/{a}{b}73-e224 "GET /blobs/{a}/{b}/{a}{b}73-e224 HTTP/1.1" '
+    '200 - 512 171408 53 52 "-" "-" - DX8oFoKQx0o= - ECDHE-RSA-AES128-GCM-SHA256 - dandiarchive.s3.amazonaws.com '
+    "TLSv1.2 -\n"
+)
+
+
+def _random_ip(*, rng: random.Random) -> str:
+    return ".".join(str(rng.randint(0, 255)) for _ in range(4))
+
+
+def _write_inputs(*, directory: pathlib.Path, number_of_lines: int, number_of_entries: int, seed: int) -> None:
+    rng = random.Random(seed)
+
+    # Half of the entries are exact IPs and the other half are /16 and /24 ranges
+    exact_ips = [_random_ip(rng=rng) for _ in range(number_of_entries // 2)]
+    prefixes = [
+        ".".join(_random_ip(rng=rng).split(".")[: rng.choice([2, 3])]) + "."
+        for _ in range(number_of_entries - len(exact_ips))
+    ]
+    ranges = []
+    for prefix in prefixes:
+        octets = prefix.rstrip(".").split(".")
+        ranges.append(".".join(octets + ["0"] * (4 - len(octets))) + f"/{8 * len(octets)}")
+    (directory / "ips_to_skip.txt").write_text("\n".join(exact_ips + ranges) + "\n")
+
+    escaped_ips = [f"^{ip.replace('.', '\\.')}$" for ip in exact_ips]
+    escaped_prefixes = [f"^{prefix.replace('.', '\\.')}" for prefix in prefixes]
+    (directory / "ips_to_skip_regex.txt").write_text("|".join(escaped_ips + escaped_prefixes))
+
+    # About one line in ten is from a skipped IP
+    skipped_ips = exact_ips + [prefix + ".".join(["7"] * (4 - prefix.count("."))) for prefix in prefixes]
+    with (directory / "log.txt").open(mode="w") as file_stream:
+        for _ in range(number_of_lines):
+            ip = rng.choice(skipped_ips) if rng.random() < 0.1 else _random_ip(rng=rng)
+            file_stream.write(_LINE_TEMPLATE.format(ip=ip, a=f"{rng.randrange(16):03x}", b=f"{rng.randrange(16):03x}"))
+
+
+def _run(*, awk: str, directory: pathlib.Path, name: str, environment_variables: dict[str, str]) -> float:
+    extraction_directory = directory / name
+    extraction_directory.mkdir()
+    env = {**os.environ, "EXTRACTION_DIRECTORY": str(extraction_directory), **environment_variables}
+
+    start = time.perf_counter()
+    subprocess.run(args=[awk, "--file", str(_SCRIPT_FILE_PATH), str(directory / "log.txt")], env=env, check=True)
+    return time.perf_counter() - start
+
+
+def _read_tree(*, directory: pathlib.Path) -> dict[str, bytes]:
+    return {
+        str(file_path.relative_to(directory)): file_path.read_bytes()
+        for file_path in directory.rglob(pattern="*.txt")
+        if file_path.is_file()
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, default=200_000, help="Number of log lines to generate.")
+    parser.add_argument("--entries", type=int, default=500, help="Number of IPs and ranges to skip.")
+    parser.add_argument("--awk", default="gawk", help="The awk executable (must support arrays of arrays).")
+    parser.add_argument("--seed", type=int, default=0)
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="benchmark-ips-to-skip-") as temporary_directory:
+        directory = pathlib.Path(temporary_directory)
+        _write_inputs(
+            directory=directory,
+            number_of_lines=arguments.lines,
+            number_of_entries=arguments.entries,
+            seed=arguments.seed,
+        )
+        regex = (directory / "ips_to_skip_regex.txt").read_text()
+
+        variants = {
+            "none": {"IPS_TO_SKIP_REGEX": ""},
+            "regex": {"IPS_TO_SKIP_REGEX": regex},
+            "file": {"IPS_TO_SKIP_REGEX": "", "IPS_TO_SKIP_FILE_PATH": str(directory / "ips_to_skip.txt")},
+        }
+        durations = {
+            name: _run(awk=arguments.awk, directory=directory, name=name, environment_variables=environment_variables)
+            for name, environment_variables in variants.items()
+        }
+
+        if _read_tree(directory=directory / "regex") != _read_tree(directory=directory / "file"):
+            raise AssertionError("The regular expression and the file of IPs to skip produced different outputs.")
+
+    print(f"{arguments.lines} lines, {arguments.entries} IPs and ranges to skip")
+    for name, duration in durations.items():
+        skip_cost = (duration - durations["none"]) / arguments.lines * 1e9
+        print(f"  {name:>5}: {duration:7.3f} s total, {skip_cost:8.1f} ns per line spent skipping")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,8 +7,13 @@ import typing
 import rich_click
 import s3_log_extraction
 
-from ..extractors import DandiRemoteS3LogAccessExtractor
-from ..summarize import generate_dandiset_summaries
+from ..extractors import (
+    DandiRemoteS3LogAccessExtractor,
+    compact_extraction,
+    convert_to_binary_columns,
+    summarize_extraction_metrics,
+)
+from ..summarize import build_blob_index, generate_approximate_archive_requester_count, generate_dandiset_summaries
 
 
 # dandis3logextraction
@@ -75,6 +80,60 @@ def _dandis3logextraction_cli():
     type=rich_click.Path(exists=True, file_okay=False, dir_okay=True),
     default=None,
 )
+@rich_click.option(
+    "--flush-records",
+    "flush_record_threshold",
+    help=(
+        "Pass the requests of each log file on to the sort of its run file whenever this many are buffered, "
+        "instead of holding the whole file in the extraction script. The requests still reach the extraction "
+        "directory only when the run files are merged."
+    ),
+    required=False,
+    type=rich_click.IntRange(min=1),
+    default=None,
+)
+@rich_click.option(
+    "--flush-bytes",
+    "flush_byte_threshold",
+    help=(
+        "Pass the requests of each log file on to the sort of its run file whenever their buffered output reaches "
+        "this many bytes, instead of holding the whole file in the extraction script. Also caps the memory buffer "
+        "of that sort, which spills the rest to temporary files. The requests still reach the extraction directory "
+        "only when the run files are merged."
+    ),
+    required=False,
+    type=rich_click.IntRange(min=1),
+    default=None,
+)
+@rich_click.option(
+    "--files-per-invocation",
+    help=(
+        "Parse this many log files with each extraction process, instead of starting one process per file. "
+        "Shares the cost of starting the process and reopening the output files across many small logs."
+    ),
+    required=False,
+    type=rich_click.IntRange(min=1),
+    default=1,
+)
+@rich_click.option(
+    "--prefilter",
+    help=(
+        "Discard the lines of each log file that cannot be GET requests of DANDI objects with a fixed-string grep "
+        "before parsing them. The extracted output is identical."
+    ),
+    is_flag=True,
+    default=False,
+)
+@rich_click.option(
+    "--range-size",
+    help=(
+        "Split log files larger than this many bytes into ranges on line boundaries, each parsed by its own worker. "
+        "The extracted lines of each object remain in the order of the original log file."
+    ),
+    required=False,
+    type=rich_click.IntRange(min=1),
+    default=None,
+)
 def _extract_cli(
     directory: str,
     limit: int | None = None,
@@ -82,6 +141,11 @@ def _extract_cli(
     cache_directory: str | None = None,
     mode: typing.Literal["remote"] | None = None,
     inventory_directory: str | None = None,
+    flush_record_threshold: int | None = None,
+    flush_byte_threshold: int | None = None,
+    files_per_invocation: int = 1,
+    prefilter: bool = False,
+    range_size: int | None = None,
 ) -> None:
     """
     Extract S3 log access data from the specified directory.
@@ -94,7 +158,14 @@ def _extract_cli(
     cache_path = pathlib.Path(cache_directory) if cache_directory is not None else None
     match mode:
         case "remote":
-            extractor = DandiRemoteS3LogAccessExtractor(cache_directory=cache_path)
+            extractor = DandiRemoteS3LogAccessExtractor(
+                cache_directory=cache_path,
+                flush_record_threshold=flush_record_threshold,
+                flush_byte_threshold=flush_byte_threshold,
+                files_per_invocation=files_per_invocation,
+                prefilter=prefilter,
+                range_size=range_size,
+            )
             extractor.extract_s3_bucket(
                 s3_root=directory,
                 limit=limit,
@@ -136,6 +207,130 @@ def _stop_extraction_cli(max_timeout_in_seconds: int = 600) -> None:
     s3_log_extraction.extractors.stop_extraction(max_timeout_in_seconds=max_timeout_in_seconds)
 
 
+# dandis3logextraction convert
+@_dandis3logextraction_cli.command(name="convert")
+@rich_click.option(
+    "--workers",
+    help=(
+        "The maximum number of workers to use for parallel processing. "
+        "Allows negative slicing semantics, where -1 means all available cores, -2 means all but one, etc. "
+        "By default, all but one core is used."
+    ),
+    required=False,
+    type=rich_click.IntRange(min=-os.cpu_count() + 1, max=os.cpu_count()),
+    default=-2,
+)
+@rich_click.option(
+    "--cache",
+    "cache_directory",
+    help=(
+        "Use a non-default cache directory for this conversion run only. "
+        "This overrides the configured cache directory without modifying saved config."
+    ),
+    required=False,
+    type=rich_click.Path(writable=True, file_okay=False, dir_okay=True),
+    default=None,
+)
+def _convert_cli(workers: int = -2, cache_directory: str | None = None) -> None:
+    """
+    Convert the extracted text columns into the compact binary layout read by the summaries.
+
+    Should not be run while an extraction or summary generation is in progress on the same cache.
+    """
+    convert_to_binary_columns(cache_directory=cache_directory, workers=workers)
+
+
+# dandis3logextraction compact
+@_dandis3logextraction_cli.command(name="compact")
+@rich_click.option(
+    "--workers",
+    help=(
+        "The maximum number of workers to use for parallel processing. "
+        "Allows negative slicing semantics, where -1 means all available cores, -2 means all but one, etc. "
+        "By default, all but one core is used."
+    ),
+    required=False,
+    type=rich_click.IntRange(min=-os.cpu_count() + 1, max=os.cpu_count()),
+    default=-2,
+)
+@rich_click.option(
+    "--cache",
+    "cache_directory",
+    help=(
+        "Use a non-default cache directory for this compaction run only. "
+        "This overrides the configured cache directory without modifying saved config."
+    ),
+    required=False,
+    type=rich_click.Path(writable=True, file_okay=False, dir_okay=True),
+    default=None,
+)
+def _compact_cli(workers: int = -2, cache_directory: str | None = None) -> None:
+    """
+    Rewrite the extracted rows of each blob into a time-sorted archive of compressed column chunks.
+
+    Rows extracted afterwards are appended as text and read together with the archive by the summaries until the next
+    compaction. Should not be run while an extraction, conversion, or summary generation is in progress on the same
+    cache.
+    """
+    compact_extraction(cache_directory=cache_directory, workers=workers)
+
+
+# dandis3logextraction index
+@_dandis3logextraction_cli.command(name="index")
+@rich_click.option(
+    "--cache",
+    "cache_directory",
+    help=(
+        "Use a non-default cache directory for this indexing run only. "
+        "This overrides the configured cache directory without modifying saved config."
+    ),
+    required=False,
+    type=rich_click.Path(writable=True, file_okay=False, dir_okay=True),
+    default=None,
+)
+def _index_cli(cache_directory: str | None = None) -> None:
+    """
+    Build the index of extracted objects of a cache from a walk of its extraction directory.
+
+    The extraction keeps the index up to date from then on, and the summaries use it to find the extracted objects
+    instead of walking the extraction directory. Only needed once for a cache extracted before the index existed.
+    Should not be run while an extraction is in progress on the same cache.
+    """
+    build_blob_index(cache_directory=cache_directory)
+
+
+# dandis3logextraction metrics
+@_dandis3logextraction_cli.command(name="metrics")
+@rich_click.option(
+    "--slowest",
+    "number_of_slowest",
+    help="The number of units of work with the longest wall time to list.",
+    required=False,
+    type=rich_click.IntRange(min=0),
+    default=10,
+)
+@rich_click.option(
+    "--cache",
+    "cache_directory",
+    help=(
+        "Use a non-default cache directory for this report only. "
+        "This overrides the configured cache directory without modifying saved config."
+    ),
+    required=False,
+    type=rich_click.Path(file_okay=False, dir_okay=True),
+    default=None,
+)
+def _metrics_cli(number_of_slowest: int = 10, cache_directory: str | None = None) -> None:
+    """
+    Report the throughput of the extraction runs recorded in the cache.
+
+    Includes the overall rates per worker, the percentiles of the time and rates of each unit of work (a log file, a
+    group of log files, or a byte range of a split log file), and the slowest units.
+    """
+    report = summarize_extraction_metrics(cache_directory=cache_directory, number_of_slowest=number_of_slowest)
+    rich_click.echo(message=report)
+
+
 # dandis3logextraction update
 @_dandis3logextraction_cli.group(name="update")
 def _update_cli() -> None:
@@ -183,8 +378,9 @@ def _update_cli() -> None:
 @rich_click.option(
     "--content-id-to-usage-dandiset-path-url",
     help=(
-        "URL to retrieve the mapping of content IDs to Dandiset paths. "
-        "Defaults to the pre-generated mapping stored in the `dandi-cache` GitHub repository."
+        "URL to retrieve the mapping of content IDs to Dandiset paths, or a local path (or `file://` URL) to a copy. "
+        "Defaults to the pre-generated mapping stored in the `dandi-cache` GitHub repository. "
+        "The mapping is kept in the cache and only downloaded again once it changes."
     ),
     required=False,
     type=rich_click.STRING,
@@ -207,6 +403,54 @@ def _update_cli() -> None:
     is_flag=True,
     default=False,
 )
+@rich_click.option(
+    "--full-reparse",
+    help=(
+        "Whether to ignore the per-blob state remembered by previous runs and parse every extracted file in full. "
+        "By default, only the activity appended since the previous run is parsed."
+    ),
+    required=False,
+    is_flag=True,
+    default=False,
+)
+@rich_click.option(
+    "--incremental",
+    help=(
+        "Whether to only regenerate the summaries of Dandisets whose assets were appended to by extraction "
+        "since the previous complete run, as recorded in the extraction journal."
+    ),
+    required=False,
+    is_flag=True,
+    default=False,
+)
+@rich_click.option(
+    "--approximate-requester-counts",
+    help=(
+        "Whether to estimate unique requester counts from mergeable HyperLogLog sketches instead of exact sets of IPs. "
+        "With --mode archive, also writes the archive-wide count from the union of the sketches of every Dandiset."
+    ),
+    required=False,
+    is_flag=True,
+    default=False,
+)
+@rich_click.option(
+    "--offline",
+    help=(
+        "Whether to run without network access, using the content ID mapping kept in the cache. "
+        "The Dandisets to summarize are then those of the mapping instead of those listed by the DANDI API."
+    ),
+    required=False,
+    is_flag=True,
+    default=False,
+)
+@rich_click.option(
+    "--dandiset-listing-max-age",
+    "dandiset_listing_max_age_hours",
+    help="The number of hours for which the list of Dandisets from the DANDI API is reused from the cache.",
+    required=False,
+    type=rich_click.FloatRange(min=0),
+    default=24.0,
+)
 @rich_click.option(
     "--cache",
     "cache_directory",
@@ -226,6 +470,11 @@ def _update_summaries_cli(
     content_id_to_usage_dandiset_path_url: str | None = None,
     api_url: str | None = None,
     unassociated: bool = False,
+    full_reparse: bool = False,
+    incremental: bool = False,
+    approximate_requester_counts: bool = False,
+    offline: bool = False,
+    dandiset_listing_max_age_hours: float = 24.0,
     cache_directory: str | None = None,
 ) -> None:
     """Generate condensed summaries of activity."""
@@ -233,6 +482,9 @@ def _update_summaries_cli(
         case "archive":
             # TODO: replace with error message instructing user to use s3logextraction directly
             s3_log_extraction.summarize.generate_archive_summaries(cache_directory=cache_directory)
+
+            if approximate_requester_counts:
+                generate_approximate_archive_requester_count(cache_directory=cache_directory)
         case _:
             pick_as_list = pick.split(",") if pick is not None else None
             skip_as_list = skip.split(",") if skip is not None else None
@@ -243,5 +495,10 @@ def _update_summaries_cli(
                 content_id_to_usage_dandiset_path_url=content_id_to_usage_dandiset_path_url,
                 api_url=api_url,
                 unassociated=unassociated,
+                full_reparse=full_reparse,
+                incremental=incremental,
+                approximate_requester_counts=approximate_requester_counts,
+                offline=offline,
+                dandiset_listing_max_age_hours=dandiset_listing_max_age_hours,
                 cache_directory=cache_directory,
             )
@@ -0,0 +1,101 @@
+import collections.abc
+import json
+import os
+import pathlib
+
+# Each extraction process appends the object keys it touched to its own file within this subdirectory of `records`
+# so that concurrent workers never interleave partial lines
+_JOURNAL_DIRECTORY_NAME = "extraction-journal"
+
+# Each kind of incremental summary run saves how far it has read every journal file to its own file in this
+# subdirectory of the cache
+_JOURNAL_CURSOR_DIRECTORY_NAME = "journal-cursors"
+
+
+def _get_journal_file_path(*, records_directory: pathlib.Path) -> pathlib.Path:
+    journal_directory = records_directory / _JOURNAL_DIRECTORY_NAME
+    journal_directory.mkdir(parents=True, exist_ok=True)
+    return journal_directory / f"{os.getpid()}.txt"
+
+
+def _append_journal(*, records_directory: pathlib.Path, object_keys: collections.abc.Iterable[str]) -> None:
+    """Record the keys of objects whose appended rows are now in the extraction directory."""
+    content = "".join(f"{object_key}\n" for object_key in object_keys)
+    if content == "":
+        return
+
+    with _get_journal_file_path(records_directory=records_directory).open(mode="a") as file_stream:
+        file_stream.write(content)
+
+
+def _prune_journal(*, cache_directory: pathlib.Path) -> None:
+    """
+    Remove the journal files that every saved cursor has read to the end, along with their offsets in the cursors.
+
+    Only safe while no extraction is appending to the journal. A kind of summary whose cursor was never saved has
+    no previous run to be incremental to, so it does not hold back the pruning.
+    """
+    journal_directory = cache_directory / "records" / _JOURNAL_DIRECTORY_NAME
+    cursor_file_paths = sorted((cache_directory / _JOURNAL_CURSOR_DIRECTORY_NAME).glob(pattern="*.json"))
+    if not journal_directory.exists() or len(cursor_file_paths) == 0:
+        return
+
+    cursor_file_path_to_offsets = {
+        cursor_file_path: json.loads(cursor_file_path.read_text()) for cursor_file_path in cursor_file_paths
+    }
+    pruned_file_names = set()
+    for journal_file_path in journal_directory.glob(pattern="*.txt"):
+        size = journal_file_path.stat().st_size
+        if all(offsets.get(journal_file_path.name, 0) >= size for offsets in cursor_file_path_to_offsets.values()):
+            journal_file_path.unlink()
+            pruned_file_names.add(journal_file_path.name)
+
+    # A later process with the same ID then starts its journal file from the beginning of every cursor
+    for cursor_file_path, offsets in cursor_file_path_to_offsets.items():
+        if pruned_file_names.isdisjoint(offsets):
+            continue
+
+        remaining_offsets = {name: offset for name, offset in offsets.items() if name not in pruned_file_names}
+        _save_journal_cursor(cursor_file_path=cursor_file_path, offsets=remaining_offsets)
+
+
+def _read_journal(*, cache_directory: pathlib.Path, cursor_file_path: pathlib.Path) -> tuple[set[str], dict[str, int]]:
+    """
+    Read the object keys appended to the extraction journal since the offsets recorded in the cursor file.
+
+    Returns
+    -------
+    object_keys : set of str
+        The object keys (relative to the extraction directory) touched since the cursor was last saved.
+    offsets : dict of str to int
+        The offset just past the last complete line of each journal file, to be saved once the keys are processed.
+    """
+    journal_directory = cache_directory / "records" / _JOURNAL_DIRECTORY_NAME
+    offsets = json.loads(cursor_file_path.read_text()) if cursor_file_path.exists() else dict()
+
+    object_keys: set[str] = set()
+    if not journal_directory.exists():
+        return object_keys, offsets
+
+    for journal_file_path in sorted(journal_directory.glob(pattern="*.txt")):
+        offset = offsets.get(journal_file_path.name, 0)
+        if journal_file_path.stat().st_size < offset:
+            offset = 0  # The journal was reset since the cursor was saved
+
+        with journal_file_path.open(mode="rb") as file_stream:
+            file_stream.seek(offset)
+            content = file_stream.read()
+
+        # A line still being written by a running extraction is left for the next read
+        complete_content = content[: content.rfind(b"\n") + 1]
+        object_keys.update(complete_content.decode().splitlines())
+        offsets[journal_file_path.name] = offset + len(complete_content)
+
+    return object_keys, offsets
+
+
+def _save_journal_cursor(*, cursor_file_path: pathlib.Path, offsets: dict[str, int]) -> None:
+    cursor_file_path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_file_path = cursor_file_path.with_name(f"{cursor_file_path.name}.tmp")
+    temporary_file_path.write_text(json.dumps(offsets, sort_keys=True))
+    os.replace(src=temporary_file_path, dst=cursor_file_path)
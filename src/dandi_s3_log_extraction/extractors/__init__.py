@@ -1,7 +1,13 @@
+from ._compact_extraction import compact_extraction
+from ._convert_to_binary_columns import convert_to_binary_columns
 from ._dandi_s3_log_access_extractor import DandiS3LogAccessExtractor
 from ._dandi_remote_s3_log_access_extractor import DandiRemoteS3LogAccessExtractor
+from ._extraction_metrics import summarize_extraction_metrics
 
 __all__ = [
     "DandiS3LogAccessExtractor",
     "DandiRemoteS3LogAccessExtractor",
+    "compact_extraction",
+    "convert_to_binary_columns",
+    "summarize_extraction_metrics",
 ]
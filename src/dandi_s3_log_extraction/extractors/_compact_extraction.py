@@ -0,0 +1,207 @@
+import concurrent.futures
+import pathlib
+
+import numpy
+import s3_log_extraction
+import tqdm
+from beartype import beartype
+
+from ._convert_to_binary_columns import _read_text_rows, _recover_pending_conversion
+from .._parallel._utils import _handle_max_workers
+from ..summarize._columns import (
+    _BINARY_COLUMN_FILE_NAMES_AND_DTYPES,
+    _COMPACTED_FILE_NAME,
+    _IP_DICTIONARY_FILE_NAME,
+    _iterate_compacted_chunks,
+    _read_binary_columns,
+    _read_compacted_ip_dictionary,
+)
+from ..summarize._rollups import _COLUMN_FILE_NAMES
+
+# Rows per chunk of the archive, which bounds the memory used to decompress a column while summarizing
+_COMPACTED_CHUNK_ROWS = 1_000_000
+# The new archive is written in full under this name before it replaces the previous one
+_TEMPORARY_COMPACTED_FILE_NAME = f"{_COMPACTED_FILE_NAME}.tmp"
+# Marks that the new archive is complete, so that the rows it replaces are to be removed on recovery
+_PENDING_COMPACTION_FILE_NAME = ".compaction-pending"
+
+
+@beartype
+def compact_extraction(*, cache_directory: str | pathlib.Path | None = None, workers: int = -2) -> None:
+    """
+    Rewrite the rows of every extracted blob into a single time-sorted archive of compressed column chunks.
+
+    The rows of the previous archive of a blob, its binary columns, and its text columns are sorted together by time
+    and stored in `compacted.npz` as chunks of zlib-compressed columns: the seconds elapsed since the previous request,
+    the bytes sent, an index into the distinct IPs of the blob, and the download flag. The binary and text columns are
+    removed once the archive replaces the previous one. Extraction keeps appending text rows, which the summaries read
+    after the archive and which can be compacted again by a later call.
+
+    Each blob is held in memory while it is compacted, at about 21 bytes per request.
+    This should not run while an extraction, conversion, or summary generation is in progress on the same cache.
+
+    Parameters
+    ----------
+    cache_directory : pathlib.Path
+        Path to the folder containing all previously extracted S3 access logs.
+        If `None`, the default cache directory from the configuration will be used.
+    workers : int
+        Number of workers to use for parallel processing.
+        If -1, use all available cores. If -2, use all cores minus one.
+    """
+    cache_directory = (
+        pathlib.Path(cache_directory) if cache_directory is not None else s3_log_extraction.config.get_cache_directory()
+    )
+    extraction_directory = cache_directory / "extraction"
+    max_workers = _handle_max_workers(workers=workers)
+
+    # Only blobs with rows outside of their archive have anything to compact
+    blob_directories = sorted(
+        {file_path.parent for file_path in extraction_directory.rglob(pattern=_COLUMN_FILE_NAMES[0])}
+        | {
+            file_path.parent
+            for file_path in extraction_directory.rglob(pattern=_BINARY_COLUMN_FILE_NAMES_AND_DTYPES[0][0])
+        }
+        | {file_path.parent for file_path in extraction_directory.rglob(pattern=_PENDING_COMPACTION_FILE_NAME)}
+    )
+    tqdm_style_kwargs = {
+        "total": len(blob_directories),
+        "desc": "Compacting blobs",
+        "unit": "blobs",
+        "smoothing": 0,
+    }
+    if max_workers == 1:
+        for blob_directory in tqdm.tqdm(iterable=blob_directories, **tqdm_style_kwargs):
+            _compact_blob(blob_directory=blob_directory)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_compact_blob, blob_directory=blob_directory) for blob_directory in blob_directories]
+        for future in tqdm.tqdm(iterable=concurrent.futures.as_completed(futures), **tqdm_style_kwargs):
+            future.result()
+
+
+def _compact_blob(*, blob_directory: pathlib.Path) -> bool:
+    """
+    Merge the archived, binary, and text rows of a blob into a new archive, then remove the binary and text columns.
+
+    Returns whether the blob was compacted; blobs without rows outside of their archive, or whose text columns are not
+    all complete rows, are left unchanged.
+    """
+    _recover_pending_conversion(blob_directory=blob_directory)
+    _recover_pending_compaction(blob_directory=blob_directory)
+
+    has_text_columns = any((blob_directory / file_name).exists() for file_name in _COLUMN_FILE_NAMES)
+    text_rows = _read_text_rows(blob_directory=blob_directory) if has_text_columns else None
+    if has_text_columns and text_rows is None:
+        return False
+    if text_rows is None:
+        text_rows = (
+            numpy.empty(shape=0, dtype=numpy.int64),
+            numpy.empty(shape=0, dtype=numpy.uint64),
+            numpy.empty(shape=0, dtype="S1"),
+            numpy.empty(shape=0, dtype=numpy.uint8),
+        )
+    *binary_columns, binary_ip_dictionary = _read_binary_columns(blob_directory=blob_directory)
+    if text_rows[1].size == 0 and binary_columns[1].size == 0:
+        return False
+
+    # Every IP is first located in the sorted union of the dictionaries and the IPs of the text rows
+    compacted_ip_dictionary = _read_compacted_ip_dictionary(blob_directory=blob_directory)
+    unique_ips = numpy.unique(numpy.concatenate((compacted_ip_dictionary, binary_ip_dictionary, text_rows[2])))
+    compacted_positions = numpy.searchsorted(unique_ips, compacted_ip_dictionary)
+    binary_positions = numpy.searchsorted(unique_ips, binary_ip_dictionary)
+
+    parts = [
+        (chunk_epoch_seconds, chunk_bytes_sent, compacted_positions[chunk_ip_indices], chunk_downloads)
+        for chunk_epoch_seconds, chunk_bytes_sent, chunk_ip_indices, chunk_downloads in _iterate_compacted_chunks(
+            blob_directory=blob_directory
+        )
+    ]
+    parts.append((binary_columns[0], binary_columns[1], binary_positions[binary_columns[2]], binary_columns[3]))
+    parts.append((text_rows[0], text_rows[1], numpy.searchsorted(unique_ips, text_rows[2]), text_rows[3]))
+    epoch_seconds, bytes_sent, ip_positions, downloads = (numpy.concatenate(column) for column in zip(*parts))
+
+    # The new dictionary only holds the IPs still in use, in the order in which they were first extracted (which the
+    # summaries preserve); the previous dictionary is already in that order and precedes every row outside of it
+    used_positions, first_indices, inverse = numpy.unique(
+        numpy.concatenate((compacted_positions, ip_positions)), return_index=True, return_inverse=True
+    )
+    first_appearance_order = numpy.argsort(first_indices, kind="stable")
+    ip_dictionary = unique_ips[used_positions[first_appearance_order]]
+    dictionary_indices = numpy.empty(shape=used_positions.size, dtype=numpy.int64)
+    dictionary_indices[first_appearance_order] = numpy.arange(used_positions.size)
+    ip_indices = dictionary_indices[inverse[compacted_positions.size :]]
+
+    # Requests at the same second keep the order in which they were extracted
+    order = numpy.argsort(epoch_seconds, kind="stable")
+    _write_compacted_archive(
+        file_path=blob_directory / _TEMPORARY_COMPACTED_FILE_NAME,
+        epoch_seconds=epoch_seconds[order],
+        bytes_sent=bytes_sent[order],
+        ip_indices=ip_indices[order],
+        downloads=downloads[order],
+        ip_dictionary=ip_dictionary,
+    )
+
+    # Replacing the archive is the point at which the compaction is complete (see `_recover_pending_compaction`)
+    (blob_directory / _PENDING_COMPACTION_FILE_NAME).touch()
+    (blob_directory / _TEMPORARY_COMPACTED_FILE_NAME).replace(target=blob_directory / _COMPACTED_FILE_NAME)
+    _remove_compacted_columns(blob_directory=blob_directory)
+    (blob_directory / _PENDING_COMPACTION_FILE_NAME).unlink()
+
+    return True
+
+
+def _write_compacted_archive(
+    *,
+    file_path: pathlib.Path,
+    epoch_seconds: numpy.ndarray,
+    bytes_sent: numpy.ndarray,
+    ip_indices: numpy.ndarray,
+    downloads: numpy.ndarray,
+    ip_dictionary: numpy.ndarray,
+) -> None:
+    """Write time-sorted rows as chunks of delta-encoded timestamps and columns of the narrowest sufficient type."""
+    ip_index_dtype = numpy.min_scalar_type(max(ip_dictionary.size - 1, 0))
+
+    chunk_starts = numpy.arange(0, epoch_seconds.size, _COMPACTED_CHUNK_ROWS)
+    chunks = dict()
+    for index, start in enumerate(chunk_starts.tolist()):
+        chunk = slice(start, start + _COMPACTED_CHUNK_ROWS)
+        deltas = numpy.diff(epoch_seconds[chunk], prepend=epoch_seconds[start])
+        chunks[f"epoch_second_deltas_{index}"] = deltas.astype(numpy.min_scalar_type(int(deltas.max())))
+        chunks[f"bytes_sent_{index}"] = bytes_sent[chunk].astype(numpy.uint64)
+        chunks[f"ip_indices_{index}"] = ip_indices[chunk].astype(ip_index_dtype)
+        chunks[f"download_{index}"] = downloads[chunk].astype(numpy.uint8)
+
+    with file_path.open(mode="wb") as file_stream:
+        numpy.savez_compressed(
+            file_stream,
+            chunk_first_epoch_seconds=epoch_seconds[chunk_starts].astype(numpy.int64),
+            chunk_sizes=numpy.diff(numpy.append(chunk_starts, epoch_seconds.size)).astype(numpy.int64),
+            ip_dictionary=ip_dictionary,
+            **chunks,
+        )
+
+
+def _recover_pending_compaction(*, blob_directory: pathlib.Path) -> None:
+    """
+    Resolve a compaction that was interrupted.
+
+    If the new archive was not yet moved into place, it is discarded along with the previous rows kept as they were;
+    otherwise, the removal of the binary and text columns that it replaced is finished.
+    """
+    temporary_compacted_file_path = blob_directory / _TEMPORARY_COMPACTED_FILE_NAME
+    pending_compaction_file_path = blob_directory / _PENDING_COMPACTION_FILE_NAME
+    if pending_compaction_file_path.exists() and not temporary_compacted_file_path.exists():
+        _remove_compacted_columns(blob_directory=blob_directory)
+
+    temporary_compacted_file_path.unlink(missing_ok=True)
+    pending_compaction_file_path.unlink(missing_ok=True)
+
+
+def _remove_compacted_columns(*, blob_directory: pathlib.Path) -> None:
+    binary_column_file_names = [file_name for file_name, _ in _BINARY_COLUMN_FILE_NAMES_AND_DTYPES]
+    for file_name in (*_COLUMN_FILE_NAMES, *binary_column_file_names, _IP_DICTIONARY_FILE_NAME):
+        (blob_directory / file_name).unlink(missing_ok=True)
@@ -0,0 +1,186 @@
+import concurrent.futures
+import os
+import pathlib
+
+import numpy
+import s3_log_extraction
+import tqdm
+from beartype import beartype
+
+from .._parallel._utils import _handle_max_workers
+from ..summarize._columns import (
+    _BINARY_COLUMN_FILE_NAMES_AND_DTYPES,
+    _IP_DICTIONARY_FILE_NAME,
+    _count_binary_rows,
+    _parse_epoch_seconds,
+    _parse_integer_column,
+    _parse_ip_column,
+    _read_ip_dictionary,
+)
+from ..summarize._rollups import _COLUMN_FILE_NAMES
+
+# Holds the number of binary rows from before an unfinished conversion, which are the only ones to keep on recovery
+_PENDING_CONVERSION_FILE_NAME = ".binary-conversion-pending"
+
+
+@beartype
+def convert_to_binary_columns(*, cache_directory: str | pathlib.Path | None = None, workers: int = -2) -> None:
+    """
+    Move the rows of the text column files of every extracted blob into the compact binary layout.
+
+    Each request is stored as a little-endian uint32 of seconds since the epoch, a uint64 of bytes sent, a uint32
+    index into the distinct IPs of the blob (`ip_dictionary.txt`), and a uint8 download flag. The summaries read these
+    columns through memory maps instead of parsing text, and the text column files are removed once their rows are
+    converted. Extraction keeps appending text rows, which can be converted again by a later call.
+
+    This should not run while an extraction or summary generation is in progress on the same cache.
+
+    Parameters
+    ----------
+    cache_directory : pathlib.Path
+        Path to the folder containing all previously extracted S3 access logs.
+        If `None`, the default cache directory from the configuration will be used.
+    workers : int
+        Number of workers to use for parallel processing.
+        If -1, use all available cores. If -2, use all cores minus one.
+    """
+    cache_directory = (
+        pathlib.Path(cache_directory) if cache_directory is not None else s3_log_extraction.config.get_cache_directory()
+    )
+    extraction_directory = cache_directory / "extraction"
+    max_workers = _handle_max_workers(workers=workers)
+
+    blob_directories = [file_path.parent for file_path in extraction_directory.rglob(pattern=_COLUMN_FILE_NAMES[0])]
+    tqdm_style_kwargs = {
+        "total": len(blob_directories),
+        "desc": "Converting blobs to binary columns",
+        "unit": "blobs",
+        "smoothing": 0,
+    }
+    if max_workers == 1:
+        for blob_directory in tqdm.tqdm(iterable=blob_directories, **tqdm_style_kwargs):
+            _convert_blob_to_binary_columns(blob_directory=blob_directory)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(_convert_blob_to_binary_columns, blob_directory=blob_directory)
+            for blob_directory in blob_directories
+        ]
+        for future in tqdm.tqdm(iterable=concurrent.futures.as_completed(futures), **tqdm_style_kwargs):
+            future.result()
+
+
+def _convert_blob_to_binary_columns(*, blob_directory: pathlib.Path) -> bool:
+    """
+    Append the rows of the text columns of a blob to its binary columns, then remove the text columns.
+
+    Returns whether the blob was converted; blobs whose text columns are not all complete rows are left unchanged.
+    """
+    _recover_pending_conversion(blob_directory=blob_directory)
+
+    text_rows = _read_text_rows(blob_directory=blob_directory)
+    if text_rows is None:
+        return False
+    epoch_seconds, bytes_sent, ips, downloads = text_rows
+
+    ip_dictionary_file_path = blob_directory / _IP_DICTIONARY_FILE_NAME
+    ip_indices, new_ips = _encode_ips(ips=ips, ip_dictionary=_read_ip_dictionary(file_path=ip_dictionary_file_path))
+
+    # New IPs are recorded first, since an unused entry of the dictionary is harmless
+    if new_ips.size > 0:
+        with ip_dictionary_file_path.open(mode="ab") as file_stream:
+            file_stream.write(b"".join(ip + b"\n" for ip in new_ips.tolist()))
+
+    pending_conversion_file_path = blob_directory / _PENDING_CONVERSION_FILE_NAME
+    pending_conversion_file_path.write_text(str(_count_binary_rows(blob_directory=blob_directory)))
+    for (file_name, dtype), column in zip(
+        _BINARY_COLUMN_FILE_NAMES_AND_DTYPES, (epoch_seconds, bytes_sent, ip_indices, downloads)
+    ):
+        with (blob_directory / file_name).open(mode="ab") as file_stream:
+            file_stream.write(column.astype(dtype).tobytes())
+
+    # Removing the timestamps is the point at which the conversion is complete (see `_recover_pending_conversion`)
+    for file_name in _COLUMN_FILE_NAMES:
+        (blob_directory / file_name).unlink(missing_ok=True)
+    pending_conversion_file_path.unlink()
+
+    return True
+
+
+def _read_text_rows(
+    *, blob_directory: pathlib.Path
+) -> tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray] | None:
+    """
+    Parse the text columns of a blob into epoch seconds, bytes sent, IPs, and download flags, one entry per row.
+
+    Returns `None` if the timestamps, bytes sent, or IPs are missing, or if the columns are not all complete rows.
+    """
+    contents: list[bytes | None] = []
+    for file_name in _COLUMN_FILE_NAMES:
+        file_path = blob_directory / file_name
+        contents.append(file_path.read_bytes() if file_path.exists() else None)
+    timestamps_content, bytes_sent_content, ips_content, download_content = contents
+
+    if timestamps_content is None or bytes_sent_content is None or ips_content is None:
+        return None
+    present_contents = [content for content in contents if content is not None]
+    line_counts = {content.count(b"\n") for content in present_contents}
+    if len(line_counts) != 1 or any(content and not content.endswith(b"\n") for content in present_contents):
+        return None
+
+    epoch_seconds = _parse_epoch_seconds(content=timestamps_content)
+    bytes_sent = _parse_integer_column(content=bytes_sent_content, dtype=numpy.uint64)
+    downloads = (
+        _parse_integer_column(content=download_content, dtype=numpy.uint8)
+        if download_content is not None
+        else numpy.zeros(shape=bytes_sent.size, dtype=numpy.uint8)
+    )
+    return epoch_seconds, bytes_sent, _parse_ip_column(content=ips_content), downloads
+
+
+def _recover_pending_conversion(*, blob_directory: pathlib.Path) -> None:
+    """
+    Resolve a conversion that was interrupted.
+
+    If the text timestamps still exist, the conversion had not completed and the binary rows it appended are
+    discarded; otherwise, the removal of the remaining text columns is finished.
+    """
+    pending_conversion_file_path = blob_directory / _PENDING_CONVERSION_FILE_NAME
+    if not pending_conversion_file_path.exists():
+        return
+
+    if (blob_directory / _COLUMN_FILE_NAMES[0]).exists():
+        number_of_rows = int(pending_conversion_file_path.read_text() or 0)
+        for file_name, dtype in _BINARY_COLUMN_FILE_NAMES_AND_DTYPES:
+            file_path = blob_directory / file_name
+            if file_path.exists():
+                os.truncate(path=file_path, length=number_of_rows * dtype.itemsize)
+    else:
+        for file_name in _COLUMN_FILE_NAMES[1:]:
+            (blob_directory / file_name).unlink(missing_ok=True)
+    pending_conversion_file_path.unlink()
+
+
+def _encode_ips(*, ips: numpy.ndarray, ip_dictionary: numpy.ndarray) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    Map each IP to its index in the dictionary of the blob.
+
+    Returns the indices and the IPs to append to the dictionary, in order of first appearance.
+    """
+    unique_ips, first_indices, inverse = numpy.unique(ips, return_index=True, return_inverse=True)
+
+    unique_indices = numpy.empty(shape=unique_ips.size, dtype=numpy.int64)
+    is_known = numpy.zeros(shape=unique_ips.size, dtype=bool)
+    if ip_dictionary.size > 0:
+        dictionary_order = numpy.argsort(ip_dictionary, kind="stable")
+        sorted_dictionary = ip_dictionary[dictionary_order]
+        positions = numpy.minimum(numpy.searchsorted(sorted_dictionary, unique_ips), sorted_dictionary.size - 1)
+        is_known = sorted_dictionary[positions] == unique_ips
+        unique_indices[is_known] = dictionary_order[positions[is_known]]
+
+    new_positions = numpy.flatnonzero(~is_known)
+    new_positions = new_positions[numpy.argsort(first_indices[new_positions], kind="stable")]
+    unique_indices[new_positions] = ip_dictionary.size + numpy.arange(new_positions.size)
+
+    return unique_indices[inverse], unique_ips[new_positions]
@@ -7,12 +7,50 @@ BEGIN {
     }
     IPS_TO_SKIP_REGEX = ENVIRON["IPS_TO_SKIP_REGEX"]
 
+    # Optional: a file of IPs and IPv4 CIDR ranges to skip, compiled into exact and octet-prefix lookups
+    IPS_TO_SKIP_FILE_PATH = ("IPS_TO_SKIP_FILE_PATH" in ENVIRON) ? ENVIRON["IPS_TO_SKIP_FILE_PATH"] : ""
+    MAXIMUM_SKIPPED_PREFIX_OCTETS = 0
+    if (IPS_TO_SKIP_FILE_PATH != "") {
+        load_ips_to_skip(IPS_TO_SKIP_FILE_PATH)
+    }
+
     if (!("EXTRACTION_DIRECTORY" in ENVIRON)) {
         print "Environment variable 'EXTRACTION_DIRECTORY' is not set" > "/dev/stderr"
         exit 1
     }
     EXTRACTION_DIRECTORY = ENVIRON["EXTRACTION_DIRECTORY"] "/"
 
+    # Optional: record each object key appended to during this run (the keys of a run file are journaled by its merge)
+    JOURNAL_FILE_PATH = ("JOURNAL_FILE_PATH" in ENVIRON) ? ENVIRON["JOURNAL_FILE_PATH"] : ""
+
+    # Optional: write the buffered requests out (to their column files, or to the sort of the run file) whenever
+    # either threshold is reached, so that the buffers of the script stay bounded regardless of the size of the log
+    # file (zero buffers the whole file)
+    FLUSH_RECORD_THRESHOLD = ("FLUSH_RECORD_THRESHOLD" in ENVIRON) ? ENVIRON["FLUSH_RECORD_THRESHOLD"] + 0 : 0
+    FLUSH_BYTE_THRESHOLD = ("FLUSH_BYTE_THRESHOLD" in ENVIRON) ? ENVIRON["FLUSH_BYTE_THRESHOLD"] + 0 : 0
+    number_of_buffered_records = 0
+    number_of_buffered_bytes = 0
+    number_of_kept_lines = 0
+
+    # DANDI object keys never contain whitespace or quotes, so one path per line is safe to pass through xargs
+    MKDIR_COMMAND = "xargs mkdir -p"
+
+    # Optional: instead of appending to the column files of each object, write every request as one tab-separated
+    # line of a single run file sorted by object key, which is merged into the extraction directory afterwards
+    # The sort is stable so that the requests of each object keep the order in which they were buffered
+    RUN_FILE_PATH = ("RUN_FILE_PATH" in ENVIRON) ? ENVIRON["RUN_FILE_PATH"] : ""
+    # The sort holds the flushed requests until the end of the input, so it spills them to temporary files next to the
+    # run file, and the byte threshold (if set) caps its buffer instead of a share of the memory of the machine
+    run_directory = RUN_FILE_PATH
+    sub(/\/[^\/]*$/, "", run_directory)
+    RUN_SORT_COMMAND = "LC_ALL=C sort --stable --field-separator='\t' --key=1,1"
+    RUN_SORT_COMMAND = RUN_SORT_COMMAND " --temporary-directory='" run_directory "'"
+    if (FLUSH_BYTE_THRESHOLD > 0) {
+        RUN_SORT_COMMAND = RUN_SORT_COMMAND " --buffer-size=" FLUSH_BYTE_THRESHOLD "b"
+    }
+    RUN_SORT_COMMAND = RUN_SORT_COMMAND " --output='" RUN_FILE_PATH "'"
+    number_of_run_lines = 0
+
     MONTH_TO_NUMERIC["Jan"] = "01"
     MONTH_TO_NUMERIC["Feb"] = "02"
     MONTH_TO_NUMERIC["Mar"] = "03"
@@ -36,7 +74,9 @@ BEGIN {
     if (request_type != "REST.GET.OBJECT") {next}
 
     ip = pre_uri_fields[5]
-    if (ip ~ IPS_TO_SKIP_REGEX) {next}
+    if (ip in SKIPPED_IPS) {next}
+    if (MAXIMUM_SKIPPED_PREFIX_OCTETS > 0 && has_skipped_prefix(ip)) {next}
+    if (IPS_TO_SKIP_REGEX != "" && ip ~ IPS_TO_SKIP_REGEX) {next}
 
     split($2, post_uri_fields, " ")
     status = post_uri_fields[2]
@@ -70,12 +110,69 @@ BEGIN {
     data[object_key]["bytes_sent"][++data[object_key]["bytes_sent_count"]] = bytes_sent
     data[object_key]["ip"][++data[object_key]["ip_count"]] = ip
     data[object_key]["download"][++data[object_key]["download_count"]] = download
+
+    number_of_kept_lines++
+    number_of_buffered_records++
+    # Each request occupies one line in each of the four column files
+    number_of_buffered_bytes += length(parsed_timestamp) + length(bytes_sent) + length(ip) + length(download) + 4
+    if ((FLUSH_RECORD_THRESHOLD > 0 && number_of_buffered_records >= FLUSH_RECORD_THRESHOLD) ||
+        (FLUSH_BYTE_THRESHOLD > 0 && number_of_buffered_bytes >= FLUSH_BYTE_THRESHOLD)) {
+        flush_buffered_requests()
+    }
 }
 
 END {
+    flush_buffered_requests()
+
+    # Closing the pipe waits for the sort to write the run file
+    if (number_of_run_lines > 0 && close(RUN_SORT_COMMAND) != 0) {
+        print "Failed to sort the run file '" RUN_FILE_PATH "'" > "/dev/stderr"
+        exit 1
+    }
+
+    if (JOURNAL_FILE_PATH != "" && RUN_FILE_PATH == "") {
+        for (object_key in touched_object_keys) {
+            print object_key >> JOURNAL_FILE_PATH
+        }
+        close(JOURNAL_FILE_PATH)
+    }
+
+    # Report the work done as one tab-separated line of
+    # 'lines_scanned, lines_kept, number_of_objects, maximum_rows_per_object' for the metrics of the run
+    # Behind the prefilter, NR only counts the lines that passed it, so the extractor counts the scanned lines instead
+    number_of_objects = 0
+    maximum_rows_per_object = 0
+    for (object_key in touched_object_keys) {
+        number_of_objects++
+        if (touched_object_keys[object_key] > maximum_rows_per_object) {
+            maximum_rows_per_object = touched_object_keys[object_key]
+        }
+    }
+    print NR "\t" number_of_kept_lines "\t" number_of_objects "\t" maximum_rows_per_object
+}
+
+# Append the buffered requests of each object to its column files, then release the buffers
+# Appending in chronological batches keeps the rows of each object in the same order as a single final write
+function flush_buffered_requests(    object_key, subdirectory, timestamps_file_path, bytes_sent_file_path,
+                                     ips_file_path, download_file_path, i, number_of_new_subdirectories) {
+    if (RUN_FILE_PATH != "") {
+        write_buffered_requests_to_run()
+        return
+    }
+
+    # The subdirectories of all objects not seen before are created by a single process, rather than forking a
+    # shell per object; closing the pipe waits for it to finish before any file is written
+    number_of_new_subdirectories = 0
     for (object_key in data) {
-        subdirectory = EXTRACTION_DIRECTORY object_key
-        system("mkdir -p " subdirectory)
+        if (object_key in touched_object_keys) {continue}
+
+        print EXTRACTION_DIRECTORY object_key | MKDIR_COMMAND
+        number_of_new_subdirectories++
+        touched_object_keys[object_key] = 0
+    }
+    if (number_of_new_subdirectories > 0 && close(MKDIR_COMMAND) != 0) {
+        print "Failed to create the extraction subdirectories" > "/dev/stderr"
+        exit 1
     }
 
     for (object_key in data) {
@@ -84,6 +181,7 @@ END {
         bytes_sent_file_path = subdirectory "/bytes_sent.txt"
         ips_file_path = subdirectory "/ips.txt"
         download_file_path = subdirectory "/download.txt"
+        touched_object_keys[object_key] += data[object_key]["timestamps_count"]
 
         for (i = 1; i <= data[object_key]["timestamps_count"]; i++) {
             print data[object_key]["timestamps"][i] >> timestamps_file_path
@@ -97,5 +195,95 @@ END {
         for (i = 1; i <= data[object_key]["download_count"]; i++) {
             print data[object_key]["download"][i] >> download_file_path
         }
+
+        # Closing releases the file descriptors of objects that may not appear again in this log
+        close(timestamps_file_path)
+        close(bytes_sent_file_path)
+        close(ips_file_path)
+        close(download_file_path)
+    }
+
+    delete data
+    number_of_buffered_records = 0
+    number_of_buffered_bytes = 0
+}
+
+# Pass the buffered requests to the sort of the run file, one line of 'object_key, timestamp, bytes_sent, ip, download'
+# per request, then release the buffers
+function write_buffered_requests_to_run(    object_key, i) {
+    for (object_key in data) {
+        touched_object_keys[object_key] += data[object_key]["timestamps_count"]
+
+        for (i = 1; i <= data[object_key]["timestamps_count"]; i++) {
+            print object_key "\t" data[object_key]["timestamps"][i] "\t" data[object_key]["bytes_sent"][i] "\t" \
+                data[object_key]["ip"][i] "\t" data[object_key]["download"][i] | RUN_SORT_COMMAND
+            number_of_run_lines++
+        }
+    }
+
+    delete data
+    number_of_buffered_records = 0
+    number_of_buffered_bytes = 0
+}
+
+# Read one IP or CIDR range per line (blank lines and '#' comments are ignored)
+# Exact IPs and /32 ranges are looked up directly; other IPv4 ranges are expanded into the prefixes of whole octets
+# that they cover (for example, '10.0.0.0/20' becomes '10.0.0.' through '10.0.15.'), so that a lookup only ever
+# compares the leading octets of an IP, without evaluating a regular expression
+function load_ips_to_skip(file_path,    line, status, network_parts, octets, prefix_length, number_of_octets,
+                                        range_size, first_value, prefix, i, value) {
+    while ((status = (getline line < file_path)) > 0) {
+        sub(/#.*/, "", line)
+        gsub(/[ \t\r]/, "", line)
+        if (line == "") {continue}
+
+        # IPv6 addresses are only skipped exactly, as written in the logs
+        if (split(line, network_parts, "/") == 1 || network_parts[2] + 0 == 32 || index(line, ":") > 0) {
+            SKIPPED_IPS[network_parts[1]] = 1
+            continue
+        }
+
+        split(network_parts[1], octets, ".")
+        prefix_length = network_parts[2] + 0
+        number_of_octets = int(prefix_length / 8)
+        range_size = 2 ^ (8 - prefix_length % 8)
+        if (prefix_length % 8 != 0 || number_of_octets == 0) {
+            number_of_octets++
+        } else {
+            range_size = 1
+        }
+
+        prefix = ""
+        for (i = 1; i < number_of_octets; i++) {
+            prefix = prefix (octets[i] + 0) "."
+        }
+        first_value = int((octets[number_of_octets] + 0) / range_size) * range_size
+        for (value = first_value; value < first_value + range_size; value++) {
+            if (number_of_octets == 4) {
+                SKIPPED_IPS[prefix value] = 1
+            } else {
+                SKIPPED_IP_PREFIXES[prefix value "."] = 1
+            }
+        }
+        if (number_of_octets < 4 && number_of_octets > MAXIMUM_SKIPPED_PREFIX_OCTETS) {
+            MAXIMUM_SKIPPED_PREFIX_OCTETS = number_of_octets
+        }
+    }
+    if (status < 0) {
+        print "Failed to read the IPs to skip from '" file_path "'" > "/dev/stderr"
+        exit 1
+    }
+    close(file_path)
+}
+
+function has_skipped_prefix(ip,    octets, number_of_octets, prefix, i) {
+    number_of_octets = split(ip, octets, ".")
+    if (number_of_octets != 4) {return 0}
+
+    prefix = ""
+    for (i = 1; i <= MAXIMUM_SKIPPED_PREFIX_OCTETS; i++) {
+        prefix = prefix octets[i] "."
+        if (prefix in SKIPPED_IP_PREFIXES) {return 1}
     }
+    return 0
 }
@@ -1,7 +1,33 @@
+import collections.abc
+import concurrent.futures
+import contextlib
+import ipaddress
+import itertools
 import os
 import pathlib
+import shutil
+import subprocess
+import time
 
 import s3_log_extraction
+import tqdm
+from s3_log_extraction.extractors._utils import _deploy_subprocess, _handle_aws_credentials
+
+from ._extraction_metrics import (
+    _METRICS_FILE_SUFFIX,
+    _append_extraction_metrics,
+    _get_child_cpu_seconds,
+    _parse_extraction_script_report,
+)
+from ._extraction_units import _ExtractionUnit, _get_s3_url_sizes, _plan_extraction_units, _read_s3_url_segment
+from ._run_files import _merge_run_files, _roll_back_commit, _start_commit
+from .._journal._utils import _append_journal, _get_journal_file_path, _prune_journal
+from .._parallel._utils import _handle_max_workers
+from ..summarize._blob_index import _BLOB_INDEX_FILE_NAME, _consolidate_blob_index
+
+# Every request kept by the extraction script contains one of these, since S3 separates the fields of a log line by
+# single spaces and only GET requests of 'blobs' and 'zarr/' object keys are extracted
+_PREFILTER_PATTERNS = ("REST.GET.OBJECT blobs", "REST.GET.OBJECT zarr/")
 
 
 class DandiRemoteS3LogAccessExtractor(s3_log_extraction.extractors.RemoteS3LogAccessExtractor):
@@ -21,12 +47,392 @@ class DandiRemoteS3LogAccessExtractor(s3_log_extraction.extractors.RemoteS3LogAc
             - Invoke the command `s3logextraction stop` to end the processes after the current round of completion.
             - Manually create a file in the extraction cache called '.stop_extraction'.
       - updatable
+      - crash-safe
+          The requests of each log file are staged in a run file and appended to the extraction directory as part of
+          a commit, which records the length of every file before appending to it. If a run dies while committing,
+          the next run truncates the files back to those lengths before extracting the same log files again.
+      - journaled
+          The object keys appended to by each commit are recorded under `records/extraction-journal` once their rows
+          are in the extraction directory, which allows `dandis3logextraction update summaries --incremental` to
+          regenerate only the affected Dandisets. The journal files that every incremental run has read are removed
+          when the next extraction starts.
+      - indexed
+          The number of rows and bytes appended to each object by each commit are recorded in `records/blob-index.tsv`,
+          from which the summaries find the extracted objects without walking the extraction directory. The index is
+          started along with a new cache; that of an existing cache is built by `dandis3logextraction index`.
+      - instrumented
+          The input size, lines scanned and kept, objects appended to, and wall and CPU time of each unit of work are
+          recorded under `records`, and summarized by `dandis3logextraction metrics`.
+      - streamable
+          By default, the extraction script buffers the requests of a log file until the whole file has been parsed.
+          Setting `flush_record_threshold` or `flush_byte_threshold` instead passes the buffered requests on to the
+          `sort` of the run file whenever either threshold is reached, which bounds the buffers of the script.
+          The `sort` holds them until the end, within a buffer of `flush_byte_threshold` bytes if that is set, and
+          spills the rest to temporary files next to the run file. The requests only reach the extraction directory
+          when the commit merges the run files either way.
+      - batchable
+          By default, each log file is parsed by its own extraction process. Setting `files_per_invocation` instead
+          streams that many log files through a single process, so that the cost of starting it and of reopening
+          the column files of each object is shared by the whole batch. The start and end of each log file are
+          still recorded individually.
+      - prefilterable
+          Setting `prefilter` passes each log file through a fixed-string `grep` before the extraction script, which
+          discards the lines that cannot be GET requests of DANDI objects far faster than the script splits them into
+          fields. The extracted output is identical either way.
+      - splittable
+          Setting `range_size` splits each log file larger than that many bytes into byte ranges that end on line
+          boundaries, which are parsed by separate workers. The outputs of the ranges are merged in order, so the
+          extracted lines of each object remain in the order of the original log file.
+
+    Parameters
+    ----------
+    cache_directory : pathlib.Path, optional
+        Path to the cache directory. If `None`, the default cache directory from the configuration will be used.
+    flush_record_threshold : int, optional
+        The number of buffered requests at which the extraction script passes them on to the sort of its run file.
+    flush_byte_threshold : int, optional
+        The number of bytes of buffered column lines at which the extraction script passes them on to the sort of its
+        run file, which also bounds the memory buffer of that sort.
+    files_per_invocation : int, default: 1
+        The number of log files parsed together by each extraction process.
+    ips_to_skip_file_path : pathlib.Path, optional
+        Path to a file of IPs and IPv4 CIDR ranges to skip, one per line, in addition to those matching the
+        `IPS_TO_SKIP` regular expression. If `None`, the `IPS_TO_SKIP_FILE` environment variable is used, if set.
+    prefilter : bool, default: False
+        Whether to discard lines that cannot be extracted with a fixed-string `grep` before the extraction script.
+    range_size : int, optional
+        The number of bytes above which a log file is split into ranges of about that size parsed by separate workers.
     """
 
-    def __init__(self, cache_directory: pathlib.Path | None = None) -> None:
+    def __init__(
+        self,
+        cache_directory: pathlib.Path | None = None,
+        *,
+        flush_record_threshold: int | None = None,
+        flush_byte_threshold: int | None = None,
+        files_per_invocation: int = 1,
+        ips_to_skip_file_path: str | pathlib.Path | None = None,
+        prefilter: bool = False,
+        range_size: int | None = None,
+    ) -> None:
         super().__init__(cache_directory=cache_directory, use_encryption=False)
 
         self._relative_script_path = pathlib.Path(__file__).parent / "_dandi_extraction.awk"
 
         ips_to_skip_regex = os.environ.get("IPS_TO_SKIP", "")
         self._awk_env["IPS_TO_SKIP_REGEX"] = ips_to_skip_regex
+
+        ips_to_skip_file_path = ips_to_skip_file_path or os.environ.get("IPS_TO_SKIP_FILE")
+        if ips_to_skip_file_path is not None:
+            ips_to_skip_file_path = pathlib.Path(ips_to_skip_file_path).absolute()
+            _validate_ips_to_skip_file(file_path=ips_to_skip_file_path)
+            self._awk_env["IPS_TO_SKIP_FILE_PATH"] = str(ips_to_skip_file_path)
+
+        if flush_record_threshold is not None:
+            self._awk_env["FLUSH_RECORD_THRESHOLD"] = str(flush_record_threshold)
+        if flush_byte_threshold is not None:
+            self._awk_env["FLUSH_BYTE_THRESHOLD"] = str(flush_byte_threshold)
+
+        self.files_per_invocation = files_per_invocation
+        self.prefilter = prefilter
+        self.range_size = range_size
+
+        # Lists the lengths of the files appended to by a commit in progress, to roll them back if it is interrupted
+        self.pending_commit_file_path = self.records_directory / f"{self.__class__.__name__}_pending-commit.tsv"
+        # Only maintained if it exists, since an index started on a cache with previous extractions would be partial
+        self.blob_index_file_path = self.records_directory / _BLOB_INDEX_FILE_NAME
+        # One row of throughput metrics per unit of work
+        self.metrics_file_path = self.records_directory / f"{self.__class__.__name__}{_METRICS_FILE_SUFFIX}"
+
+    def extract_s3_bucket(
+        self,
+        *,
+        s3_root: str,
+        limit: int | None = None,
+        workers: int = -2,
+        batch_size: int = 5_000,
+        inventory_directory: str | pathlib.Path | None = None,
+    ) -> None:
+        """
+        Extract S3 log access data from a remote S3 bucket.
+
+        See `s3_log_extraction.extractors.RemoteS3LogAccessExtractor.extract_s3_bucket` for the parameters.
+        If `files_per_invocation` is greater than one, each worker parses groups of that many log files at a time.
+        If `range_size` is set, log files larger than it are split into byte ranges parsed by separate workers.
+
+        Each unit of work writes a single run file sorted by object key instead of appending to the column files of
+        the objects. The runs are merged into the extraction directory as one commit per round of log files (or per
+        log file when serial), which is rolled back on the next run if it was interrupted.
+        """
+        _handle_aws_credentials()
+        max_workers = _handle_max_workers(workers=workers)
+
+        # Undo the partial output of an interrupted commit, so that its log files are extracted again from scratch
+        _roll_back_commit(commit_file_path=self.pending_commit_file_path)
+
+        # Nothing appends to the journal until the first commit, so the files already read can be removed
+        _prune_journal(cache_directory=self.cache_directory)
+
+        # The index of the extracted objects is started along with the cache (see `build_blob_index` for older ones)
+        if not self.blob_index_file_path.exists():
+            has_extracted_objects = any(
+                file_path.is_file() for file_path in self.extraction_directory.rglob(pattern="*")
+            )
+            if not has_extracted_objects:
+                self.blob_index_file_path.touch()
+        if self.blob_index_file_path.exists():
+            _consolidate_blob_index(blob_index_file_path=self.blob_index_file_path)
+
+        unprocessed_s3_urls = self._get_unprocessed_s3_urls(s3_root=s3_root, inventory_directory=inventory_directory)
+        s3_urls_to_extract = unprocessed_s3_urls[:limit] if limit is not None else unprocessed_s3_urls
+
+        progress_bar = tqdm.tqdm(
+            total=len(s3_urls_to_extract),
+            desc="Running extraction on remote S3 logs",
+            unit="files",
+            smoothing=0,
+            leave=True,
+        )
+        run_directory = self.temporary_directory / "runs"
+        run_directory.mkdir(parents=True, exist_ok=True)
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) if max_workers > 1 else None
+        with progress_bar, executor or contextlib.nullcontext():
+            for s3_urls_in_round in itertools.batched(s3_urls_to_extract, n=batch_size):
+                if self.stop_file_path.exists():
+                    break
+
+                s3_url_to_size = _get_s3_url_sizes(s3_urls=s3_urls_in_round) if self.range_size is not None else dict()
+                units = _plan_extraction_units(
+                    s3_urls=s3_urls_in_round,
+                    files_per_invocation=self.files_per_invocation,
+                    range_size=self.range_size,
+                    get_size=s3_url_to_size.__getitem__,
+                )
+                if executor is None:
+                    self._extract_units_serially(units=units, run_directory=run_directory, progress_bar=progress_bar)
+                    continue
+
+                self._open_commit(started_s3_urls=s3_urls_in_round)
+
+                # Each unit writes its own run file, which are merged in order to keep the lines of split files in
+                # their original order
+                run_file_paths = [run_directory / f"{unit_index}.tsv" for unit_index in range(len(units))]
+                future_to_unit = {
+                    executor.submit(self._extract_unit, unit=unit, run_file_path=run_file_path): unit
+                    for unit, run_file_path in zip(units, run_file_paths)
+                }
+                metrics = []
+                for future in concurrent.futures.as_completed(future_to_unit):
+                    metrics.append(future.result())
+                    progress_bar.update(len(future_to_unit[future].completed_s3_urls))
+
+                self._close_commit(run_file_paths=run_file_paths, completed_s3_urls=s3_urls_in_round)
+                _append_extraction_metrics(metrics_file_path=self.metrics_file_path, metrics=metrics)
+
+        shutil.rmtree(path=self.temporary_directory, ignore_errors=True)
+
+    def _extract_unit(
+        self, *, unit: _ExtractionUnit, run_file_path: pathlib.Path | None = None
+    ) -> dict[str, str | int | float]:
+        """Download the segments of a unit and parse them with a single extraction process, returning its metrics."""
+        start_time = time.perf_counter()
+        start_cpu_seconds = _get_child_cpu_seconds()
+
+        temporary_file_paths = []
+        number_of_lines = 0
+        for s3_url, start, end in unit.segments:
+            temporary_file_path = self.temporary_directory / f"{s3_url.split("/")[-1]}.{start}"
+            content = _read_s3_url_segment(s3_url=s3_url, start=start, end=end)
+            temporary_file_path.write_bytes(data=content)
+            temporary_file_paths.append(temporary_file_path)
+
+            # A last line without a newline is still read as a line by the extraction script
+            number_of_lines += content.count(b"\n") + (len(content) > 0 and not content.endswith(b"\n"))
+        download_seconds = time.perf_counter() - start_time
+
+        stdout = self._run_group_extraction(file_paths=temporary_file_paths, run_file_path=run_file_path)
+        report = _parse_extraction_script_report(stdout=stdout)
+        if self.prefilter:
+            report["lines_scanned"] = number_of_lines  # The extraction script only reads the lines that passed
+
+        input_bytes = sum(temporary_file_path.stat().st_size for temporary_file_path in temporary_file_paths)
+        for temporary_file_path in temporary_file_paths:
+            temporary_file_path.unlink()
+
+        log_files = [
+            s3_url.split("/")[-1] if end is None else f"{s3_url.split("/")[-1]}:{start}-{end}"
+            for s3_url, start, end in unit.segments
+        ]
+        return {
+            "log_files": ",".join(log_files),
+            "input_bytes": input_bytes,
+            **report,
+            "download_seconds": round(download_seconds, 6),
+            "wall_seconds": round(time.perf_counter() - start_time, 6),
+            "cpu_seconds": round(_get_child_cpu_seconds() - start_cpu_seconds, 6),
+            "worker": os.getpid(),
+        }
+
+    def _extract_units_serially(
+        self, *, units: list[_ExtractionUnit], run_directory: pathlib.Path, progress_bar: tqdm.tqdm
+    ) -> None:
+        """Extract the units one at a time, committing the log files of each as soon as they are complete."""
+        run_file_paths = []
+        metrics = []
+        for unit in units:
+            if len(run_file_paths) == 0:
+                if self.stop_file_path.exists():
+                    break
+
+                self._open_commit(started_s3_urls=[s3_url for s3_url, start, _ in unit.segments if start == 0])
+
+            run_file_paths.append(run_directory / f"{len(run_file_paths)}.tsv")
+            metrics.append(self._extract_unit(unit=unit, run_file_path=run_file_paths[-1]))
+
+            # The ranges of a split log file are committed together, once the last of them has been extracted
+            if len(unit.completed_s3_urls) > 0:
+                self._close_commit(run_file_paths=run_file_paths, completed_s3_urls=unit.completed_s3_urls)
+                _append_extraction_metrics(metrics_file_path=self.metrics_file_path, metrics=metrics)
+                progress_bar.update(len(unit.completed_s3_urls))
+                run_file_paths = []
+                metrics = []
+
+    def _open_commit(self, *, started_s3_urls: collections.abc.Iterable[str]) -> None:
+        file_paths = [self.s3_url_processing_start_record_file_path, self.s3_url_processing_end_record_file_path]
+        if self.blob_index_file_path.exists():
+            file_paths.append(self.blob_index_file_path)
+        _start_commit(commit_file_path=self.pending_commit_file_path, file_paths=file_paths)
+        self._record_s3_urls(s3_urls=started_s3_urls, record_file_path=self.s3_url_processing_start_record_file_path)
+
+    def _close_commit(
+        self, *, run_file_paths: list[pathlib.Path], completed_s3_urls: collections.abc.Iterable[str]
+    ) -> None:
+        """Merge the run files into the extraction directory and record the log files they complete as one commit."""
+        object_keys = _merge_run_files(
+            run_file_paths=run_file_paths,
+            extraction_directory=self.extraction_directory,
+            commit_file_path=self.pending_commit_file_path,
+            blob_index_file_path=self.blob_index_file_path if self.blob_index_file_path.exists() else None,
+        )
+        # Journaled only once their rows are in the extraction directory, so that an incremental summary run never
+        # consumes a key before its rows; a rolled back commit then only causes the regeneration of its Dandisets
+        _append_journal(records_directory=self.records_directory, object_keys=object_keys)
+        self._record_s3_urls(s3_urls=completed_s3_urls, record_file_path=self.s3_url_processing_end_record_file_path)
+
+        # Removing the pending commit is what makes it final
+        self.pending_commit_file_path.unlink()
+        for run_file_path in run_file_paths:
+            run_file_path.unlink(missing_ok=True)
+
+    @staticmethod
+    def _record_s3_urls(*, s3_urls: collections.abc.Iterable[str], record_file_path: pathlib.Path) -> None:
+        with record_file_path.open(mode="a") as file_stream:
+            file_stream.write("".join(f"{s3_url.split("/")[-1]}\n" for s3_url in s3_urls))
+
+    def _run_extraction(self, *, file_path: pathlib.Path, extraction_directory: pathlib.Path | None = None) -> None:
+        # Resolved per call since the file is specific to the process running the extraction
+        if self.prefilter:
+            self._run_group_extraction(file_paths=[file_path], extraction_directory=extraction_directory)
+            return
+
+        self._awk_env["JOURNAL_FILE_PATH"] = str(_get_journal_file_path(records_directory=self.records_directory))
+
+        super()._run_extraction(file_path=file_path, extraction_directory=extraction_directory)
+
+    def _run_group_extraction(
+        self,
+        *,
+        file_paths: list[pathlib.Path],
+        extraction_directory: pathlib.Path | None = None,
+        run_file_path: pathlib.Path | None = None,
+    ) -> str:
+        """
+        Stream several log files through one invocation of the extraction script, which flushes once at the end.
+
+        If `run_file_path` is given, the requests are written to that sorted run file instead of the column files,
+        and their object keys are journaled by the commit that merges it.
+        Returns the standard output of the script, which reports the counts of lines and objects it processed.
+        """
+        self._awk_env["EXTRACTION_DIRECTORY"] = str(extraction_directory or self.extraction_directory)
+        if run_file_path is not None:
+            self._awk_env["RUN_FILE_PATH"] = str(run_file_path.absolute())
+            self._awk_env.pop("JOURNAL_FILE_PATH", None)
+        else:
+            self._awk_env["JOURNAL_FILE_PATH"] = str(_get_journal_file_path(records_directory=self.records_directory))
+            self._awk_env.pop("RUN_FILE_PATH", None)
+
+        absolute_script_path = str(self._relative_script_path.absolute())
+        if self.prefilter:
+            return self._run_prefiltered_extraction(script_path=absolute_script_path, file_paths=file_paths)
+
+        absolute_file_paths = " ".join(str(file_path.absolute()) for file_path in file_paths)
+
+        gawk_command = f"gawk --file {absolute_script_path} {absolute_file_paths}"
+        return _deploy_subprocess(
+            command=gawk_command,
+            environment_variables=self._awk_env,
+            error_message=f"Extraction failed on the group of {len(file_paths)} files starting at {file_paths[0]}.",
+        )
+
+    def _run_prefiltered_extraction(self, *, script_path: str, file_paths: list[pathlib.Path]) -> str:
+        """Pipe the lines of the log files that contain any of the prefilter patterns into the extraction script."""
+        pattern_arguments = [argument for pattern in _PREFILTER_PATTERNS for argument in ("-e", pattern)]
+        grep_command = [
+            "grep",
+            "--text",
+            "--fixed-strings",
+            "--no-filename",
+            *pattern_arguments,
+            "--",
+            *map(str, file_paths),
+        ]
+        gawk_command = ["gawk", "--file", script_path]
+
+        # Lines are matched as bytes, since in a UTF-8 locale a line with invalid bytes would otherwise be dropped
+        # with only a 'binary file matches' notice, while the extraction script still extracts it from the file
+        with subprocess.Popen(
+            args=grep_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env={**os.environ, "LC_ALL": "C"}
+        ) as grep_process:
+            gawk_result = subprocess.run(
+                args=gawk_command,
+                stdin=grep_process.stdout,
+                env={**os.environ, **self._awk_env},
+                capture_output=True,
+                text=True,
+                encoding="utf-8",
+            )
+            grep_process.stdout.close()
+            grep_stderr = grep_process.stderr.read().decode()
+
+        # An exit code of 1 from grep only means that no line matched
+        if grep_process.returncode > 1 or gawk_result.returncode != 0:
+            message = (
+                f"\n\nError codes {grep_process.returncode} (grep) and {gawk_result.returncode} (gawk)\n"
+                f"Prefiltered extraction failed on {len(file_paths)} files starting at {file_paths[0]}.\n\n"
+                f"stdout: {gawk_result.stdout}\n\n"
+                f"stderr: {grep_stderr}{gawk_result.stderr}\n\n"
+            )
+            raise RuntimeError(message)
+
+        return gawk_result.stdout
+
+
+def _validate_ips_to_skip_file(*, file_path: pathlib.Path) -> None:
+    """Check that every entry of a file of IPs to skip is understood by the extraction script before it runs."""
+    for line_number, line in enumerate(file_path.read_text().splitlines(), start=1):
+        entry = line.split("#", maxsplit=1)[0].strip()
+        if entry == "":
+            continue
+
+        try:
+            network = ipaddress.ip_network(address=entry, strict=False)
+        except ValueError as exception:
+            message = f"Line {line_number} of '{file_path}' is not an IP or CIDR range: '{entry}'."
+            raise ValueError(message) from exception
+
+        if network.version == 6 and network.num_addresses > 1:
+            message = (
+                f"Line {line_number} of '{file_path}' is an IPv6 range ('{entry}'); "
+                "only individual IPv6 addresses can be skipped."
+            )
+            raise ValueError(message)
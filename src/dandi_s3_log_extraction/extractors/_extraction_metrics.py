@@ -0,0 +1,123 @@
+"""Record and summarize the throughput of each unit of work of the remote extraction."""
+
+import pathlib
+import resource
+
+import numpy
+import pandas
+import s3_log_extraction
+from beartype import beartype
+
+_METRICS_FILE_SUFFIX = "_extraction-metrics.tsv"
+_METRICS_COLUMNS = (
+    "log_files",
+    "input_bytes",
+    "lines_scanned",
+    "lines_kept",
+    "number_of_objects",
+    "maximum_rows_per_object",
+    "download_seconds",
+    "wall_seconds",
+    "cpu_seconds",
+    "worker",
+)
+_PERCENTILES = (50, 90, 99, 100)
+
+
+@beartype
+def summarize_extraction_metrics(
+    *, cache_directory: str | pathlib.Path | None = None, number_of_slowest: int = 10
+) -> str:
+    """
+    Report the throughput of the extraction runs recorded in the cache.
+
+    Each unit of work (a log file, a group of log files, or a byte range of a split log file) appends one row of
+    metrics to `records/<extractor>_extraction-metrics.tsv`: its input size, the lines of its input and those kept by
+    the extraction script, the number of objects and the most rows appended to any of them, the time spent
+    downloading, the wall time of the whole unit, the CPU time of the extraction processes, and the process ID of the
+    worker.
+
+    Parameters
+    ----------
+    cache_directory : pathlib.Path, optional
+        Path to the cache directory. If `None`, the default cache directory from the configuration will be used.
+    number_of_slowest : int, default: 10
+        The number of units with the longest wall time to list.
+
+    Returns
+    -------
+    str
+        The overall throughput, the percentiles of the per-unit times and rates, and the slowest units.
+    """
+    cache_directory = (
+        pathlib.Path(cache_directory) if cache_directory is not None else s3_log_extraction.config.get_cache_directory()
+    )
+    metrics_file_paths = sorted((cache_directory / "records").glob(pattern=f"*{_METRICS_FILE_SUFFIX}"))
+    if len(metrics_file_paths) == 0:
+        return f"No extraction metrics have been recorded in '{cache_directory / "records"}'."
+
+    metrics = pandas.concat(
+        objs=[pandas.read_table(filepath_or_buffer=file_path) for file_path in metrics_file_paths], ignore_index=True
+    )
+    total_wall_seconds = metrics["wall_seconds"].sum()
+    total_megabytes = metrics["input_bytes"].sum() / 1e6
+    overall_lines = (
+        f"{len(metrics)} units of work by {metrics["worker"].nunique()} worker processes, "
+        f"{total_megabytes:.1f} MB read, {metrics["lines_scanned"].sum()} lines scanned, "
+        f"{metrics["lines_kept"].sum()} lines kept\n"
+        f"Per worker: {metrics["lines_scanned"].sum() / total_wall_seconds:.0f} lines/s, "
+        f"{metrics["lines_kept"].sum() / total_wall_seconds:.0f} kept lines/s, "
+        f"{total_megabytes / total_wall_seconds:.2f} MB/s, "
+        f"{metrics["cpu_seconds"].sum() / total_wall_seconds:.0%} of the wall time on CPU in the extraction processes"
+    )
+
+    # Guard against units too fast for the resolution of the clock
+    wall_seconds = metrics["wall_seconds"].clip(lower=1e-6)
+    per_unit = pandas.DataFrame(
+        data={
+            "wall_seconds": metrics["wall_seconds"],
+            "download_seconds": metrics["download_seconds"],
+            "cpu_seconds": metrics["cpu_seconds"],
+            "lines_per_second": metrics["lines_scanned"] / wall_seconds,
+            "kept_lines_per_second": metrics["lines_kept"] / wall_seconds,
+            "megabytes_per_second": metrics["input_bytes"] / 1e6 / wall_seconds,
+        }
+    )
+    percentiles = pandas.DataFrame(
+        data=numpy.percentile(a=per_unit.to_numpy(), q=_PERCENTILES, axis=0).T,
+        index=per_unit.columns,
+        columns=[f"p{percentile}" if percentile < 100 else "max" for percentile in _PERCENTILES],
+    )
+
+    slowest = metrics.nlargest(n=number_of_slowest, columns="wall_seconds")[
+        ["log_files", "input_bytes", "lines_scanned", "lines_kept", "download_seconds", "wall_seconds", "cpu_seconds"]
+    ]
+
+    return (
+        f"{overall_lines}\n\n"
+        f"Per unit of work:\n{percentiles.to_string(float_format="{:.3f}".format)}\n\n"
+        f"Slowest units of work:\n{slowest.to_string(index=False, float_format="{:.3f}".format)}"
+    )
+
+
+def _append_extraction_metrics(*, metrics_file_path: pathlib.Path, metrics: list[dict[str, str | int | float]]) -> None:
+    if len(metrics) == 0:
+        return
+
+    lines = ["\t".join(str(unit_metrics[column]) for column in _METRICS_COLUMNS) + "\n" for unit_metrics in metrics]
+    if not metrics_file_path.exists():
+        lines.insert(0, "\t".join(_METRICS_COLUMNS) + "\n")
+    with metrics_file_path.open(mode="a") as file_stream:
+        file_stream.write("".join(lines))
+
+
+def _parse_extraction_script_report(*, stdout: str) -> dict[str, int]:
+    """Read the counts reported by the last line printed by the extraction script."""
+    values = stdout.splitlines()[-1].split("\t")
+    return dict(zip(["lines_scanned", "lines_kept", "number_of_objects", "maximum_rows_per_object"], map(int, values)))
+
+
+def _get_child_cpu_seconds() -> float:
+    """The CPU time of all child processes of this process that have finished, including their own children."""
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
@@ -0,0 +1,93 @@
+"""Plan the units of work of an extraction run: groups of small log files and byte ranges of large ones."""
+
+import collections.abc
+import concurrent.futures
+import dataclasses
+import itertools
+
+# Each size lookup waits on a round trip to the bucket, so many are kept in flight at once
+_SIZE_LOOKUP_CONCURRENCY = 64
+
+
+@dataclasses.dataclass(frozen=True)
+class _ExtractionUnit:
+    """
+    The log file segments parsed together by one invocation of the extraction script.
+
+    Each segment is an S3 URL with the byte range `[start, end)` to parse, where an `end` of `None` means the whole
+    file. A range holds every line that starts within it, so that consecutive ranges partition the lines of a file.
+    """
+
+    segments: tuple[tuple[str, int, int | None], ...]
+    # The S3 URLs whose last segment is in this unit, and which are therefore complete once it is merged
+    completed_s3_urls: tuple[str, ...]
+
+
+def _plan_extraction_units(
+    *,
+    s3_urls: collections.abc.Sequence[str],
+    files_per_invocation: int,
+    range_size: int | None,
+    get_size: collections.abc.Callable[[str], int],
+) -> list[_ExtractionUnit]:
+    """
+    Split log files larger than `range_size` bytes into ranges of about that size, and group the others.
+
+    The ranges of a file are consecutive in the returned list, so that merging the outputs of the units in order
+    preserves the original order of the lines of every file.
+    """
+    units = []
+    small_s3_urls = []
+    for s3_url in s3_urls:
+        size = get_size(s3_url) if range_size is not None else 0
+        if range_size is None or size <= range_size:
+            small_s3_urls.append(s3_url)
+            continue
+
+        number_of_ranges = -(-size // range_size)
+        boundaries = [size * index // number_of_ranges for index in range(number_of_ranges + 1)]
+        for start, end in itertools.pairwise(boundaries):
+            completed_s3_urls = (s3_url,) if end == size else ()
+            units.append(_ExtractionUnit(segments=((s3_url, start, end),), completed_s3_urls=completed_s3_urls))
+
+    for s3_url_group in itertools.batched(small_s3_urls, n=files_per_invocation):
+        segments = tuple((s3_url, 0, None) for s3_url in s3_url_group)
+        units.append(_ExtractionUnit(segments=segments, completed_s3_urls=s3_url_group))
+
+    return units
+
+
+def _read_s3_url_segment(*, s3_url: str, start: int, end: int | None) -> bytes:
+    """Read the lines of a log file that start within the byte range `[start, end)`, up to their newlines."""
+    import fsspec
+
+    with fsspec.open(urlpath=s3_url, mode="rb") as file_stream:
+        if end is None:
+            return file_stream.read()
+
+        # The line running through the start of the range (if any) belongs to the previous range
+        if start > 0:
+            file_stream.seek(start - 1)
+            file_stream.readline()
+        position = file_stream.tell()
+        if position >= end:
+            return b""
+
+        content = file_stream.read(end - position)
+        if content and not content.endswith(b"\n"):
+            content += file_stream.readline()
+
+    return content
+
+
+def _get_s3_url_sizes(*, s3_urls: collections.abc.Sequence[str]) -> dict[str, int]:
+    """Look up the sizes of many log files concurrently instead of one round trip after another."""
+    with concurrent.futures.ThreadPoolExecutor(max_workers=_SIZE_LOOKUP_CONCURRENCY) as executor:
+        return dict(zip(s3_urls, executor.map(_get_s3_url_size, s3_urls)))
+
+
+def _get_s3_url_size(s3_url: str) -> int:
+    import fsspec
+
+    file_system, path = fsspec.core.url_to_fs(s3_url)
+    return file_system.size(path)
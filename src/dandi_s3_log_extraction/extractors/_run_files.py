@@ -0,0 +1,164 @@
+"""
+Merge the sorted run files written by extraction workers into the extraction directory as a single commit.
+
+A commit is recorded in a pending commit file, which lists the length of every file before the commit appended to it.
+The record files are listed when the commit starts, and the column files of each object just before they are
+appended to. Removing the pending commit file completes the commit; if it still exists on the next run, the commit was
+interrupted and rolling it back truncates every listed file to its recorded length.
+"""
+
+import collections.abc
+import contextlib
+import heapq
+import itertools
+import os
+import pathlib
+import tempfile
+import warnings
+
+from ..summarize._blob_index import _format_blob_index_line
+from ..summarize._rollups import _COLUMN_FILE_NAMES
+
+# The most run files held open at once by a merge; a round of up to thousands of runs is first merged in passes over
+# consecutive groups of this many into intermediate runs, which stays well under the usual soft limit of 1024 files
+_MERGE_FAN_IN = 256
+
+
+def _start_commit(*, commit_file_path: pathlib.Path, file_paths: collections.abc.Iterable[pathlib.Path]) -> None:
+    """Create the pending commit file with the current lengths of the files the commit is about to append to."""
+    lines = [_format_commit_line(commit_file_path=commit_file_path, file_path=file_path) for file_path in file_paths]
+    commit_file_path.write_text(data="".join(lines))
+
+
+def _roll_back_commit(*, commit_file_path: pathlib.Path) -> None:
+    """Truncate every file listed by an interrupted commit to its length before the commit, if there is one."""
+    if not commit_file_path.exists():
+        return
+
+    # A line without a newline was being recorded when the commit was interrupted, so its file was not appended to
+    lines = commit_file_path.read_text().split("\n")[:-1]
+    for line in lines:
+        length, relative_file_path = line.split("\t", maxsplit=1)
+        file_path = commit_file_path.parent / relative_file_path
+        if int(length) == 0:
+            file_path.unlink(missing_ok=True)
+        elif file_path.exists():
+            os.truncate(path=file_path, length=int(length))
+    commit_file_path.unlink()
+
+    message = f"Rolled back an interrupted extraction commit of {len(lines)} files recorded in '{commit_file_path}'."
+    warnings.warn(message=message, stacklevel=2)
+
+
+def _merge_run_files(
+    *,
+    run_file_paths: collections.abc.Sequence[pathlib.Path],
+    extraction_directory: pathlib.Path,
+    commit_file_path: pathlib.Path | None = None,
+    blob_index_file_path: pathlib.Path | None = None,
+) -> list[str]:
+    """
+    Append the requests of a sequence of run files to the column files of their objects.
+
+    Each run file holds one tab-separated line of 'object_key, timestamp, bytes_sent, ip, download' per request,
+    sorted by object key. The runs are merged in a single pass, in which the column files of each object are opened
+    once and receive all of its requests together, so that the four columns always stay row-aligned. Requests of the
+    same object keep the order of the run files, and their order within each run.
+
+    Run files that do not exist (the workers that extracted no requests) are skipped. If there are more than
+    `_MERGE_FAN_IN` runs, they are first reduced to at most that many intermediate runs next to them.
+    If `commit_file_path` is given, the lengths of the column files of each object are added to that pending commit
+    before they are appended to. If `blob_index_file_path` is given, the number of rows and bytes appended to each
+    object are added to that index once every object is merged. Returns the keys of the objects that were appended to.
+    """
+    run_file_paths = [run_file_path for run_file_path in run_file_paths if run_file_path.exists()]
+    with contextlib.ExitStack() as exit_stack:
+        if len(run_file_paths) > _MERGE_FAN_IN:
+            intermediate_directory = pathlib.Path(
+                exit_stack.enter_context(tempfile.TemporaryDirectory(dir=run_file_paths[0].parent))
+            )
+            run_file_paths = _reduce_run_files(
+                run_file_paths=run_file_paths, intermediate_directory=intermediate_directory
+            )
+
+        run_file_streams = [exit_stack.enter_context(run_file_path.open(mode="r")) for run_file_path in run_file_paths]
+        commit_file_stream = (
+            exit_stack.enter_context(commit_file_path.open(mode="a")) if commit_file_path is not None else None
+        )
+
+        # Ties between runs are resolved in the order of the runs
+        lines = heapq.merge(*run_file_streams, key=_get_object_key)
+        object_keys = []
+        blob_index_lines = []
+        for object_key, object_lines in itertools.groupby(lines, key=_get_object_key):
+            object_keys.append(object_key)
+            columns = list(zip(*(line.rstrip("\n").split("\t")[1:] for line in object_lines)))
+
+            object_directory = extraction_directory / object_key
+            object_directory.mkdir(parents=True, exist_ok=True)
+            column_file_paths = [object_directory / file_name for file_name in _COLUMN_FILE_NAMES]
+            if commit_file_stream is not None:
+                commit_file_stream.write(
+                    "".join(
+                        _format_commit_line(commit_file_path=commit_file_path, file_path=file_path)
+                        for file_path in column_file_paths
+                    )
+                )
+                commit_file_stream.flush()
+
+            number_of_bytes = 0
+            for column_file_path, column in zip(column_file_paths, columns):
+                content = "\n".join(column) + "\n"
+                with column_file_path.open(mode="a") as file_stream:
+                    file_stream.write(content)
+                number_of_bytes += len(content)
+            blob_index_lines.append(
+                _format_blob_index_line(
+                    object_key=object_key, number_of_rows=len(columns[0]), number_of_bytes=number_of_bytes
+                )
+            )
+
+        if blob_index_file_path is not None and len(blob_index_lines) > 0:
+            with blob_index_file_path.open(mode="a") as file_stream:
+                file_stream.write("".join(blob_index_lines))
+
+    return object_keys
+
+
+def _reduce_run_files(
+    *, run_file_paths: list[pathlib.Path], intermediate_directory: pathlib.Path
+) -> list[pathlib.Path]:
+    """Merge consecutive groups of runs into intermediate runs, in passes, until at most `_MERGE_FAN_IN` remain."""
+    pass_index = 0
+    while len(run_file_paths) > _MERGE_FAN_IN:
+        merged_run_file_paths = []
+        # Merging consecutive groups keeps ties between runs in the order of the runs
+        for group_index, group_run_file_paths in enumerate(itertools.batched(run_file_paths, n=_MERGE_FAN_IN)):
+            merged_run_file_path = intermediate_directory / f"{pass_index}-{group_index}.tsv"
+            with contextlib.ExitStack() as exit_stack:
+                run_file_streams = [
+                    exit_stack.enter_context(run_file_path.open(mode="r")) for run_file_path in group_run_file_paths
+                ]
+                with merged_run_file_path.open(mode="w") as file_stream:
+                    file_stream.writelines(heapq.merge(*run_file_streams, key=_get_object_key))
+            merged_run_file_paths.append(merged_run_file_path)
+
+        # The intermediate runs of the previous pass are no longer needed
+        for run_file_path in run_file_paths:
+            if run_file_path.parent == intermediate_directory:
+                run_file_path.unlink()
+
+        run_file_paths = merged_run_file_paths
+        pass_index += 1
+
+    return run_file_paths
+
+
+def _get_object_key(line: str) -> str:
+    return line.partition("\t")[0]
+
+
+def _format_commit_line(*, commit_file_path: pathlib.Path, file_path: pathlib.Path) -> str:
+    # Relative paths keep the pending commit valid if the cache directory is moved
+    length = file_path.stat().st_size if file_path.exists() else 0
+    return f"{length}\t{os.path.relpath(path=file_path, start=commit_file_path.parent)}\n"
@@ -1,5 +1,8 @@
-from ._generate_dandiset_summaries import generate_dandiset_summaries
+from ._blob_index import build_blob_index
+from ._generate_dandiset_summaries import generate_approximate_archive_requester_count, generate_dandiset_summaries
 
 __all__ = [
+    "build_blob_index",
+    "generate_approximate_archive_requester_count",
     "generate_dandiset_summaries",
 ]
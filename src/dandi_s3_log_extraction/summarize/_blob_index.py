@@ -0,0 +1,182 @@
+"""An on-disk index of the objects of the extraction directory, appended to by every commit of the extraction."""
+
+import collections.abc
+import io
+import itertools
+import os
+import pathlib
+
+import pandas
+import s3_log_extraction
+import tqdm
+from beartype import beartype
+
+from ._columns import (
+    _BINARY_COLUMN_FILE_NAMES_AND_DTYPES,
+    _COMPACTED_FILE_NAME,
+    _IP_DICTIONARY_FILE_NAME,
+    _TIMESTAMP_LINE_WIDTH,
+    _count_binary_rows,
+    _count_compacted_rows,
+)
+from ._rollups import _COLUMN_FILE_NAMES
+
+# Each line is 'object_key, number_of_rows, number_of_bytes' for the rows appended to an object by one commit
+_BLOB_INDEX_FILE_NAME = "blob-index.tsv"
+_BLOB_INDEX_COLUMNS = ("object_key", "number_of_rows", "number_of_bytes")
+
+
+class _BlobIndex:
+    """
+    The number of rows and bytes extracted for each object of the cache, in order of first extraction.
+
+    Finding the extracted objects, checking whether an object was ever extracted, and estimating the cost of reading
+    it are lookups instead of walks of the millions of directories of the extraction tree, or a `stat` of each file.
+    The number of bytes is that of the text columns as extracted, which is not reduced by a later conversion or
+    compaction.
+    """
+
+    def __init__(self, *, extraction_directory: pathlib.Path, object_key_to_totals: dict[str, tuple[int, int]]) -> None:
+        self.extraction_directory = extraction_directory
+        self.object_key_to_totals = object_key_to_totals
+
+    def __contains__(self, object_key: str) -> bool:
+        return object_key in self.object_key_to_totals
+
+    def __iter__(self) -> collections.abc.Iterator[str]:
+        return iter(self.object_key_to_totals)
+
+    def get_number_of_bytes(self, *, blob_directory: pathlib.Path) -> int:
+        """Return the number of bytes extracted for the object of a directory, or zero if it was never extracted."""
+        object_key = blob_directory.relative_to(self.extraction_directory).as_posix()
+        return self.object_key_to_totals.get(object_key, (0, 0))[1]
+
+
+def _load_blob_index(*, cache_directory: pathlib.Path) -> _BlobIndex | None:
+    """
+    Read the blob index of a cache, if it has one.
+
+    Returns `None` for a cache extracted before the index existed (see `build_blob_index`), in which case the
+    extraction directory has to be walked instead.
+    """
+    blob_index_file_path = cache_directory / "records" / _BLOB_INDEX_FILE_NAME
+    if not blob_index_file_path.exists():
+        return None
+
+    lines = _read_blob_index_lines(blob_index_file_path=blob_index_file_path)
+    totals = lines.groupby(by="object_key", sort=False).sum()
+    object_key_to_totals = dict(
+        zip(totals.index, zip(totals["number_of_rows"].tolist(), totals["number_of_bytes"].tolist()))
+    )
+    return _BlobIndex(extraction_directory=cache_directory / "extraction", object_key_to_totals=object_key_to_totals)
+
+
+@beartype
+def build_blob_index(*, cache_directory: str | pathlib.Path | None = None) -> None:
+    """
+    Rebuild the index of the objects of the extraction directory from a walk of the extraction tree.
+
+    The extraction keeps the index of a cache up to date as it appends to it, and the summaries use the index to find
+    the extracted objects instead of walking the whole tree. This is only needed once for a cache extracted before the
+    index existed, or if the index was lost. The number of rows of text columns is derived from the size of their
+    timestamps.
+
+    This should not run while an extraction is in progress on the same cache.
+
+    Parameters
+    ----------
+    cache_directory : pathlib.Path
+        Path to the folder containing all previously extracted S3 access logs.
+        If `None`, the default cache directory from the configuration will be used.
+    """
+    cache_directory = (
+        pathlib.Path(cache_directory) if cache_directory is not None else s3_log_extraction.config.get_cache_directory()
+    )
+    extraction_directory = cache_directory / "extraction"
+
+    # In the order of the walk that the summaries would otherwise do, which that of the undetermined blobs follows
+    blob_directories = list(
+        dict.fromkeys(
+            file_path.parent
+            for file_name in ("ips.txt", _IP_DICTIONARY_FILE_NAME, _COMPACTED_FILE_NAME)
+            for file_path in extraction_directory.rglob(pattern=file_name)
+        )
+    )
+    lines = []
+    for blob_directory in tqdm.tqdm(iterable=blob_directories, desc="Indexing blobs", unit="blobs", smoothing=0):
+        timestamps_file_path = blob_directory / _COLUMN_FILE_NAMES[0]
+        number_of_rows = (
+            (timestamps_file_path.stat().st_size // _TIMESTAMP_LINE_WIDTH if timestamps_file_path.exists() else 0)
+            + _count_binary_rows(blob_directory=blob_directory)
+            + _count_compacted_rows(blob_directory=blob_directory)
+        )
+        object_key = blob_directory.relative_to(extraction_directory).as_posix()
+        lines.append(
+            _format_blob_index_line(
+                object_key=object_key,
+                number_of_rows=number_of_rows,
+                number_of_bytes=_get_blob_file_size(blob_directory=blob_directory),
+            )
+        )
+
+    blob_index_file_path = cache_directory / "records" / _BLOB_INDEX_FILE_NAME
+    blob_index_file_path.parent.mkdir(parents=True, exist_ok=True)
+    _replace_blob_index(blob_index_file_path=blob_index_file_path, lines=lines)
+
+
+def _consolidate_blob_index(*, blob_index_file_path: pathlib.Path) -> None:
+    """Replace the lines of every commit with one line per object once the former outnumber the latter twofold."""
+    lines = _read_blob_index_lines(blob_index_file_path=blob_index_file_path)
+    totals = lines.groupby(by="object_key", sort=False).sum()
+    if len(lines) <= 2 * len(totals):
+        return
+
+    consolidated_lines = [
+        _format_blob_index_line(object_key=object_key, number_of_rows=number_of_rows, number_of_bytes=number_of_bytes)
+        for object_key, number_of_rows, number_of_bytes in zip(
+            totals.index, totals["number_of_rows"].tolist(), totals["number_of_bytes"].tolist()
+        )
+    ]
+    _replace_blob_index(blob_index_file_path=blob_index_file_path, lines=consolidated_lines)
+
+
+def _read_blob_index_lines(*, blob_index_file_path: pathlib.Path) -> pandas.DataFrame:
+    content = blob_index_file_path.read_bytes()
+
+    # A line still being written by a running extraction is left for the next read
+    complete_content = content[: content.rfind(b"\n") + 1]
+    if len(complete_content) == 0:
+        return pandas.DataFrame(columns=_BLOB_INDEX_COLUMNS).astype(
+            {"number_of_rows": "int64", "number_of_bytes": "int64"}
+        )
+
+    return pandas.read_table(
+        filepath_or_buffer=io.BytesIO(complete_content),
+        header=None,
+        names=_BLOB_INDEX_COLUMNS,
+        dtype={"object_key": str, "number_of_rows": "int64", "number_of_bytes": "int64"},
+        na_filter=False,
+    )
+
+
+def _format_blob_index_line(*, object_key: str, number_of_rows: int, number_of_bytes: int) -> str:
+    return f"{object_key}\t{number_of_rows}\t{number_of_bytes}\n"
+
+
+def _replace_blob_index(*, blob_index_file_path: pathlib.Path, lines: list[str]) -> None:
+    temporary_file_path = blob_index_file_path.with_name(f"{blob_index_file_path.name}.{os.getpid()}.tmp")
+    temporary_file_path.write_text(data="".join(lines))
+    os.replace(src=temporary_file_path, dst=blob_index_file_path)
+
+
+def _get_blob_file_size(*, blob_directory: pathlib.Path) -> int:
+    """Sum the sizes of the column files of a blob in every layout."""
+    size = 0
+    binary_column_file_names = (file_name for file_name, _ in _BINARY_COLUMN_FILE_NAMES_AND_DTYPES)
+    for file_name in itertools.chain(_COLUMN_FILE_NAMES, binary_column_file_names, (_COMPACTED_FILE_NAME,)):
+        try:
+            size += (blob_directory / file_name).stat().st_size
+        except FileNotFoundError:
+            continue
+
+    return size
@@ -0,0 +1,134 @@
+"""Compact references to the extracted blobs of each Dandiset, from which their directories are derived on demand."""
+
+import collections.abc
+import pathlib
+
+import numpy
+
+
+def _get_object_key(*, content_id: str, is_zarr: bool) -> str:
+    """The key of the extracted object of a content ID, which follows the layout of the DANDI bucket."""
+    return f"zarr/{content_id}" if is_zarr else f"blobs/{content_id[:3]}/{content_id[3:6]}/{content_id}"
+
+
+class _BlobDirectories(collections.abc.Sequence):
+    """
+    The directories of a sequence of extracted blobs, each created from its content ID only when it is accessed.
+
+    The content IDs are held in a single array of fixed-width byte strings, next to a flag for those of Zarr assets,
+    which pickle to a small fraction of the size of the equivalent list of paths. Slices are views of the same arrays.
+    """
+
+    def __init__(
+        self, *, extraction_directory: pathlib.Path, content_ids: numpy.ndarray, is_zarr: numpy.ndarray
+    ) -> None:
+        self.extraction_directory = extraction_directory
+        self.content_ids = content_ids
+        self.is_zarr = is_zarr
+
+    def __len__(self) -> int:
+        return self.content_ids.size
+
+    def __getitem__(self, index: int | slice) -> "pathlib.Path | _BlobDirectories":
+        if isinstance(index, slice):
+            return _BlobDirectories(
+                extraction_directory=self.extraction_directory,
+                content_ids=self.content_ids[index],
+                is_zarr=self.is_zarr[index],
+            )
+
+        return self.extraction_directory / _get_object_key(
+            content_id=self.content_ids[index].decode(), is_zarr=bool(self.is_zarr[index])
+        )
+
+    def __iter__(self) -> collections.abc.Iterator[pathlib.Path]:
+        for content_id, is_zarr in zip(self.content_ids.tolist(), self.is_zarr.tolist()):
+            yield self.extraction_directory / _get_object_key(content_id=content_id.decode(), is_zarr=is_zarr)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, collections.abc.Sequence):
+            return NotImplemented
+
+        return list(self) == list(other)
+
+
+class _BlobReferences(collections.abc.Mapping):
+    """
+    The extracted blobs of each Dandiset, as one array of content IDs in which those of each Dandiset are contiguous.
+
+    Each Dandiset maps to a `_BlobDirectories` view of its range of the array, in the order its blobs were added.
+    """
+
+    def __init__(
+        self,
+        *,
+        extraction_directory: pathlib.Path,
+        content_ids: numpy.ndarray,
+        is_zarr: numpy.ndarray,
+        dandiset_id_to_range: dict[str, tuple[int, int]],
+    ) -> None:
+        self.extraction_directory = extraction_directory
+        self.content_ids = content_ids
+        self.is_zarr = is_zarr
+        self.dandiset_id_to_range = dandiset_id_to_range
+
+    def __len__(self) -> int:
+        return len(self.dandiset_id_to_range)
+
+    def __iter__(self) -> collections.abc.Iterator[str]:
+        return iter(self.dandiset_id_to_range)
+
+    def __getitem__(self, dandiset_id: str) -> _BlobDirectories:
+        start, end = self.dandiset_id_to_range[dandiset_id]
+        return _BlobDirectories(
+            extraction_directory=self.extraction_directory,
+            content_ids=self.content_ids[start:end],
+            is_zarr=self.is_zarr[start:end],
+        )
+
+    def find_dandiset_ids(self, *, content_ids: collections.abc.Iterable[str]) -> set[str]:
+        """Find the Dandisets of the blobs of some content IDs, ignoring those that are not referenced."""
+        keys = numpy.array([content_id.encode() for content_id in content_ids], dtype=bytes)
+        if self.content_ids.size == 0 or keys.size == 0:
+            return set()
+
+        order = numpy.argsort(self.content_ids, kind="stable")
+        sorted_content_ids = self.content_ids[order]
+        positions = numpy.minimum(numpy.searchsorted(sorted_content_ids, keys), sorted_content_ids.size - 1)
+        blob_positions = order[positions[sorted_content_ids[positions] == keys]]
+
+        # The ranges of the Dandisets are contiguous and in the order of the array
+        dandiset_ids = list(self.dandiset_id_to_range)
+        range_starts = numpy.array([start for start, _ in self.dandiset_id_to_range.values()], dtype=numpy.int64)
+        dandiset_indices = numpy.searchsorted(range_starts, blob_positions, side="right") - 1
+        return {dandiset_ids[dandiset_index] for dandiset_index in dandiset_indices.tolist()}
+
+
+def _build_blob_references(
+    *, extraction_directory: pathlib.Path, dandiset_ids: list[str], content_ids: list[str], is_zarr: list[bool]
+) -> _BlobReferences:
+    """Group blobs by Dandiset, in order of the first blob of each Dandiset, keeping the order of the blobs of each."""
+    dandiset_id_array = numpy.array(dandiset_ids, dtype=str)
+    unique_dandiset_ids, first_indices, group_indices = numpy.unique(
+        dandiset_id_array, return_index=True, return_inverse=True
+    )
+    group_order = numpy.argsort(first_indices, kind="stable")
+    group_ranks = numpy.empty(shape=group_order.size, dtype=numpy.int64)
+    group_ranks[group_order] = numpy.arange(group_order.size)
+    order = numpy.argsort(group_ranks[group_indices], kind="stable")
+
+    counts = numpy.bincount(group_indices, minlength=unique_dandiset_ids.size)[group_order]
+    ends = numpy.cumsum(counts)
+    dandiset_id_to_range = {
+        dandiset_id: (start, end)
+        for dandiset_id, start, end in zip(
+            unique_dandiset_ids[group_order].tolist(), (ends - counts).tolist(), ends.tolist()
+        )
+    }
+
+    return _BlobReferences(
+        extraction_directory=extraction_directory,
+        content_ids=numpy.array([content_id.encode() for content_id in content_ids], dtype=bytes)[order],
+        is_zarr=numpy.array(is_zarr, dtype=bool)[order],
+        dandiset_id_to_range=dandiset_id_to_range,
+    )
@@ -0,0 +1,198 @@
+"""Vectorized loading of the per-blob column files written by the extraction step."""
+
+import collections.abc
+import pathlib
+
+import numpy
+
+# Each line of `timestamps.txt` is 'YYMMDDhhmmss' followed by a newline
+_TIMESTAMP_LINE_WIDTH = 13
+_DAY_KEY_DIGIT_WEIGHTS = numpy.array([100_000, 10_000, 1_000, 100, 10, 1], dtype=numpy.int32)
+_SECONDS_PER_DAY = 86_400
+
+# Opt-in compact layout written by `convert_to_binary_columns` in place of the text columns: fixed-width little-endian
+# arrays of epoch seconds, bytes sent, indices into the distinct IPs of the blob, and download flags
+_BINARY_COLUMN_FILE_NAMES_AND_DTYPES = (
+    ("timestamps.u32", numpy.dtype("<u4")),
+    ("bytes_sent.u64", numpy.dtype("<u8")),
+    ("ip_indices.u32", numpy.dtype("<u4")),
+    ("download.u8", numpy.dtype("u1")),
+)
+_IP_DICTIONARY_FILE_NAME = "ip_dictionary.txt"
+# Opt-in archive written by `compact_extraction`: the rows of a blob sorted by time, as chunks of zlib-compressed
+# columns in which each timestamp is stored as the number of seconds since the previous one
+_COMPACTED_FILE_NAME = "compacted.npz"
+
+
+def _parse_integer_column(*, content: bytes, dtype: type[numpy.integer]) -> numpy.ndarray:
+    """Parse newline-separated non-negative integers directly into a typed array."""
+    return numpy.fromstring(content, dtype=dtype, sep="\n")
+
+
+def _parse_day_keys(*, content: bytes) -> numpy.ndarray:
+    """
+    Decode the content of a `timestamps.txt` file into integer day keys of the form YYMMDD.
+
+    Lines written by the extraction script all have the same width, in which case the leading six digits of each
+    line are decoded in bulk from the raw bytes; otherwise, each line is parsed as a whole number and truncated.
+    """
+    buffer = numpy.frombuffer(buffer=content, dtype=numpy.uint8)
+    if buffer.size % _TIMESTAMP_LINE_WIDTH == 0 and numpy.all(
+        buffer[_TIMESTAMP_LINE_WIDTH - 1 :: _TIMESTAMP_LINE_WIDTH] == ord("\n")
+    ):
+        digits = buffer.reshape(-1, _TIMESTAMP_LINE_WIDTH)[:, :6].astype(numpy.int32) - ord("0")
+        return digits @ _DAY_KEY_DIGIT_WEIGHTS
+
+    timestamps = numpy.fromstring(content, dtype=numpy.int64, sep="\n")
+    return (timestamps // 1_000_000).astype(numpy.int32)
+
+
+def _parse_ip_column(*, content: bytes) -> numpy.ndarray:
+    """Split the content of an `ips.txt` file into an array of byte strings, one per request."""
+    return numpy.array(content.split(), dtype=bytes)
+
+
+def _read_integer_column(*, file_path: pathlib.Path, dtype: type[numpy.integer]) -> numpy.ndarray:
+    if not file_path.exists():
+        return numpy.empty(shape=0, dtype=dtype)
+
+    return _parse_integer_column(content=file_path.read_bytes(), dtype=dtype)
+
+
+def _read_day_keys(*, file_path: pathlib.Path) -> numpy.ndarray:
+    if not file_path.exists():
+        return numpy.empty(shape=0, dtype=numpy.int32)
+
+    return _parse_day_keys(content=file_path.read_bytes())
+
+
+def _read_ip_column(*, file_path: pathlib.Path) -> numpy.ndarray:
+    if not file_path.exists():
+        return numpy.empty(shape=0, dtype="S1")
+
+    return _parse_ip_column(content=file_path.read_bytes())
+
+
+def _parse_epoch_seconds(*, content: bytes) -> numpy.ndarray:
+    """Decode the content of a `timestamps.txt` file into seconds since the Unix epoch (all timestamps are UTC)."""
+    timestamps = numpy.fromstring(content, dtype=numpy.int64, sep="\n")
+
+    # Each timestamp has the digits YYMMDDhhmmss
+    seconds, timestamps = timestamps % 100, timestamps // 100
+    minutes, timestamps = timestamps % 100, timestamps // 100
+    hours, timestamps = timestamps % 100, timestamps // 100
+    days, timestamps = timestamps % 100, timestamps // 100
+    months, years = timestamps % 100, timestamps // 100
+
+    months_since_epoch = (2000 + years - 1970) * 12 + months - 1
+    days_since_epoch = months_since_epoch.astype("datetime64[M]").astype("datetime64[D]").astype(numpy.int64) + days - 1
+    return days_since_epoch * _SECONDS_PER_DAY + hours * 3_600 + minutes * 60 + seconds
+
+
+def _epoch_seconds_to_day_keys(*, epoch_seconds: numpy.ndarray) -> numpy.ndarray:
+    """Convert seconds since the Unix epoch into integer day keys of the form YYMMDD."""
+    days_since_epoch, day_indices = numpy.unique(
+        epoch_seconds.astype(numpy.int64) // _SECONDS_PER_DAY, return_inverse=True
+    )
+
+    # Calendar fields are only computed once per distinct day
+    dates = days_since_epoch.astype("datetime64[D]")
+    month_starts = dates.astype("datetime64[M]")
+    years = month_starts.astype("datetime64[Y]").astype(numpy.int64) + 1970
+    months = month_starts.astype(numpy.int64) % 12 + 1
+    days = (dates - month_starts.astype("datetime64[D]")).astype(numpy.int64) + 1
+
+    day_keys = ((years % 100) * 10_000 + months * 100 + days).astype(numpy.int32)
+    return day_keys[day_indices]
+
+
+def _read_binary_column(*, file_path: pathlib.Path, dtype: numpy.dtype) -> numpy.ndarray:
+    """Map a fixed-width binary column into memory without reading or parsing it up front."""
+    if not file_path.exists() or file_path.stat().st_size < dtype.itemsize:
+        return numpy.empty(shape=0, dtype=dtype)
+
+    number_of_rows = file_path.stat().st_size // dtype.itemsize
+    return numpy.memmap(filename=file_path, dtype=dtype, mode="r", shape=(number_of_rows,))
+
+
+def _read_ip_dictionary(*, file_path: pathlib.Path) -> numpy.ndarray:
+    """Read the distinct IPs of a blob in the binary layout, in the order of the indices that refer to them."""
+    return _read_ip_column(file_path=file_path)
+
+
+def _count_binary_rows(*, blob_directory: pathlib.Path) -> int:
+    """Return the number of rows present in every binary column of a blob (zero if it was never converted)."""
+    row_counts = []
+    for file_name, dtype in _BINARY_COLUMN_FILE_NAMES_AND_DTYPES:
+        file_path = blob_directory / file_name
+        row_counts.append(file_path.stat().st_size // dtype.itemsize if file_path.exists() else 0)
+
+    return min(row_counts)
+
+
+def _read_binary_columns(
+    *, blob_directory: pathlib.Path
+) -> tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+    """
+    Map the binary columns of a blob into memory.
+
+    Returns
+    -------
+    epoch_seconds, bytes_sent, ip_indices, downloads : numpy.ndarray
+        One entry per request, truncated to the rows present in every column.
+    ip_dictionary : numpy.ndarray
+        The distinct IPs referred to by `ip_indices`.
+    """
+    number_of_rows = _count_binary_rows(blob_directory=blob_directory)
+    columns = tuple(
+        _read_binary_column(file_path=blob_directory / file_name, dtype=dtype)[:number_of_rows]
+        for file_name, dtype in _BINARY_COLUMN_FILE_NAMES_AND_DTYPES
+    )
+    ip_dictionary = _read_ip_dictionary(file_path=blob_directory / _IP_DICTIONARY_FILE_NAME)
+
+    return (*columns, ip_dictionary)
+
+
+def _count_compacted_rows(*, blob_directory: pathlib.Path) -> int:
+    """Return the number of rows in the compacted archive of a blob (zero if it was never compacted)."""
+    file_path = blob_directory / _COMPACTED_FILE_NAME
+    if not file_path.exists():
+        return 0
+
+    with numpy.load(file=file_path, allow_pickle=False) as archive:
+        return int(archive["chunk_sizes"].sum())
+
+
+def _read_compacted_ip_dictionary(*, blob_directory: pathlib.Path) -> numpy.ndarray:
+    """Read the distinct IPs referred to by the compacted rows of a blob."""
+    file_path = blob_directory / _COMPACTED_FILE_NAME
+    if not file_path.exists():
+        return numpy.empty(shape=0, dtype="S1")
+
+    with numpy.load(file=file_path, allow_pickle=False) as archive:
+        return archive["ip_dictionary"]
+
+
+def _iterate_compacted_chunks(
+    *, blob_directory: pathlib.Path
+) -> collections.abc.Iterator[tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray]]:
+    """
+    Decompress the chunks of the compacted archive of a blob one at a time, in order of time.
+
+    Yields
+    ------
+    epoch_seconds, bytes_sent, ip_indices, downloads : numpy.ndarray
+        One entry per request of the chunk; `ip_indices` refer to `_read_compacted_ip_dictionary`.
+    """
+    file_path = blob_directory / _COMPACTED_FILE_NAME
+    if not file_path.exists():
+        return
+
+    with numpy.load(file=file_path, allow_pickle=False) as archive:
+        for index, first_epoch_seconds in enumerate(archive["chunk_first_epoch_seconds"].tolist()):
+            yield (
+                first_epoch_seconds + numpy.cumsum(archive[f"epoch_second_deltas_{index}"], dtype=numpy.int64),
+                archive[f"bytes_sent_{index}"],
+                archive[f"ip_indices_{index}"],
+                archive[f"download_{index}"],
+            )
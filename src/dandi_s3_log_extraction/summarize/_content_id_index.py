@@ -0,0 +1,142 @@
+"""A memory-mapped copy of the mapping of content IDs to the Dandisets and paths that use them, kept in the cache."""
+
+import collections.abc
+import json
+import os
+import pathlib
+
+import numpy
+
+_CONTENT_ID_INDEX_DIRECTORY_NAME = "content-id-index"
+# Describes the version of the mapping that the index was built from; written last, so an index without it is partial
+_SOURCE_FILE_NAME = "source.json"
+# Bounds the memory used to decode the index while iterating over it
+_ITERATION_CHUNK_SIZE = 100_000
+
+
+class _ContentIDIndex(collections.abc.Mapping):
+    """
+    The asset path of each content ID of the mapping, in the order of the mapping, along with its Dandiset ID.
+
+    The content IDs are stored sorted, next to their Dandiset IDs and the offsets of their UTF-8 encoded paths into a
+    single byte array, as `.npy` files that are memory mapped instead of read. A lookup is a binary search over the
+    content IDs, and the worker processes that receive the index map the same files instead of unpickling a copy.
+    Only the first Dandiset and path listed for each content ID are kept, since those are the only ones summarized.
+    """
+
+    def __init__(self, *, directory: pathlib.Path) -> None:
+        self.directory = directory
+        self.content_ids = numpy.load(file=directory / "content_ids.npy", mmap_mode="r")
+        self.dandiset_ids = numpy.load(file=directory / "dandiset_ids.npy", mmap_mode="r")
+        self.asset_path_offsets = numpy.load(file=directory / "asset_path_offsets.npy", mmap_mode="r")
+        self.asset_paths = numpy.load(file=directory / "asset_paths.npy", mmap_mode="r")
+        # The position in the sorted arrays of each content ID, in the order of the mapping
+        self.mapping_order = numpy.load(file=directory / "mapping_order.npy", mmap_mode="r")
+
+    def __getstate__(self) -> dict[str, pathlib.Path]:
+        return {"directory": self.directory}
+
+    def __setstate__(self, state: dict[str, pathlib.Path]) -> None:
+        self.__init__(directory=state["directory"])
+
+    def __len__(self) -> int:
+        return self.content_ids.size
+
+    def __iter__(self) -> collections.abc.Iterator[str]:
+        for content_id, _, _ in self.iterate_associations():
+            yield content_id
+
+    def __contains__(self, content_id: object) -> bool:
+        return isinstance(content_id, str) and self._find_position(content_id=content_id) >= 0
+
+    def __getitem__(self, content_id: str) -> str:
+        position = self._find_position(content_id=content_id)
+        if position < 0:
+            raise KeyError(content_id)
+
+        return self._get_asset_path(position=position)
+
+    def get_dandiset_ids(self) -> list[str]:
+        """The sorted IDs of the Dandisets that the content IDs of the mapping are first associated with."""
+        return [dandiset_id.decode() for dandiset_id in numpy.unique(self.dandiset_ids).tolist()]
+
+    def contains(self, *, content_ids: list[str]) -> numpy.ndarray:
+        """Check whether each of many content IDs is in the mapping with a single vectorized binary search."""
+        if self.content_ids.size == 0 or len(content_ids) == 0:
+            return numpy.zeros(shape=len(content_ids), dtype=bool)
+
+        keys = numpy.array([content_id.encode() for content_id in content_ids], dtype=bytes)
+        positions = numpy.minimum(numpy.searchsorted(self.content_ids, keys), self.content_ids.size - 1)
+        return self.content_ids[positions] == keys
+
+    def iterate_associations(self) -> collections.abc.Iterator[tuple[str, str, str]]:
+        """Yield the content ID, Dandiset ID, and asset path of each entry, in the order of the mapping."""
+        # The entries are visited out of their sorted order, so the paths are copied out of the map once instead
+        asset_paths = self.asset_paths.tobytes()
+        for start in range(0, self.mapping_order.size, _ITERATION_CHUNK_SIZE):
+            positions = numpy.asarray(self.mapping_order[start : start + _ITERATION_CHUNK_SIZE])
+            for content_id, dandiset_id, path_start, path_end in zip(
+                self.content_ids[positions].tolist(),
+                self.dandiset_ids[positions].tolist(),
+                self.asset_path_offsets[positions].tolist(),
+                self.asset_path_offsets[positions + 1].tolist(),
+            ):
+                yield content_id.decode(), dandiset_id.decode(), asset_paths[path_start:path_end].decode()
+
+    def _find_position(self, *, content_id: str) -> int:
+        key = content_id.encode()
+        position = int(numpy.searchsorted(self.content_ids, key))
+        if position == self.content_ids.size or self.content_ids[position] != key:
+            return -1
+
+        return position
+
+    def _get_asset_path(self, *, position: int) -> str:
+        start, end = self.asset_path_offsets[position : position + 2].tolist()
+        return self.asset_paths[start:end].tobytes().decode()
+
+
+def _read_content_id_index_source(*, directory: pathlib.Path) -> dict[str, str | int | None]:
+    """Read the description of the mapping that the index was built from, or an empty one if there is no index."""
+    source_file_path = directory / _SOURCE_FILE_NAME
+    if not source_file_path.exists():
+        return dict()
+
+    return json.loads(source_file_path.read_text())
+
+
+def _write_content_id_index(
+    *,
+    directory: pathlib.Path,
+    content_id_to_usage_dandiset_path: dict[str, dict[str, str]],
+    source: dict[str, str | int | None],
+) -> None:
+    """Replace the index with one built from a parsed mapping, recording the `source` it was read from last."""
+    content_ids = list(content_id_to_usage_dandiset_path)
+    first_usages = [next(iter(usage.items())) for usage in content_id_to_usage_dandiset_path.values()]
+
+    content_id_array = numpy.array([content_id.encode() for content_id in content_ids], dtype=bytes)
+    order = numpy.argsort(content_id_array, kind="stable")
+    encoded_asset_paths = [first_usages[index][1].encode() for index in order.tolist()]
+    mapping_order = numpy.empty(shape=order.size, dtype=numpy.int64)
+    mapping_order[order] = numpy.arange(order.size)
+
+    arrays = {
+        "content_ids.npy": content_id_array[order],
+        "dandiset_ids.npy": numpy.array([dandiset_id.encode() for dandiset_id, _ in first_usages], dtype=bytes)[order],
+        "asset_path_offsets.npy": numpy.cumsum([0] + [len(asset_path) for asset_path in encoded_asset_paths]),
+        "asset_paths.npy": numpy.frombuffer(b"".join(encoded_asset_paths), dtype=numpy.uint8),
+        "mapping_order.npy": mapping_order,
+    }
+
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / _SOURCE_FILE_NAME).unlink(missing_ok=True)
+    for file_name, array in arrays.items():
+        temporary_file_path = directory / f"{file_name}.tmp"
+        with temporary_file_path.open(mode="wb") as file_stream:
+            numpy.save(file=file_stream, arr=array)
+        os.replace(src=temporary_file_path, dst=directory / file_name)
+
+    temporary_source_file_path = directory / f"{_SOURCE_FILE_NAME}.tmp"
+    temporary_source_file_path.write_text(data=json.dumps(source))
+    os.replace(src=temporary_source_file_path, dst=directory / _SOURCE_FILE_NAME)
@@ -1,17 +1,51 @@
 import collections
+import collections.abc
 import concurrent.futures
+import dataclasses
 import datetime
+import functools
 import gzip
 import itertools
 import json
+import os
 import pathlib
+import time
+import urllib.parse
+import urllib.request
+import warnings
 
+import numpy
 import pandas
 import requests
 import s3_log_extraction
 import tqdm
 from beartype import beartype
 
+from ._blob_index import _BlobIndex, _get_blob_file_size, _load_blob_index
+from ._blob_references import _BlobReferences, _build_blob_references, _get_object_key
+from ._columns import (
+    _COMPACTED_FILE_NAME,
+    _IP_DICTIONARY_FILE_NAME,
+    _read_compacted_ip_dictionary,
+    _read_ip_column,
+    _read_ip_dictionary,
+)
+from ._content_id_index import (
+    _CONTENT_ID_INDEX_DIRECTORY_NAME,
+    _ContentIDIndex,
+    _read_content_id_index_source,
+    _write_content_id_index,
+)
+from ._ip_index import _IPIndex
+from ._rollups import _BlobRollup, _BlobRollupStore, _read_blob_rollup
+from ._sketches import (
+    _add_sparse_sketch,
+    _estimate_cardinality,
+    _get_sketch_file_path,
+    _new_registers,
+    _union_sketch_files,
+)
+from .._journal._utils import _JOURNAL_CURSOR_DIRECTORY_NAME, _read_journal, _save_journal_cursor
 from .._parallel._utils import _handle_max_workers
 
 ASSET_TYPES_IN_ORDER = ("Neurophysiology", "Microscopy", "Video", "Miscellaneous")
@@ -30,6 +64,11 @@ def generate_dandiset_summaries(
     content_id_to_usage_dandiset_path_url: str | None = None,
     api_url: str | None = None,
     unassociated: bool = False,
+    full_reparse: bool = False,
+    incremental: bool = False,
+    approximate_requester_counts: bool = False,
+    offline: bool = False,
+    dandiset_listing_max_age_hours: float = 24.0,
 ) -> None:
     """
     Generate top-level summaries of access activity for all Dandisets.
@@ -49,16 +88,33 @@ def generate_dandiset_summaries(
     skip : list of strings, optional
         A list of Dandiset IDs to exclude when generating summaries.
     content_id_to_usage_dandiset_path_url : str, optional
-        URL to retrieve the mapping of content IDs to Dandiset paths.
+        URL to retrieve the mapping of content IDs to Dandiset paths, or a local path (or `file://` URL) to a copy.
         Defaults to the pre-generated mapping stored in the `dandi-cache` GitHub repository.
+        The mapping is kept in the cache directory and is only downloaded again when the server reports a change.
     api_url : str, optional
         Base API URL of the server to interact with.
         Defaults to using the main DANDI API server.
     unassociated : bool, optional
         Whether to generate summaries based on current undetermined status.
+    full_reparse : bool, optional
+        Whether to ignore the per-blob rollups remembered by previous runs and parse every extracted file in full.
+        By default, only the rows appended to each blob since the previous run are parsed.
+    incremental : bool, optional
+        Whether to only regenerate the summaries of Dandisets with blobs that the extraction journal records as
+        appended to since the previous run that covered all Dandisets.
+        The list of Dandisets is then not requested from the DANDI API.
+        Changes to the content ID mapping alone are only reflected by a run that is not incremental.
+    approximate_requester_counts : bool, optional
+        Whether to estimate the number of unique requesters of each Dandiset from the union of per-blob HyperLogLog
+        sketches instead of holding every distinct IP in memory. The estimate has a relative error of about 0.8%.
+        The sketch of each Dandiset is saved either way, so the archive-wide count can be merged from them.
+    offline : bool, optional
+        Whether to run without any network access, using the copy of the content ID mapping kept in the cache.
+        The list of Dandisets is then derived from the Dandisets of the mapping instead of requested from the DANDI API.
+    dandiset_listing_max_age_hours : float, default: 24.0
+        The list of Dandisets from the DANDI API is kept in the cache, and only requested again once it is older than
+        this many hours.
     """
-    import dandi.dandiapi
-
     cache_directory = (
         pathlib.Path(cache_directory) if cache_directory is not None else s3_log_extraction.config.get_cache_directory()
     )
@@ -70,49 +126,118 @@ def generate_dandiset_summaries(
         message = "Cannot specify both `pick` and `skip` parameters simultaneously."
         raise ValueError(message)
     max_workers = _handle_max_workers(workers=workers)
+    rollup_store = _BlobRollupStore(cache_directory=cache_directory, full_reparse=full_reparse)
 
     content_id_to_usage_dandiset_path_url = content_id_to_usage_dandiset_path_url or (
         "https://raw.githubusercontent.com/dandi-cache/content-id-to-usage-dandiset-path/"
         "refs/heads/min/derivatives/content_id_to_usage_dandiset_path.min.json.gz"
     )
 
-    ip_to_region = s3_log_extraction.ip_utils.load_ip_cache(
-        cache_type="ip_to_region", cache_directory=cache_directory, use_encryption=False
+    # Listing the Dandisets pages through the DANDI API, which runs while the IP cache and the mapping are loaded
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as listing_executor:
+        dandiset_ids_future = None
+        if not unassociated and not incremental and pick is None and not offline:
+            dandiset_ids_future = listing_executor.submit(
+                _get_dandiset_ids,
+                api_url=api_url,
+                cache_directory=cache_directory,
+                max_age_hours=dandiset_listing_max_age_hours,
+            )
+
+        ip_to_region = s3_log_extraction.ip_utils.load_ip_cache(
+            cache_type="ip_to_region", cache_directory=cache_directory, use_encryption=False
+        )
+        ip_index = _IPIndex(ip_to_region=ip_to_region)
+
+        content_id_to_usage_dandiset_path = _get_content_id_index(
+            content_id_to_usage_dandiset_path_url=content_id_to_usage_dandiset_path_url,
+            cache_directory=cache_directory,
+            offline=offline,
+        )
+        listed_dandiset_ids = dandiset_ids_future.result() if dandiset_ids_future is not None else None
+
+    # Offline runs summarize the Dandisets of the mapping instead
+    if offline:
+        listed_dandiset_ids = content_id_to_usage_dandiset_path.get_dandiset_ids()
+
+    blob_index = _load_blob_index(cache_directory=cache_directory)
+
+    # The journal is only consumed by runs that cover every Dandiset touched since it was last read
+    consume_journal = pick is None and skip is None
+    journal_cursor_file_path = (
+        cache_directory / _JOURNAL_CURSOR_DIRECTORY_NAME / ("unassociated.json" if unassociated else "associated.json")
+    )
+    touched_object_keys, journal_offsets = _read_journal(
+        cache_directory=cache_directory, cursor_file_path=journal_cursor_file_path
     )
 
     if unassociated:
+        touched_blob_ids = {object_key.split("/")[-1] for object_key in touched_object_keys}
+        if incremental and all(blob_id in content_id_to_usage_dandiset_path for blob_id in touched_blob_ids):
+            _save_journal_cursor(cursor_file_path=journal_cursor_file_path, offsets=journal_offsets)
+            return  # No activity was appended to any undetermined blob since the previous run
+
         dandiset_id_to_local_content_directories, content_id_to_dandiset_path = _get_undetermined_dandi_asset_info(
-            content_id_to_usage_dandiset_path_url=content_id_to_usage_dandiset_path_url,
+            content_id_to_usage_dandiset_path=content_id_to_usage_dandiset_path,
             cache_directory=cache_directory,
+            blob_index=blob_index,
         )
 
         # Special key for no current association
         dandiset_id = "undetermined"
-        _summarize_dandiset(
-            dandiset_id=dandiset_id,
-            blob_directories=dandiset_id_to_local_content_directories.get(dandiset_id, []),
-            summary_directory=summary_directory,
-            ip_to_region=ip_to_region,
-            blob_id_to_asset_path=content_id_to_dandiset_path,
-        )
+        if max_workers == 1:
+            _summarize_dandiset(
+                dandiset_id=dandiset_id,
+                blob_directories=dandiset_id_to_local_content_directories.get(dandiset_id, []),
+                summary_directory=summary_directory,
+                ip_index=ip_index,
+                blob_id_to_asset_path=content_id_to_dandiset_path,
+                rollup_store=rollup_store,
+                approximate_requester_counts=approximate_requester_counts,
+            )
+        else:
+            # Every unmatched blob in the tree lands in this one bucket, so it is split into shards across workers
+            _summarize_dandisets_in_parallel(
+                dandiset_id_to_blob_directories={
+                    dandiset_id: dandiset_id_to_local_content_directories.get(dandiset_id, [])
+                },
+                summary_directory=summary_directory,
+                ip_index=ip_index,
+                blob_id_to_asset_path=content_id_to_dandiset_path,
+                rollup_store=rollup_store,
+                approximate_requester_counts=approximate_requester_counts,
+                max_workers=max_workers,
+                blob_index=blob_index,
+            )
     else:
         dandiset_id_to_local_content_directories, content_id_to_dandiset_path = _get_determinable_dandi_asset_info(
-            content_id_to_usage_dandiset_path_url=content_id_to_usage_dandiset_path_url,
+            content_id_to_usage_dandiset_path=content_id_to_usage_dandiset_path,
             cache_directory=cache_directory,
+            blob_index=blob_index,
         )
 
-        client = dandi.dandiapi.DandiAPIClient(api_url=api_url)
-        if pick is None and skip is not None:
-            dandiset_ids_to_exclude = {dandiset_id: True for dandiset_id in skip}
-            dandiset_ids_to_summarize = [
-                dandiset.identifier
-                for dandiset in client.get_dandisets()
-                if dandiset_ids_to_exclude.get(dandiset.identifier, False) is False
-            ]
-        elif pick is not None and skip is None:
+        if incremental:
+            dandiset_ids_to_summarize = _get_touched_dandiset_ids(
+                touched_object_keys=touched_object_keys,
+                dandiset_id_to_local_content_directories=dandiset_id_to_local_content_directories,
+            )
+            if pick is not None:
+                touched_dandiset_ids = set(dandiset_ids_to_summarize)
+                dandiset_ids_to_summarize = [dandiset_id for dandiset_id in pick if dandiset_id in touched_dandiset_ids]
+            elif skip is not None:
+                dandiset_ids_to_exclude = set(skip)
+                dandiset_ids_to_summarize = [
+                    dandiset_id
+                    for dandiset_id in dandiset_ids_to_summarize
+                    if dandiset_id not in dandiset_ids_to_exclude
+                ]
+        elif pick is not None:
             dandiset_ids_to_summarize = pick
         else:
-            dandiset_ids_to_summarize = [dandiset.identifier for dandiset in client.get_dandisets()]
+            dandiset_ids_to_exclude = set(skip) if skip is not None else set()
+            dandiset_ids_to_summarize = [
+                dandiset_id for dandiset_id in listed_dandiset_ids if dandiset_id not in dandiset_ids_to_exclude
+            ]
 
         if max_workers == 1:
             for dandiset_id in tqdm.tqdm(
@@ -131,102 +256,489 @@ def generate_dandiset_summaries(
                     dandiset_id=dandiset_id,
                     blob_directories=blob_directories,
                     summary_directory=summary_directory,
-                    ip_to_region=ip_to_region,
+                    ip_index=ip_index,
                     blob_id_to_asset_path=content_id_to_dandiset_path,
+                    rollup_store=rollup_store,
+                    approximate_requester_counts=approximate_requester_counts,
                 )
         else:
-            with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
-                futures = [
-                    executor.submit(
-                        _summarize_dandiset,
-                        dandiset_id=dandiset_id,
-                        blob_directories=dandiset_id_to_local_content_directories.get(dandiset_id, []),
-                        summary_directory=summary_directory,
-                        ip_to_region=ip_to_region,
-                        blob_id_to_asset_path=content_id_to_dandiset_path,
-                    )
+            _summarize_dandisets_in_parallel(
+                dandiset_id_to_blob_directories={
+                    dandiset_id: dandiset_id_to_local_content_directories.get(dandiset_id, [])
                     for dandiset_id in dandiset_ids_to_summarize
-                ]
-                collections.deque(
-                    (
-                        future.result()
-                        for future in tqdm.tqdm(
-                            iterable=concurrent.futures.as_completed(futures),
-                            total=len(dandiset_ids_to_summarize),
-                            desc="Summarizing Dandisets",
-                            position=0,
-                            leave=True,
-                            mininterval=5.0,
-                            smoothing=0,
-                            unit="dandisets",
-                        )
-                    ),
-                    maxlen=0,
+                },
+                summary_directory=summary_directory,
+                ip_index=ip_index,
+                blob_id_to_asset_path=content_id_to_dandiset_path,
+                rollup_store=rollup_store,
+                approximate_requester_counts=approximate_requester_counts,
+                max_workers=max_workers,
+                blob_index=blob_index,
+            )
+
+    if consume_journal:
+        _save_journal_cursor(cursor_file_path=journal_cursor_file_path, offsets=journal_offsets)
+
+
+# The list of Dandisets from the DANDI API, along with the API URL and time that it was requested from and at
+_DANDISET_LISTING_FILE_NAME = "dandiset-listing.json"
+# Dandisets with more blobs than this are aggregated in shards by separate workers and then reduced
+_BLOBS_PER_SHARD = 1_000
+# Dandisets whose column files total less than this are summarized together in batches of up to the same size
+_SMALL_DANDISET_BYTES = 4 * 1024**2
+# Requester indices buffered before they are first deduplicated, so that blobs are not deduplicated one at a time
+_PENDING_REQUESTERS_MINIMUM = 100_000
+
+
+@dataclasses.dataclass
+class _SummaryTask:
+    """A unit of work for the summary worker pool: either whole Dandisets, or a single shard of one Dandiset."""
+
+    dandiset_id_to_blob_directories: dict[str, collections.abc.Sequence[pathlib.Path]]
+    cost: int
+    shard_index: int | None = None
+
+
+def _plan_summary_tasks(
+    *,
+    dandiset_id_to_blob_directories: collections.abc.Mapping[str, collections.abc.Sequence[pathlib.Path]],
+    blob_index: _BlobIndex | None = None,
+) -> list[_SummaryTask]:
+    """
+    Group the Dandisets to summarize into tasks ordered from the most to the least expensive.
+
+    The cost of a task is estimated from the size of the column files of its blobs, as recorded by the `blob_index` if
+    there is one, or otherwise as found on disk. Submitting the largest tasks first keeps them from starting last and
+    dominating the total run time, while batching the many tiny Dandisets cuts the overhead of one future each.
+    Shards are slices of the blob directories of a Dandiset, which for `_BlobDirectories` are views that pickle only
+    their own content IDs.
+    """
+    tasks: list[_SummaryTask] = []
+    small_dandiset_batch = _SummaryTask(dandiset_id_to_blob_directories=dict(), cost=0)
+    for dandiset_id, blob_directories in dandiset_id_to_blob_directories.items():
+        if len(blob_directories) > _BLOBS_PER_SHARD:
+            shards = (
+                blob_directories[start : start + _BLOBS_PER_SHARD]
+                for start in range(0, len(blob_directories), _BLOBS_PER_SHARD)
+            )
+            for shard_index, shard in enumerate(shards):
+                tasks.append(
+                    _SummaryTask(
+                        dandiset_id_to_blob_directories={dandiset_id: shard},
+                        cost=sum(
+                            _estimate_blob_cost(blob_directory=blob_directory, blob_index=blob_index)
+                            for blob_directory in shard
+                        ),
+                        shard_index=shard_index,
+                    )
                 )
+            continue
 
+        cost = sum(
+            _estimate_blob_cost(blob_directory=blob_directory, blob_index=blob_index)
+            for blob_directory in blob_directories
+        )
+        if cost >= _SMALL_DANDISET_BYTES:
+            tasks.append(_SummaryTask(dandiset_id_to_blob_directories={dandiset_id: blob_directories}, cost=cost))
+            continue
 
-def _get_determinable_dandi_asset_info(
+        if small_dandiset_batch.cost + cost > _SMALL_DANDISET_BYTES:
+            tasks.append(small_dandiset_batch)
+            small_dandiset_batch = _SummaryTask(dandiset_id_to_blob_directories=dict(), cost=0)
+        small_dandiset_batch.dandiset_id_to_blob_directories[dandiset_id] = blob_directories
+        small_dandiset_batch.cost += cost
+    if small_dandiset_batch.dandiset_id_to_blob_directories:
+        tasks.append(small_dandiset_batch)
+
+    tasks.sort(key=lambda task: task.cost, reverse=True)
+    return tasks
+
+
+def _estimate_blob_cost(*, blob_directory: pathlib.Path, blob_index: _BlobIndex | None = None) -> int:
+    if blob_index is not None:
+        return blob_index.get_number_of_bytes(blob_directory=blob_directory)
+
+    return _get_blob_file_size(blob_directory=blob_directory)
+
+
+def _summarize_dandisets_in_parallel(
     *,
-    content_id_to_usage_dandiset_path_url: str,
-    cache_directory: pathlib.Path,
-) -> tuple[dict[str, list[pathlib.Path]], dict[str, str]]:
-    extraction_directory = cache_directory / "extraction"
+    dandiset_id_to_blob_directories: dict[str, collections.abc.Sequence[pathlib.Path]],
+    summary_directory: pathlib.Path,
+    ip_index: _IPIndex,
+    blob_id_to_asset_path: collections.abc.Mapping[str, str],
+    rollup_store: _BlobRollupStore | None,
+    approximate_requester_counts: bool,
+    max_workers: int,
+    blob_index: _BlobIndex | None = None,
+) -> None:
+    """
+    Summarize each Dandiset in a pool of worker processes, following the plan of `_plan_summary_tasks`.
+
+    The partial activity of each shard of a large Dandiset is sent back to the main process, where the shards are
+    merged in order and the summaries are written once all of them have completed.
+    """
+    tasks = _plan_summary_tasks(dandiset_id_to_blob_directories=dandiset_id_to_blob_directories, blob_index=blob_index)
+
+    # The large lookup tables are sent once per worker process instead of being pickled into every task
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_initialize_summary_worker,
+        initargs=(ip_index, blob_id_to_asset_path),
+    ) as executor:
+        future_to_task: dict[concurrent.futures.Future, _SummaryTask] = dict()
+        dandiset_id_to_shard_activities: dict[str, dict[int, _DandisetActivity]] = dict()
+        dandiset_id_to_number_of_shards: dict[str, int] = collections.Counter()
+        for task in tasks:
+            if task.shard_index is None:
+                future = executor.submit(
+                    _summarize_dandisets_in_worker,
+                    dandiset_id_to_blob_directories=task.dandiset_id_to_blob_directories,
+                    summary_directory=summary_directory,
+                    rollup_store=rollup_store,
+                    approximate_requester_counts=approximate_requester_counts,
+                )
+            else:
+                dandiset_id, blob_directories = next(iter(task.dandiset_id_to_blob_directories.items()))
+                dandiset_id_to_number_of_shards[dandiset_id] += 1
+                future = executor.submit(
+                    _aggregate_dandiset_activity_in_worker,
+                    blob_directories=blob_directories,
+                    rollup_store=rollup_store,
+                    approximate_requester_counts=approximate_requester_counts,
+                )
+            future_to_task[future] = task
+
+        progress_bar = tqdm.tqdm(
+            total=sum(task.cost for task in tasks),
+            desc="Summarizing Dandisets",
+            position=0,
+            leave=True,
+            mininterval=5.0,
+            smoothing=0,
+            unit="B",
+            unit_scale=True,
+            unit_divisor=1024,
+        )
+        number_of_summarized_dandisets = 0
+        for future in concurrent.futures.as_completed(future_to_task):
+            task = future_to_task.pop(future)
+            result = future.result()
+            progress_bar.update(task.cost)
+            if task.shard_index is None:
+                number_of_summarized_dandisets += len(task.dandiset_id_to_blob_directories)
+                progress_bar.set_postfix_str(
+                    f"{number_of_summarized_dandisets}/{len(dandiset_id_to_blob_directories)} dandisets", refresh=False
+                )
+                continue
+
+            (dandiset_id,) = task.dandiset_id_to_blob_directories
+            shard_activities = dandiset_id_to_shard_activities.setdefault(dandiset_id, dict())
+            shard_activities[task.shard_index] = result
+            if len(shard_activities) < dandiset_id_to_number_of_shards[dandiset_id]:
+                continue
+
+            # Merging in shard order reproduces the insertion order of a single pass over all blobs
+            activity = shard_activities[0]
+            for shard_index in range(1, len(shard_activities)):
+                activity.merge(other=shard_activities[shard_index])
+            del dandiset_id_to_shard_activities[dandiset_id]
+
+            _write_dandiset_summaries(activity=activity, dandiset_summary_directory=summary_directory / dandiset_id)
+            number_of_summarized_dandisets += 1
+            progress_bar.set_postfix_str(
+                f"{number_of_summarized_dandisets}/{len(dandiset_id_to_blob_directories)} dandisets", refresh=False
+            )
+        progress_bar.close()
+
+
+# Lookup tables shared by all tasks of a summary worker process; assigned once by `_initialize_summary_worker`
+_worker_ip_index: _IPIndex = _IPIndex(ip_to_region=dict())
+_worker_blob_id_to_asset_path: collections.abc.Mapping[str, str] = dict()
+
+
+def _initialize_summary_worker(ip_index: _IPIndex, blob_id_to_asset_path: collections.abc.Mapping[str, str]) -> None:
+    global _worker_ip_index, _worker_blob_id_to_asset_path
+
+    _worker_ip_index = ip_index
+    _worker_blob_id_to_asset_path = blob_id_to_asset_path
+
 
-    response = requests.get(content_id_to_usage_dandiset_path_url)
-    if response.status_code != 200:
+def _summarize_dandiset_in_worker(
+    *,
+    dandiset_id: str,
+    blob_directories: collections.abc.Sequence[pathlib.Path],
+    summary_directory: pathlib.Path,
+    rollup_store: _BlobRollupStore | None = None,
+    approximate_requester_counts: bool = False,
+) -> None:
+    _summarize_dandiset(
+        dandiset_id=dandiset_id,
+        blob_directories=blob_directories,
+        summary_directory=summary_directory,
+        ip_index=_worker_ip_index,
+        blob_id_to_asset_path=_worker_blob_id_to_asset_path,
+        rollup_store=rollup_store,
+        approximate_requester_counts=approximate_requester_counts,
+    )
+
+
+def _summarize_dandisets_in_worker(
+    *,
+    dandiset_id_to_blob_directories: dict[str, collections.abc.Sequence[pathlib.Path]],
+    summary_directory: pathlib.Path,
+    rollup_store: _BlobRollupStore | None = None,
+    approximate_requester_counts: bool = False,
+) -> None:
+    for dandiset_id, blob_directories in dandiset_id_to_blob_directories.items():
+        _summarize_dandiset_in_worker(
+            dandiset_id=dandiset_id,
+            blob_directories=blob_directories,
+            summary_directory=summary_directory,
+            rollup_store=rollup_store,
+            approximate_requester_counts=approximate_requester_counts,
+        )
+
+
+def _aggregate_dandiset_activity_in_worker(
+    *,
+    blob_directories: collections.abc.Sequence[pathlib.Path],
+    rollup_store: _BlobRollupStore | None = None,
+    approximate_requester_counts: bool = False,
+) -> "_DandisetActivity":
+    return _aggregate_dandiset_activity(
+        blob_directories=blob_directories,
+        ip_index=_worker_ip_index,
+        blob_id_to_asset_path=_worker_blob_id_to_asset_path,
+        rollup_store=rollup_store,
+        approximate_requester_counts=approximate_requester_counts,
+    )
+
+
+def _get_content_id_index(
+    *, content_id_to_usage_dandiset_path_url: str, cache_directory: pathlib.Path, offline: bool = False
+) -> _ContentIDIndex:
+    """
+    Load the index of the content ID mapping kept in the cache, rebuilding it first if the mapping has changed.
+
+    A local mapping is read again whenever its size or modification time changes. A remote mapping is requested with
+    the `ETag` and `Last-Modified` of the copy in the cache, so that it is only downloaded again once it has changed;
+    if the server cannot be reached, or if `offline`, the copy in the cache is used as it is.
+    """
+    index_directory = cache_directory / _CONTENT_ID_INDEX_DIRECTORY_NAME
+    cached_source = _read_content_id_index_source(directory=index_directory)
+    if cached_source.get("url") != content_id_to_usage_dandiset_path_url:
+        cached_source = dict()
+
+    parsed_url = urllib.parse.urlparse(content_id_to_usage_dandiset_path_url)
+    if parsed_url.scheme in ("http", "https") and offline:
+        if len(cached_source) == 0:
+            message = (
+                f"There is no copy of the content ID mapping from {content_id_to_usage_dandiset_path_url} in the "
+                f"cache '{index_directory}' to run offline with."
+            )
+            raise RuntimeError(message)
+        return _ContentIDIndex(directory=index_directory)
+    if parsed_url.scheme in ("http", "https"):
+        headers = dict()
+        if cached_source.get("etag") is not None:
+            headers["If-None-Match"] = cached_source["etag"]
+        if cached_source.get("last_modified") is not None:
+            headers["If-Modified-Since"] = cached_source["last_modified"]
+
+        try:
+            response = requests.get(content_id_to_usage_dandiset_path_url, headers=headers)
+        except requests.ConnectionError:
+            if len(cached_source) == 0:
+                raise
+            message = (
+                f"Could not reach {content_id_to_usage_dandiset_path_url} - "
+                "using the copy of the content ID mapping in the cache."
+            )
+            warnings.warn(message=message, stacklevel=2)
+            return _ContentIDIndex(directory=index_directory)
+
+        if response.status_code == 304 and len(cached_source) != 0:
+            return _ContentIDIndex(directory=index_directory)
+        if response.status_code != 200:
+            message = (
+                f"Failed to retrieve content ID to usage path mapping from {content_id_to_usage_dandiset_path_url} - "
+                f"status code {response.status_code}: {response.json()}"
+            )
+            raise RuntimeError(message)
+        content = response.content
+        source = {
+            "url": content_id_to_usage_dandiset_path_url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+    else:
+        file_path = pathlib.Path(
+            urllib.request.url2pathname(parsed_url.path)
+            if parsed_url.scheme == "file"
+            else content_id_to_usage_dandiset_path_url
+        )
+        file_stat = file_path.stat()
+        source = {
+            "url": content_id_to_usage_dandiset_path_url,
+            "size": file_stat.st_size,
+            "modified_ns": file_stat.st_mtime_ns,
+        }
+        if source == cached_source:
+            return _ContentIDIndex(directory=index_directory)
+        content = file_path.read_bytes()
+
+    # Local copies may have been decompressed
+    content_id_to_usage_dandiset_path = json.loads(
+        gzip.decompress(data=content) if content[:2] == b"\x1f\x8b" else content
+    )
+    _write_content_id_index(
+        directory=index_directory,
+        content_id_to_usage_dandiset_path=content_id_to_usage_dandiset_path,
+        source=source,
+    )
+    return _ContentIDIndex(directory=index_directory)
+
+
+def _get_dandiset_ids(*, api_url: str | None, cache_directory: pathlib.Path, max_age_hours: float) -> list[str]:
+    """
+    List the IDs of all Dandisets through the DANDI API, unless the copy of a previous listing kept in the cache is
+    more recent than `max_age_hours`.
+
+    If the API cannot be reached, the copy in the cache is used regardless of its age.
+    """
+    import dandi.dandiapi
+
+    listing_file_path = cache_directory / _DANDISET_LISTING_FILE_NAME
+    cached_listing = json.loads(listing_file_path.read_text()) if listing_file_path.exists() else dict()
+    if cached_listing.get("api_url") != api_url:
+        cached_listing = dict()
+    if len(cached_listing) != 0 and time.time() - cached_listing["listed_at"] < max_age_hours * 3600:
+        return cached_listing["dandiset_ids"]
+
+    listed_at = time.time()
+    try:
+        client = dandi.dandiapi.DandiAPIClient(api_url=api_url)
+        dandiset_ids = [dandiset.identifier for dandiset in client.get_dandisets()]
+    except requests.ConnectionError:
+        if len(cached_listing) == 0:
+            raise
         message = (
-            f"Failed to retrieve content ID to usage path mapping from {content_id_to_usage_dandiset_path_url} - "
-            f"status code {response.status_code}: {response.json()}"
+            "Could not reach the DANDI API - "
+            f"using the list of Dandisets in the cache from {time.ctime(cached_listing["listed_at"])}."
         )
-        raise RuntimeError(message)
-    content_id_to_usage_dandiset_path = json.loads(gzip.decompress(data=response.content))
+        warnings.warn(message=message, stacklevel=2)
+        return cached_listing["dandiset_ids"]
 
-    content_id_to_dandiset_path: dict[str, str] = dict()
-    dandiset_id_to_local_content_directories = collections.defaultdict(list)
-    for content_id, unique_dandiset_id_and_path in tqdm.tqdm(
-        iterable=content_id_to_usage_dandiset_path.items(),
+    temporary_listing_file_path = listing_file_path.with_name(f"{listing_file_path.name}.tmp")
+    temporary_listing_file_path.write_text(
+        data=json.dumps({"api_url": api_url, "listed_at": listed_at, "dandiset_ids": dandiset_ids})
+    )
+    os.replace(src=temporary_listing_file_path, dst=listing_file_path)
+
+    return dandiset_ids
+
+
+def _get_determinable_dandi_asset_info(
+    *,
+    content_id_to_usage_dandiset_path: _ContentIDIndex,
+    cache_directory: pathlib.Path,
+    blob_index: _BlobIndex | None = None,
+) -> tuple[_BlobReferences, _ContentIDIndex]:
+    extraction_directory = cache_directory / "extraction"
+
+    # The index already maps each content ID to its unique path, and is shared with the workers as is
+    content_id_to_dandiset_path = content_id_to_usage_dandiset_path
+    dandiset_ids: list[str] = []
+    content_ids: list[str] = []
+    is_zarr: list[bool] = []
+    for content_id, dandiset_id, unique_path in tqdm.tqdm(
+        iterable=content_id_to_usage_dandiset_path.iterate_associations(),
         total=len(content_id_to_usage_dandiset_path),
         desc="Mapping unique blob IDs to local paths",
         unit="blobs",
         smoothing=0,
     ):
-        dandiset_id, unique_path = next(iter(unique_dandiset_id_and_path.items()))
+        is_zarr_asset = ".zarr" in unique_path
+        if blob_index is not None and _get_object_key(content_id=content_id, is_zarr=is_zarr_asset) not in blob_index:
+            continue  # Never extracted, which the summaries would otherwise find out from the file system
 
-        local_content_directory = (
-            extraction_directory / "zarr" / content_id
-            if ".zarr" in unique_path
-            else extraction_directory / "blobs" / content_id[:3] / content_id[3:6] / content_id
-        )
-        content_id_to_dandiset_path[content_id] = unique_path
-        dandiset_id_to_local_content_directories[dandiset_id].append(local_content_directory)
+        dandiset_ids.append(dandiset_id)
+        content_ids.append(content_id)
+        is_zarr.append(is_zarr_asset)
 
+    # Only the content IDs are kept, from which the directories are derived as the summaries reach them
+    dandiset_id_to_local_content_directories = _build_blob_references(
+        extraction_directory=extraction_directory, dandiset_ids=dandiset_ids, content_ids=content_ids, is_zarr=is_zarr
+    )
     return dandiset_id_to_local_content_directories, content_id_to_dandiset_path
 
 
+def _get_touched_dandiset_ids(
+    *,
+    touched_object_keys: set[str],
+    dandiset_id_to_local_content_directories: _BlobReferences,
+) -> list[str]:
+    """Map the object keys recorded in the extraction journal to the sorted IDs of the Dandisets they belong to."""
+    # Object keys are either 'blobs/<...>/<blob ID>' or 'zarr/<Zarr ID>'
+    touched_dandiset_ids = dandiset_id_to_local_content_directories.find_dandiset_ids(
+        content_ids=[object_key.split("/")[-1] for object_key in touched_object_keys]
+    )
+    return sorted(touched_dandiset_ids)
+
+
 def _get_undetermined_dandi_asset_info(
     *,
-    content_id_to_usage_dandiset_path_url: str,
+    content_id_to_usage_dandiset_path: _ContentIDIndex,
     cache_directory: pathlib.Path,
-) -> tuple[dict[str, list[pathlib.Path]], dict[str, str]]:
+    blob_index: _BlobIndex | None = None,
+) -> tuple[_BlobReferences, dict[str, str]]:
     extraction_directory = cache_directory / "extraction"
 
-    response = requests.get(content_id_to_usage_dandiset_path_url)
-    if response.status_code != 200:
-        message = (
-            f"Failed to retrieve content ID to usage path mapping from {content_id_to_usage_dandiset_path_url} - "
-            f"status code {response.status_code}: {response.json()}"
-        )
-        raise RuntimeError(message)
-    content_id_to_usage_dandiset_path = json.loads(gzip.decompress(data=response.content))
-
     content_id_to_dandiset_path: dict[str, str] = dict()
-    dandiset_id_to_local_content_directories = collections.defaultdict(list)
+    content_ids: list[str] = []
+    is_zarr: list[bool] = []
 
     # The previous loop is 'bottom-up' from provided content ID mappings from the DANDI Cache
     # Next, do a 'top-down' search over the entire extraction cache to find any uncaught IDs
+    if blob_index is not None:
+        object_keys = list(blob_index)
+        is_associated = content_id_to_usage_dandiset_path.contains(
+            content_ids=[object_key.split("/")[-1] for object_key in object_keys]
+        )
+        for object_key, associated in zip(object_keys, is_associated.tolist()):
+            if not associated:
+                content_ids.append(object_key.split("/")[-1])
+                is_zarr.append(object_key.startswith("zarr/"))
+
+        dandiset_id_to_local_content_directories = _build_blob_references(
+            extraction_directory=extraction_directory,
+            dandiset_ids=["undetermined"] * len(content_ids),
+            content_ids=content_ids,
+            is_zarr=is_zarr,
+        )
+        return dandiset_id_to_local_content_directories, content_id_to_dandiset_path
+
+    # Without an index of the extracted objects, the whole extraction tree is walked instead
+    # Blobs in the binary layout are found through their IP dictionary, unless text rows were appended since, and
+    # compacted blobs through their archive, unless binary or text rows were appended since
     batch_size = 1_000_000
+    ip_file_paths = itertools.chain(
+        extraction_directory.rglob(pattern="ips.txt"),
+        (
+            ip_dictionary_file_path
+            for ip_dictionary_file_path in extraction_directory.rglob(pattern=_IP_DICTIONARY_FILE_NAME)
+            if not (ip_dictionary_file_path.parent / "ips.txt").exists()
+        ),
+        (
+            compacted_file_path
+            for compacted_file_path in extraction_directory.rglob(pattern=_COMPACTED_FILE_NAME)
+            if not (compacted_file_path.parent / "ips.txt").exists()
+            and not (compacted_file_path.parent / _IP_DICTIONARY_FILE_NAME).exists()
+        ),
+    )
     tqdm_iterable = tqdm.tqdm(
-        iterable=itertools.batched(iterable=extraction_directory.rglob(pattern="ips.txt"), n=batch_size),
+        iterable=itertools.batched(iterable=ip_file_paths, n=batch_size),
         total=0,
         desc="Mapping undetermined blob IDs to local paths",
         unit="batches",
@@ -237,8 +749,11 @@ def _get_undetermined_dandi_asset_info(
     for batch in tqdm_iterable:
         tqdm_iterable.total += 1
 
-        for timestamps_file_path in tqdm.tqdm(
-            iterable=batch,
+        is_associated = content_id_to_usage_dandiset_path.contains(
+            content_ids=[timestamps_file_path.parent.name for timestamps_file_path in batch]
+        )
+        for timestamps_file_path, associated in tqdm.tqdm(
+            iterable=zip(batch, is_associated.tolist()),
             total=len(batch),
             desc="Processing batch",
             unit="files",
@@ -247,92 +762,275 @@ def _get_undetermined_dandi_asset_info(
             leave=False,
         ):
             local_content_directory = timestamps_file_path.parent
-            content_id = local_content_directory.name
 
-            if content_id in content_id_to_usage_dandiset_path:
+            if associated:
                 continue  # This content ID already has a Dandiset association in the usage cache
 
-            dandiset_id_to_local_content_directories["undetermined"].append(local_content_directory)
+            content_ids.append(local_content_directory.name)
+            is_zarr.append(local_content_directory.parent == extraction_directory / "zarr")
 
+    dandiset_id_to_local_content_directories = _build_blob_references(
+        extraction_directory=extraction_directory,
+        dandiset_ids=["undetermined"] * len(content_ids),
+        content_ids=content_ids,
+        is_zarr=is_zarr,
+    )
     return dandiset_id_to_local_content_directories, content_id_to_dandiset_path
 
 
 def _summarize_dandiset(
     *,
     dandiset_id: str,
-    blob_directories: list[pathlib.Path],
+    blob_directories: collections.abc.Sequence[pathlib.Path],
     summary_directory: pathlib.Path,
-    ip_to_region: dict[str, str],
-    blob_id_to_asset_path: dict[str, str],
+    ip_index: _IPIndex,
+    blob_id_to_asset_path: collections.abc.Mapping[str, str],
+    rollup_store: _BlobRollupStore | None = None,
+    approximate_requester_counts: bool = False,
 ) -> None:
-    _summarize_dandiset_by_day(
-        blob_directories=blob_directories, summary_file_path=summary_directory / dandiset_id / "by_day.tsv"
-    )
-    _summarize_dandiset_by_asset(
+    activity = _aggregate_dandiset_activity(
         blob_directories=blob_directories,
-        summary_file_path=summary_directory / dandiset_id / "by_asset.tsv",
+        ip_index=ip_index,
         blob_id_to_asset_path=blob_id_to_asset_path,
+        rollup_store=rollup_store,
+        approximate_requester_counts=approximate_requester_counts,
     )
-    _summarize_dandiset_by_asset_per_week(
-        blob_directories=blob_directories,
-        summary_file_path=summary_directory / dandiset_id / "by_asset_per_week.tsv",
-        blob_id_to_asset_path=blob_id_to_asset_path,
+
+    _write_dandiset_summaries(activity=activity, dandiset_summary_directory=summary_directory / dandiset_id)
+
+
+def _write_dandiset_summaries(*, activity: "_DandisetActivity", dandiset_summary_directory: pathlib.Path) -> None:
+    _write_dandiset_by_day(activity=activity, summary_file_path=dandiset_summary_directory / "by_day.tsv")
+    _write_dandiset_by_asset(activity=activity, summary_file_path=dandiset_summary_directory / "by_asset.tsv")
+    _write_dandiset_by_asset_per_week(
+        activity=activity, summary_file_path=dandiset_summary_directory / "by_asset_per_week.tsv"
     )
-    _summarize_dandiset_by_asset_type_per_week(
-        blob_directories=blob_directories,
-        summary_file_path=summary_directory / dandiset_id / "by_asset_type_per_week.tsv",
-        blob_id_to_asset_path=blob_id_to_asset_path,
+    _write_dandiset_by_asset_type_per_week(
+        activity=activity, summary_file_path=dandiset_summary_directory / "by_asset_type_per_week.tsv"
     )
-    _summarize_dandiset_by_region(
-        blob_directories=blob_directories,
-        summary_file_path=summary_directory / dandiset_id / "by_region.tsv",
-        ip_to_region=ip_to_region,
+    _write_dandiset_by_region(activity=activity, summary_file_path=dandiset_summary_directory / "by_region.tsv")
+    _write_dandiset_unique_requester_count(
+        activity=activity, summary_file_path=dandiset_summary_directory / "requester_count.tsv"
     )
-    _summarize_dandiset_unique_requester_count(
-        blob_directories=blob_directories,
-        summary_file_path=summary_directory / dandiset_id / "requester_count.tsv",
+    _write_dandiset_requester_sketch(
+        activity=activity,
+        sketch_file_path=_get_sketch_file_path(
+            summary_directory=dandiset_summary_directory.parent, dandiset_id=dandiset_summary_directory.name
+        ),
     )
 
 
-def _summarize_dandiset_by_day(
-    *, blob_directories: list[pathlib.Path], summary_file_path: pathlib.Path, request_count_minimum: int = 50
-) -> None:
-    all_dates = []
-    all_bytes_sent = []
-    all_downloads = []
+class _DandisetActivity:
+    """
+    Accumulators for every per-Dandiset summary, filled by a single pass over the column files of each blob.
+
+    Each of `timestamps.txt`, `bytes_sent.txt`, `download.txt`, and `ips.txt` is read once per blob, and the by-day,
+    by-asset, per-week, by-region, and unique requester aggregates are all updated from that one read.
+    Keys are inserted in the same order the individual summaries used to encounter them, so the written tables are
+    unchanged.
+
+    Unique requesters are always tracked by a HyperLogLog sketch; unless `approximate_requester_counts` is enabled,
+    they are also counted exactly by the sorted unique integer indices of `_IPIndex` that were seen, with a set
+    holding only the IPs that are absent from the region cache. The indices of each blob are buffered and only
+    deduplicated once they outnumber those already held, so the cost is proportional to the requesters of the
+    Dandiset rather than to the size of the cache.
+    """
+
+    def __init__(self, *, approximate_requester_counts: bool = False) -> None:
+        self.bytes_sent_by_day: dict[str, int] = collections.defaultdict(int)
+        self.number_of_requests_by_day: dict[str, int] = collections.defaultdict(int)
+        self.number_of_downloads_by_day: dict[str, int] = collections.defaultdict(int)
+
+        self.bytes_sent_by_asset: dict[str, int] = collections.defaultdict(int)
+        self.number_of_requests_by_asset: dict[str, int] = collections.defaultdict(int)
+        self.number_of_downloads_by_asset: dict[str, int] = collections.defaultdict(int)
+
+        # Built from `functools.partial` rather than a lambda so that partial activity can be sent between processes
+        self.bytes_sent_by_asset_per_week: dict[str, dict[str, int]] = collections.defaultdict(
+            functools.partial(collections.defaultdict, int)
+        )
+        self.bytes_sent_by_asset_type_per_week: dict[str, dict[str, int]] = collections.defaultdict(
+            functools.partial(collections.defaultdict, int)
+        )
+        self.asset_types: set[str] = set()
+
+        self.bytes_sent_by_region: dict[str, int] = collections.defaultdict(int)
+        self.number_of_requests_by_region: dict[str, int] = collections.defaultdict(int)
+        self.number_of_downloads_by_region: dict[str, int] = collections.defaultdict(int)
+
+        self.indexed_requesters: numpy.ndarray | None = (
+            None if approximate_requester_counts else numpy.empty(shape=0, dtype=numpy.int64)
+        )
+        self.pending_indexed_requesters: list[numpy.ndarray] = []
+        self.number_of_pending_indexed_requesters = 0
+        self.unindexed_requesters: set[bytes] | None = None if approximate_requester_counts else set()
+        self.requester_sketch = _new_registers()
+
+    def __getstate__(self) -> dict:
+        self._deduplicate_indexed_requesters()  # Only the unique indices are sent back from a worker
+        return self.__dict__
+
+    @property
+    def number_of_unique_requesters(self) -> int | None:
+        """The exact number of unique requesters, or `None` if only the sketch is kept."""
+        if self.indexed_requesters is None:
+            return None
+
+        self._deduplicate_indexed_requesters()
+        return self.indexed_requesters.size + len(self.unindexed_requesters)
+
+    def _add_indexed_requesters(self, *, indices: numpy.ndarray) -> None:
+        self.pending_indexed_requesters.append(indices)
+        self.number_of_pending_indexed_requesters += indices.size
+        if self.number_of_pending_indexed_requesters > max(self.indexed_requesters.size, _PENDING_REQUESTERS_MINIMUM):
+            self._deduplicate_indexed_requesters()
+
+    def _deduplicate_indexed_requesters(self) -> None:
+        if len(self.pending_indexed_requesters) == 0:
+            return
+
+        self.indexed_requesters = numpy.unique(
+            numpy.concatenate([self.indexed_requesters, *self.pending_indexed_requesters])
+        )
+        self.pending_indexed_requesters = []
+        self.number_of_pending_indexed_requesters = 0
+
+    def merge(self, *, other: "_DandisetActivity") -> None:
+        """Add the activity of blobs that follow those already aggregated here, such as the next shard."""
+        for totals, other_totals in (
+            (self.bytes_sent_by_day, other.bytes_sent_by_day),
+            (self.number_of_requests_by_day, other.number_of_requests_by_day),
+            (self.number_of_downloads_by_day, other.number_of_downloads_by_day),
+            (self.bytes_sent_by_asset, other.bytes_sent_by_asset),
+            (self.number_of_requests_by_asset, other.number_of_requests_by_asset),
+            (self.number_of_downloads_by_asset, other.number_of_downloads_by_asset),
+            (self.bytes_sent_by_region, other.bytes_sent_by_region),
+            (self.number_of_requests_by_region, other.number_of_requests_by_region),
+            (self.number_of_downloads_by_region, other.number_of_downloads_by_region),
+        ):
+            for key, value in other_totals.items():
+                totals[key] += value
+
+        for totals_per_week, other_totals_per_week in (
+            (self.bytes_sent_by_asset_per_week, other.bytes_sent_by_asset_per_week),
+            (self.bytes_sent_by_asset_type_per_week, other.bytes_sent_by_asset_type_per_week),
+        ):
+            for week_start, other_totals in other_totals_per_week.items():
+                totals = totals_per_week[week_start]
+                for key, value in other_totals.items():
+                    totals[key] += value
+
+        self.asset_types.update(other.asset_types)
+        numpy.maximum(self.requester_sketch, other.requester_sketch, out=self.requester_sketch)
+        if self.indexed_requesters is not None:
+            self._deduplicate_indexed_requesters()
+            other._deduplicate_indexed_requesters()
+            self.indexed_requesters = numpy.union1d(self.indexed_requesters, other.indexed_requesters)
+            self.unindexed_requesters.update(other.unindexed_requesters)
+
+    def add_blob(self, *, blob_directory: pathlib.Path, asset_path: str, ip_index: _IPIndex) -> None:
+        if not blob_directory.exists():
+            return  # No extracted logs found (possible asset was never accessed); skip to next asset
+
+        rollup = _read_blob_rollup(blob_directory=blob_directory)
+        self.add_blob_rollup(rollup=rollup, asset_path=asset_path, ip_index=ip_index)
+
+    def add_blob_rollup(self, *, rollup: _BlobRollup, asset_path: str, ip_index: _IPIndex) -> None:
+        asset_type = _get_asset_type(asset_path=asset_path)
+        self.asset_types.add(asset_type)
+
+        self.bytes_sent_by_asset[asset_path] += rollup.bytes_sent
+        self.number_of_requests_by_asset[asset_path] += rollup.number_of_requests
+        self.number_of_downloads_by_asset[asset_path] += rollup.number_of_downloads
+
+        for day_key, day_bytes_sent, day_requests, day_downloads in zip(
+            rollup.day_keys.tolist(),
+            rollup.bytes_sent_per_day.tolist(),
+            rollup.requests_per_day.tolist(),
+            rollup.downloads_per_day.tolist(),
+        ):
+            date, week_start = _get_calendar_labels(date_prefix=f"{day_key:06d}")
+            self.bytes_sent_by_day[date] += day_bytes_sent
+            self.number_of_requests_by_day[date] += day_requests
+            self.number_of_downloads_by_day[date] += day_downloads
+
+            self.bytes_sent_by_asset_per_week[week_start][asset_path] += day_bytes_sent
+            self.bytes_sent_by_asset_type_per_week[week_start][asset_type] += day_bytes_sent
+
+        _add_sparse_sketch(
+            registers=self.requester_sketch,
+            register_indices=rollup.sketch_register_indices,
+            ranks=rollup.sketch_register_ranks,
+        )
+
+        ip_indices = ip_index.get_indices(ips=rollup.ips)
+        if self.indexed_requesters is not None:
+            is_indexed = ip_indices >= 0
+            self._add_indexed_requesters(indices=ip_indices[is_indexed])
+            self.unindexed_requesters.update(rollup.ips[~is_indexed].tolist())
+
+        has_requests = rollup.requests_per_ip > 0
+        region_codes = ip_index.get_region_codes(indices=ip_indices[has_requests])
+        if region_codes.size == 0:
+            return
+
+        # IPs are stored by first appearance so regions are inserted in the order they are first encountered
+        unique_region_codes, first_indices, group_indices = numpy.unique(
+            region_codes, return_index=True, return_inverse=True
+        )
+        bytes_sent_per_region = numpy.zeros(shape=unique_region_codes.size, dtype=numpy.uint64)
+        numpy.add.at(bytes_sent_per_region, group_indices, rollup.bytes_sent_per_ip[has_requests])
+        requests_per_region = numpy.zeros(shape=unique_region_codes.size, dtype=numpy.int64)
+        numpy.add.at(requests_per_region, group_indices, rollup.requests_per_ip[has_requests])
+        downloads_per_region = numpy.zeros(shape=unique_region_codes.size, dtype=numpy.int64)
+        numpy.add.at(downloads_per_region, group_indices, rollup.downloads_per_ip[has_requests])
+
+        order = numpy.argsort(first_indices, kind="stable")
+        for region_code, region_bytes_sent, region_requests, region_downloads in zip(
+            unique_region_codes[order].tolist(),
+            bytes_sent_per_region[order].tolist(),
+            requests_per_region[order].tolist(),
+            downloads_per_region[order].tolist(),
+        ):
+            region = ip_index.region_names[region_code]
+            self.bytes_sent_by_region[region] += region_bytes_sent
+            self.number_of_requests_by_region[region] += region_requests
+            self.number_of_downloads_by_region[region] += region_downloads
+
+
+def _aggregate_dandiset_activity(
+    *,
+    blob_directories: collections.abc.Sequence[pathlib.Path],
+    ip_index: _IPIndex,
+    blob_id_to_asset_path: collections.abc.Mapping[str, str],
+    rollup_store: _BlobRollupStore | None = None,
+    approximate_requester_counts: bool = False,
+) -> _DandisetActivity:
+    activity = _DandisetActivity(approximate_requester_counts=approximate_requester_counts)
     for blob_directory in blob_directories:
-        # TODO: Could add a step here to track which object IDs have been processed, and if encountered again
-        # Just copy the file over instead of reprocessing
+        # It is possible that this blob cannot be uniquely associated with an asset path within the Dandiset
+        # (the blob ID would not be in the asset path mapping in that case)
+        asset_path = blob_id_to_asset_path.get(blob_directory.name, "undetermined")
+
+        if rollup_store is None:
+            activity.add_blob(blob_directory=blob_directory, asset_path=asset_path, ip_index=ip_index)
+            continue
 
         if not blob_directory.exists():
             continue  # No extracted logs found (possible asset was never accessed); skip to next asset
 
-        timestamps_file_path = blob_directory / "timestamps.txt"
-        dates = [
-            _timestamp_to_date_format(timestamp=timestamp)
-            for timestamp in timestamps_file_path.read_text().splitlines()
-        ]
-        all_dates.extend(dates)
+        rollup = rollup_store.get_rollup(blob_directory=blob_directory)
+        activity.add_blob_rollup(rollup=rollup, asset_path=asset_path, ip_index=ip_index)
 
-        bytes_sent_file_path = blob_directory / "bytes_sent.txt"
-        bytes_sent = [int(value.strip()) for value in bytes_sent_file_path.read_text().splitlines()]
-        all_bytes_sent.extend(bytes_sent)
+    return activity
 
-        download_file_path = blob_directory / "download.txt"
-        downloads = (
-            [int(value.strip()) for value in download_file_path.read_text().splitlines()]
-            if download_file_path.exists()
-            else [0] * len(dates)
-        )
-        all_downloads.extend(downloads)
 
-    summarized_activity_by_day = collections.defaultdict(int)
-    number_of_requests_by_day = collections.defaultdict(int)
-    number_of_downloads_by_day = collections.defaultdict(int)
-    for date, bytes_sent, download in zip(all_dates, all_bytes_sent, all_downloads):
-        summarized_activity_by_day[date] += bytes_sent
-        number_of_requests_by_day[date] += 1
-        number_of_downloads_by_day[date] += download
+def _write_dandiset_by_day(
+    *, activity: _DandisetActivity, summary_file_path: pathlib.Path, request_count_minimum: int = 50
+) -> None:
+    summarized_activity_by_day = activity.bytes_sent_by_day
+    number_of_requests_by_day = activity.number_of_requests_by_day
+    number_of_downloads_by_day = activity.number_of_downloads_by_day
 
     if len(summarized_activity_by_day) == 0:
         return
@@ -359,53 +1057,43 @@ def _summarize_dandiset_by_day(
 
 
 def _timestamp_to_date_format(*, timestamp: str) -> str:
-    date = f"20{timestamp[:2]}-{timestamp[2:4]}-{timestamp[4:6]}"
+    date, _ = _get_calendar_labels(date_prefix=timestamp[:6])
     return date
 
 
 def _timestamp_to_week_start_date(*, timestamp: str) -> str:
-    date = datetime.date(year=int("20" + timestamp[:2]), month=int(timestamp[2:4]), day=int(timestamp[4:6]))
-    week_start = date - datetime.timedelta(days=date.weekday())
-    return week_start.strftime("%Y-%m-%d")
-
+    _, week_start = _get_calendar_labels(date_prefix=timestamp[:6])
+    return week_start
 
-def _summarize_dandiset_by_asset_per_week(
-    *, blob_directories: list[pathlib.Path], summary_file_path: pathlib.Path, blob_id_to_asset_path: dict[str, str]
-) -> None:
-    summarized_activity_by_asset_per_week: dict[str, dict[str, int]] = collections.defaultdict(
-        lambda: collections.defaultdict(int)
-    )
-    all_asset_paths: set[str] = set()
-    all_week_starts: set[str] = set()
 
-    for blob_directory in blob_directories:
-        blob_id = blob_directory.name
-
-        if not blob_directory.exists():
-            continue  # No extracted logs found (possible asset was never accessed); skip to next asset
-
-        asset_path = blob_id_to_asset_path.get(blob_id, "undetermined")
+@functools.cache
+def _get_calendar_labels(*, date_prefix: str) -> tuple[str, str]:
+    """
+    Map the 'YYMMDD' prefix of a timestamp to its date and the start date of its week (Monday).
 
-        timestamps_file_path = blob_directory / "timestamps.txt"
-        week_starts = [
-            _timestamp_to_week_start_date(timestamp=timestamp)
-            for timestamp in timestamps_file_path.read_text().splitlines()
-        ]
+    There are only a few thousand distinct days across the lifetime of the archive, so the labels are computed once
+    per day and then served from the cache.
+    """
+    date = datetime.date(year=int("20" + date_prefix[:2]), month=int(date_prefix[2:4]), day=int(date_prefix[4:6]))
+    week_start = date - datetime.timedelta(days=date.weekday())
+    return f"20{date_prefix[:2]}-{date_prefix[2:4]}-{date_prefix[4:6]}", week_start.strftime("%Y-%m-%d")
 
-        bytes_sent_file_path = blob_directory / "bytes_sent.txt"
-        bytes_sent = [int(value.strip()) for value in bytes_sent_file_path.read_text().splitlines()]
 
-        for week_start, bs in zip(week_starts, bytes_sent):
-            summarized_activity_by_asset_per_week[week_start][asset_path] += bs
-            all_week_starts.add(week_start)
-            all_asset_paths.add(asset_path)
+def _write_dandiset_by_asset_per_week(*, activity: _DandisetActivity, summary_file_path: pathlib.Path) -> None:
+    summarized_activity_by_asset_per_week = activity.bytes_sent_by_asset_per_week
 
     if not summarized_activity_by_asset_per_week:
         return
 
     summary_file_path.parent.mkdir(parents=True, exist_ok=True)
-    sorted_week_starts = sorted(all_week_starts)
-    sorted_asset_paths = sorted(all_asset_paths)
+    sorted_week_starts = sorted(summarized_activity_by_asset_per_week.keys())
+    sorted_asset_paths = sorted(
+        {
+            asset_path
+            for activity_per_asset in summarized_activity_by_asset_per_week.values()
+            for asset_path in activity_per_asset
+        }
+    )
 
     data: dict[str, list] = {"week_start": sorted_week_starts}
     for asset_path in sorted_asset_paths:
@@ -439,44 +1127,15 @@ def _sort_asset_type_columns(*, column_names: list[str]) -> list[str]:
     return [*known_columns, *extra_columns]
 
 
-def _summarize_dandiset_by_asset_type_per_week(
-    *, blob_directories: list[pathlib.Path], summary_file_path: pathlib.Path, blob_id_to_asset_path: dict[str, str]
-) -> None:
-    summarized_activity_by_asset_type_per_week: dict[str, dict[str, int]] = collections.defaultdict(
-        lambda: collections.defaultdict(int)
-    )
-    all_asset_types: set[str] = set()
-    all_week_starts: set[str] = set()
-
-    for blob_directory in blob_directories:
-        blob_id = blob_directory.name
-
-        if not blob_directory.exists():
-            continue  # No extracted logs found (possible asset was never accessed); skip to next asset
-
-        asset_path = blob_id_to_asset_path.get(blob_id, "undetermined")
-        asset_type = _get_asset_type(asset_path=asset_path)
-        all_asset_types.add(asset_type)
-
-        timestamps_file_path = blob_directory / "timestamps.txt"
-        week_starts = [
-            _timestamp_to_week_start_date(timestamp=timestamp)
-            for timestamp in timestamps_file_path.read_text().splitlines()
-        ]
-
-        bytes_sent_file_path = blob_directory / "bytes_sent.txt"
-        bytes_sent = [int(value.strip()) for value in bytes_sent_file_path.read_text().splitlines()]
-
-        for week_start, bytes_sent_value in zip(week_starts, bytes_sent):
-            summarized_activity_by_asset_type_per_week[week_start][asset_type] += bytes_sent_value
-            all_week_starts.add(week_start)
+def _write_dandiset_by_asset_type_per_week(*, activity: _DandisetActivity, summary_file_path: pathlib.Path) -> None:
+    summarized_activity_by_asset_type_per_week = activity.bytes_sent_by_asset_type_per_week
 
     if not summarized_activity_by_asset_type_per_week:
         return
 
     summary_file_path.parent.mkdir(parents=True, exist_ok=True)
-    sorted_week_starts = sorted(all_week_starts)
-    sorted_asset_types = _sort_asset_type_columns(column_names=list(all_asset_types))
+    sorted_week_starts = sorted(summarized_activity_by_asset_type_per_week.keys())
+    sorted_asset_types = _sort_asset_type_columns(column_names=list(activity.asset_types))
 
     data: dict[str, list] = {"week_start": sorted_week_starts}
     for asset_type in sorted_asset_types:
@@ -520,39 +1179,12 @@ def _summarize_archive_by_asset_type_per_week(*, summary_directory: pathlib.Path
     archive_summary.to_csv(path_or_buf=archive_summary_file_path, mode="w", sep="\t", header=True, index=False)
 
 
-def _summarize_dandiset_by_asset(
-    *,
-    blob_directories: list[pathlib.Path],
-    summary_file_path: pathlib.Path,
-    blob_id_to_asset_path: dict[str, str],
-    request_count_minimum: int = 50,
+def _write_dandiset_by_asset(
+    *, activity: _DandisetActivity, summary_file_path: pathlib.Path, request_count_minimum: int = 50
 ) -> None:
-    summarized_activity_by_asset = collections.defaultdict(int)
-    number_of_requests_by_asset = collections.defaultdict(int)
-    number_of_downloads_by_asset = collections.defaultdict(int)
-    for blob_directory in blob_directories:
-        blob_id = blob_directory.name
-
-        # No extracted logs found (possible asset was never accessed); skip to next asset
-        if not blob_directory.exists():
-            continue
-
-        # It is possible that this blob cannot be uniquely associated with an asset path within the Dandiset
-        # (the blob ID would not be in the asset path mapping in that case)
-        asset_path = blob_id_to_asset_path.get(blob_id, "undetermined")
-
-        bytes_sent_file_path = blob_directory / "bytes_sent.txt"
-        bytes_sent = [int(value.strip()) for value in bytes_sent_file_path.read_text().splitlines()]
-        download_file_path = blob_directory / "download.txt"
-        downloads = (
-            [int(value.strip()) for value in download_file_path.read_text().splitlines()]
-            if download_file_path.exists()
-            else [0] * len(bytes_sent)
-        )
-
-        summarized_activity_by_asset[asset_path] += sum(bytes_sent)
-        number_of_requests_by_asset[asset_path] += len(bytes_sent)
-        number_of_downloads_by_asset[asset_path] += sum(downloads)
+    summarized_activity_by_asset = activity.bytes_sent_by_asset
+    number_of_requests_by_asset = activity.number_of_requests_by_asset
+    number_of_downloads_by_asset = activity.number_of_downloads_by_asset
 
     if len(summarized_activity_by_asset) == 0:
         return
@@ -580,47 +1212,12 @@ def _summarize_dandiset_by_asset(
     summary_table.to_csv(path_or_buf=summary_file_path, mode="w", sep="\t", header=True, index=False)
 
 
-def _summarize_dandiset_by_region(
-    *,
-    blob_directories: list[pathlib.Path],
-    summary_file_path: pathlib.Path,
-    ip_to_region: dict[str, str],
-    request_count_minimum: int = 50,
+def _write_dandiset_by_region(
+    *, activity: _DandisetActivity, summary_file_path: pathlib.Path, request_count_minimum: int = 50
 ) -> None:
-    all_regions = []
-    all_bytes_sent = []
-    all_downloads = []
-    for blob_directory in blob_directories:
-        # TODO: Could add a step here to track which object IDs have been processed, and if encountered again
-        # Just copy the file over instead of reprocessing
-
-        if not blob_directory.exists():
-            continue  # No extracted logs found (possible asset was never accessed); skip to next asset
-
-        ips_file_path = blob_directory / "ips.txt"
-        ips = [ip.strip() for ip in ips_file_path.read_text().splitlines()]
-        regions = [ip_to_region.get(ip, "missing") for ip in ips]
-        all_regions.extend(regions)
-
-        bytes_sent_file_path = blob_directory / "bytes_sent.txt"
-        bytes_sent = [int(value.strip()) for value in bytes_sent_file_path.read_text().splitlines()]
-        all_bytes_sent.extend(bytes_sent)
-
-        download_file_path = blob_directory / "download.txt"
-        downloads = (
-            [int(value.strip()) for value in download_file_path.read_text().splitlines()]
-            if download_file_path.exists()
-            else [0] * len(regions)
-        )
-        all_downloads.extend(downloads)
-
-    summarized_activity_by_region = collections.defaultdict(int)
-    number_of_requests_by_region = collections.defaultdict(int)
-    number_of_downloads_by_region = collections.defaultdict(int)
-    for region, bytes_sent, download in zip(all_regions, all_bytes_sent, all_downloads):
-        summarized_activity_by_region[region] += bytes_sent
-        number_of_requests_by_region[region] += 1
-        number_of_downloads_by_region[region] += download
+    summarized_activity_by_region = activity.bytes_sent_by_region
+    number_of_requests_by_region = activity.number_of_requests_by_region
+    number_of_downloads_by_region = activity.number_of_downloads_by_region
 
     if len(summarized_activity_by_region) == 0:
         return
@@ -696,15 +1293,56 @@ def _collect_unique_ips(blob_directories: list[pathlib.Path]) -> set[str]:
         if not blob_directory.exists():
             continue
 
-        ips_file_path = blob_directory / "ips.txt"
-        if not ips_file_path.exists():
-            continue
-
-        unique_ips.update(ip.strip() for ip in ips_file_path.read_text().splitlines())
+        # Blobs in the binary or compacted layouts keep each of their distinct IPs once in a dictionary
+        ips = numpy.concatenate(
+            (
+                _read_ip_column(file_path=blob_directory / "ips.txt"),
+                _read_ip_dictionary(file_path=blob_directory / _IP_DICTIONARY_FILE_NAME),
+                _read_compacted_ip_dictionary(blob_directory=blob_directory),
+            )
+        )
+        unique_ips.update(ip.decode() for ip in numpy.unique(ips).tolist())
     return unique_ips
 
 
-def _summarize_dandiset_unique_requester_count(
+def _write_dandiset_unique_requester_count(
+    *,
+    activity: _DandisetActivity,
+    summary_file_path: pathlib.Path,
+    modulo: int = 20,
+    minimum: int = 50,
+) -> None:
+    """
+    Save the privacy-rounded unique requester count from already aggregated Dandiset activity.
+
+    Reuses the unique requesters collected during the single pass of :func:`_aggregate_dandiset_activity` instead of
+    reading every ``ips.txt`` file again.
+    If exact counts were not kept, the count is estimated from the requester sketch instead.
+    """
+    number_of_unique_ips = activity.number_of_unique_requesters
+    if number_of_unique_ips is None:
+        number_of_unique_ips = _estimate_cardinality(registers=activity.requester_sketch)
+
+    if number_of_unique_ips == 0:
+        return
+
+    rounded_count = _round_requester_count(count=number_of_unique_ips, modulo=modulo, minimum=minimum)
+    summary_file_path.parent.mkdir(parents=True, exist_ok=True)
+    summary_file_path.write_text(str(rounded_count))
+
+
+def _write_dandiset_requester_sketch(*, activity: _DandisetActivity, sketch_file_path: pathlib.Path) -> None:
+    """Save the requester sketch of a Dandiset so that archive-wide counts can be merged without rereading blobs."""
+    if not activity.requester_sketch.any():
+        # A sketch left by a previous run would otherwise still be merged into the archive-wide count
+        sketch_file_path.unlink(missing_ok=True)
+        return
+
+    sketch_file_path.parent.mkdir(parents=True, exist_ok=True)
+    numpy.save(file=sketch_file_path, arr=activity.requester_sketch, allow_pickle=False)
+
+
+def _summarize_archive_unique_requester_count(
     *,
     blob_directories: list[pathlib.Path],
     summary_file_path: pathlib.Path,
@@ -712,18 +1350,17 @@ def _summarize_dandiset_unique_requester_count(
     minimum: int = 50,
 ) -> None:
     """
-    Compute and save the privacy-rounded unique requester count for a Dandiset.
+    Compute and save the privacy-rounded unique requester count for the archive.
 
-    Reads all ``ips.txt`` files from the given blob directories, counts the
-    number of unique IPs across the entire Dandiset, rounds the result via
-    :func:`_round_requester_count`, and writes the value to ``summary_file_path``.
+    Collects unique IPs across all provided blob directories (a true union
+    across all Dandisets), rounds the result, and writes the value to ``summary_file_path``.
 
     Parameters
     ----------
     blob_directories : list of pathlib.Path
-        Paths to the per-blob extraction directories containing ``ips.txt`` files.
+        All per-blob extraction directories from all Dandisets.
     summary_file_path : pathlib.Path
-        Destination file where the rounded count (as a string) will be written.
+        Destination file where the rounded count will be written.
     modulo : int, optional
         Granularity for rounding. Default is ``20``.
     minimum : int, optional
@@ -740,23 +1377,47 @@ def _summarize_dandiset_unique_requester_count(
     summary_file_path.write_text(str(rounded_count))
 
 
-def _summarize_archive_unique_requester_count(
+@beartype
+def generate_approximate_archive_requester_count(*, cache_directory: str | pathlib.Path | None = None) -> None:
+    """
+    Estimate the unique requester count of the whole archive from the sketches saved for each Dandiset.
+
+    Writes `summaries/archive/requester_count.tsv` from the union of the HyperLogLog sketches saved for each Dandiset
+    by `generate_dandiset_summaries`, which takes constant memory instead of holding every distinct IP.
+
+    Parameters
+    ----------
+    cache_directory : pathlib.Path
+        Path to the folder containing all previously extracted S3 access logs.
+        If `None`, the default cache directory from the configuration will be used.
+    """
+    cache_directory = (
+        pathlib.Path(cache_directory) if cache_directory is not None else s3_log_extraction.config.get_cache_directory()
+    )
+    summary_directory = cache_directory / "summaries"
+
+    _summarize_archive_unique_requester_count_from_sketches(
+        summary_directory=summary_directory, summary_file_path=summary_directory / "archive" / "requester_count.tsv"
+    )
+
+
+def _summarize_archive_unique_requester_count_from_sketches(
     *,
-    blob_directories: list[pathlib.Path],
+    summary_directory: pathlib.Path,
     summary_file_path: pathlib.Path,
     modulo: int = 20,
     minimum: int = 50,
 ) -> None:
     """
-    Compute and save the privacy-rounded unique requester count for the archive.
+    Estimate and save the privacy-rounded unique requester count for the archive from the saved Dandiset sketches.
 
-    Collects unique IPs across all provided blob directories (a true union
-    across all Dandisets), rounds the result, and writes the value to ``summary_file_path``.
+    Approximates :func:`_summarize_archive_unique_requester_count` (a true union across all Dandisets) by merging the
+    HyperLogLog sketch written for each Dandiset, which takes constant memory instead of holding every distinct IP.
 
     Parameters
     ----------
-    blob_directories : list of pathlib.Path
-        All per-blob extraction directories from all Dandisets.
+    summary_directory : pathlib.Path
+        The summary directory of the Dandisets whose sketches were saved by :func:`generate_dandiset_summaries`.
     summary_file_path : pathlib.Path
         Destination file where the rounded count will be written.
     modulo : int, optional
@@ -765,11 +1426,11 @@ def _summarize_archive_unique_requester_count(
         Minimum disclosure threshold. Counts below this are reported as ``"<{minimum}"``.
         Default is ``50``.
     """
-    unique_ips = _collect_unique_ips(blob_directories=blob_directories)
+    number_of_unique_ips = _estimate_cardinality(registers=_union_sketch_files(summary_directory=summary_directory))
 
-    if not unique_ips:
+    if number_of_unique_ips == 0:
         return
 
-    rounded_count = _round_requester_count(count=len(unique_ips), modulo=modulo, minimum=minimum)
+    rounded_count = _round_requester_count(count=number_of_unique_ips, modulo=modulo, minimum=minimum)
     summary_file_path.parent.mkdir(parents=True, exist_ok=True)
     summary_file_path.write_text(str(rounded_count))
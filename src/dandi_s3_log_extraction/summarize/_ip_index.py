@@ -0,0 +1,44 @@
+"""Dense integer indices for the IPs of the region cache, used to aggregate requesters without string lookups."""
+
+import numpy
+
+_MISSING_REGION = "missing"
+
+
+class _IPIndex:
+    """
+    Assign each IP of the IP-to-region cache a dense integer index and resolve regions through an array.
+
+    The cached IPs are sorted once so that the IPs of a whole blob can be looked up with a single vectorized binary
+    search; IPs absent from the cache have no index and resolve to the 'missing' region.
+    """
+
+    def __init__(self, *, ip_to_region: dict[str, str]) -> None:
+        ips = numpy.array(list(ip_to_region), dtype=bytes)
+        regions = numpy.array(list(ip_to_region.values()), dtype=str)
+
+        order = numpy.argsort(ips, kind="stable")
+        self.ips = ips[order]
+
+        region_names, region_codes = numpy.unique(regions, return_inverse=True)
+        self.region_names: list[str] = region_names.tolist() + [_MISSING_REGION]
+        self.missing_region_code = len(self.region_names) - 1
+        self.index_to_region_code = region_codes[order].astype(numpy.int32)
+
+    def __len__(self) -> int:
+        return self.ips.size
+
+    def get_indices(self, *, ips: numpy.ndarray) -> numpy.ndarray:
+        """Look up the index of each IP, or -1 for IPs that are not in the cache."""
+        if self.ips.size == 0:
+            return numpy.full(shape=ips.size, fill_value=-1, dtype=numpy.int64)
+
+        positions = numpy.minimum(numpy.searchsorted(self.ips, ips), self.ips.size - 1)
+        return numpy.where(self.ips[positions] == ips, positions, -1)
+
+    def get_region_codes(self, *, indices: numpy.ndarray) -> numpy.ndarray:
+        """Resolve indices from `get_indices` to positions in `region_names`."""
+        if self.ips.size == 0:
+            return numpy.full(shape=indices.size, fill_value=self.missing_region_code, dtype=numpy.int32)
+
+        return numpy.where(indices >= 0, self.index_to_region_code[indices], self.missing_region_code)
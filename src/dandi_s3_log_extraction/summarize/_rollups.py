@@ -0,0 +1,500 @@
+"""Mergeable per-blob aggregates and their persistent store for incremental summarization."""
+
+import dataclasses
+import os
+import pathlib
+
+import numpy
+
+from ._columns import (
+    _count_binary_rows,
+    _count_compacted_rows,
+    _epoch_seconds_to_day_keys,
+    _iterate_compacted_chunks,
+    _parse_day_keys,
+    _parse_integer_column,
+    _parse_ip_column,
+    _read_binary_columns,
+    _read_compacted_ip_dictionary,
+)
+from ._sketches import _reduce_sparse_sketch, _sketch_ips
+
+_COLUMN_FILE_NAMES = ("timestamps.txt", "bytes_sent.txt", "ips.txt", "download.txt")
+_ROLLUP_FORMAT_VERSION = 4
+# Number of bytes preceding a remembered offset that must be unchanged for the tail of a file to be trusted
+_FINGERPRINT_WIDTH = 64
+# Raised by a state file that was truncated, corrupted, or written by an older format
+_UNREADABLE_STATE_ERRORS = (OSError, ValueError, KeyError)
+_ROLLUP_ARRAY_FIELDS = (
+    "day_keys",
+    "bytes_sent_per_day",
+    "requests_per_day",
+    "downloads_per_day",
+    "ips",
+    "bytes_sent_per_ip",
+    "requests_per_ip",
+    "downloads_per_ip",
+    "sketch_register_indices",
+    "sketch_register_ranks",
+)
+
+
+@dataclasses.dataclass
+class _BlobRollup:
+    """
+    Partial aggregates of the access activity of a single blob.
+
+    Rollups of consecutive ranges of rows can be merged, so the activity of a blob never has to be parsed twice.
+    Regions are intentionally not resolved here, since the IP to region mapping grows between runs; the per-IP
+    aggregates are kept in order of first appearance instead.
+    """
+
+    number_of_requests: int = 0
+    bytes_sent: int = 0
+    number_of_downloads: int = 0
+
+    day_keys: numpy.ndarray = dataclasses.field(default_factory=lambda: numpy.empty(shape=0, dtype=numpy.int32))
+    bytes_sent_per_day: numpy.ndarray = dataclasses.field(
+        default_factory=lambda: numpy.empty(shape=0, dtype=numpy.uint64)
+    )
+    requests_per_day: numpy.ndarray = dataclasses.field(default_factory=lambda: numpy.empty(shape=0, dtype=numpy.int64))
+    downloads_per_day: numpy.ndarray = dataclasses.field(
+        default_factory=lambda: numpy.empty(shape=0, dtype=numpy.int64)
+    )
+
+    ips: numpy.ndarray = dataclasses.field(default_factory=lambda: numpy.empty(shape=0, dtype="S1"))
+    bytes_sent_per_ip: numpy.ndarray = dataclasses.field(
+        default_factory=lambda: numpy.empty(shape=0, dtype=numpy.uint64)
+    )
+    requests_per_ip: numpy.ndarray = dataclasses.field(default_factory=lambda: numpy.empty(shape=0, dtype=numpy.int64))
+    downloads_per_ip: numpy.ndarray = dataclasses.field(default_factory=lambda: numpy.empty(shape=0, dtype=numpy.int64))
+
+    # Sparse HyperLogLog sketch of the IPs, for approximate unique requester counts across blobs
+    sketch_register_indices: numpy.ndarray = dataclasses.field(
+        default_factory=lambda: numpy.empty(shape=0, dtype=numpy.uint16)
+    )
+    sketch_register_ranks: numpy.ndarray = dataclasses.field(
+        default_factory=lambda: numpy.empty(shape=0, dtype=numpy.uint8)
+    )
+
+    @classmethod
+    def from_columns(
+        cls,
+        *,
+        day_keys: numpy.ndarray,
+        bytes_sent: numpy.ndarray,
+        ips: numpy.ndarray,
+        downloads: numpy.ndarray,
+        ip_dictionary: numpy.ndarray | None = None,
+    ) -> "_BlobRollup":
+        """
+        Aggregate parsed column values, one entry per request.
+
+        Columns of unequal length are tolerated: totals use every value of their own column, while the grouped
+        aggregates only use the leading rows shared by all columns involved.
+        If an `ip_dictionary` is given, `ips` holds integer indices into it rather than the IPs themselves.
+        """
+        number_of_day_rows = min(day_keys.size, bytes_sent.size, downloads.size)
+        day_keys, day_indices = numpy.unique(day_keys[:number_of_day_rows], return_inverse=True)
+        bytes_sent_per_day, requests_per_day, downloads_per_day = _group_sums(
+            group_indices=day_indices,
+            number_of_groups=day_keys.size,
+            bytes_sent=bytes_sent[:number_of_day_rows],
+            downloads=downloads[:number_of_day_rows],
+        )
+
+        unique_ips, first_indices, ip_indices = numpy.unique(ips, return_index=True, return_inverse=True)
+        number_of_ip_rows = min(ips.size, bytes_sent.size, downloads.size)
+        bytes_sent_per_ip, requests_per_ip, downloads_per_ip = _group_sums(
+            group_indices=ip_indices[:number_of_ip_rows],
+            number_of_groups=unique_ips.size,
+            bytes_sent=bytes_sent[:number_of_ip_rows],
+            downloads=downloads[:number_of_ip_rows],
+        )
+        first_appearance_order = numpy.argsort(first_indices, kind="stable")
+        if ip_dictionary is not None:
+            unique_ips = ip_dictionary[unique_ips]
+        sketch_register_indices, sketch_register_ranks = _sketch_ips(ips=unique_ips)
+
+        return cls(
+            number_of_requests=bytes_sent.size,
+            bytes_sent=int(bytes_sent.sum()),
+            number_of_downloads=int(downloads.sum(dtype=numpy.int64)),
+            day_keys=day_keys.astype(numpy.int32),
+            bytes_sent_per_day=bytes_sent_per_day,
+            requests_per_day=requests_per_day.astype(numpy.int64),
+            downloads_per_day=downloads_per_day,
+            ips=unique_ips[first_appearance_order],
+            bytes_sent_per_ip=bytes_sent_per_ip[first_appearance_order],
+            requests_per_ip=requests_per_ip[first_appearance_order].astype(numpy.int64),
+            downloads_per_ip=downloads_per_ip[first_appearance_order],
+            sketch_register_indices=sketch_register_indices,
+            sketch_register_ranks=sketch_register_ranks,
+        )
+
+    def merge(self, *, other: "_BlobRollup") -> "_BlobRollup":
+        """Combine with the rollup of the rows that follow this one; IPs first seen here keep their position."""
+        if other.number_of_requests == 0 and other.ips.size == 0 and other.day_keys.size == 0:
+            return self
+        if self.number_of_requests == 0 and self.ips.size == 0 and self.day_keys.size == 0:
+            return other
+
+        day_keys, bytes_sent_per_day, requests_per_day, downloads_per_day = _merge_groups(
+            keys=(self.day_keys, other.day_keys),
+            bytes_sent=(self.bytes_sent_per_day, other.bytes_sent_per_day),
+            requests=(self.requests_per_day, other.requests_per_day),
+            downloads=(self.downloads_per_day, other.downloads_per_day),
+        )
+        ips, bytes_sent_per_ip, requests_per_ip, downloads_per_ip = _merge_groups(
+            keys=(self.ips, other.ips),
+            bytes_sent=(self.bytes_sent_per_ip, other.bytes_sent_per_ip),
+            requests=(self.requests_per_ip, other.requests_per_ip),
+            downloads=(self.downloads_per_ip, other.downloads_per_ip),
+            keep_first_appearance_order=True,
+        )
+        sketch_register_indices, sketch_register_ranks = _reduce_sparse_sketch(
+            register_indices=numpy.concatenate((self.sketch_register_indices, other.sketch_register_indices)),
+            ranks=numpy.concatenate((self.sketch_register_ranks, other.sketch_register_ranks)),
+        )
+
+        return _BlobRollup(
+            number_of_requests=self.number_of_requests + other.number_of_requests,
+            bytes_sent=self.bytes_sent + other.bytes_sent,
+            number_of_downloads=self.number_of_downloads + other.number_of_downloads,
+            day_keys=day_keys,
+            bytes_sent_per_day=bytes_sent_per_day,
+            requests_per_day=requests_per_day,
+            downloads_per_day=downloads_per_day,
+            ips=ips,
+            bytes_sent_per_ip=bytes_sent_per_ip,
+            requests_per_ip=requests_per_ip,
+            downloads_per_ip=downloads_per_ip,
+            sketch_register_indices=sketch_register_indices,
+            sketch_register_ranks=sketch_register_ranks,
+        )
+
+
+class _BlobRollupStore:
+    """
+    Persistent per-blob rollups, each paired with the byte offsets of the column files it has consumed.
+
+    The extraction step only ever appends to the column files of a blob, so a later run only needs to parse the tail
+    that was appended since the offsets were recorded. A file that shrank, was replaced, appeared, disappeared, or
+    whose bytes before the offset changed causes the blob to be reparsed from the beginning.
+
+    Rows already moved into the binary layout by `convert_to_binary_columns` precede the text columns; converting a
+    blob removes its text columns, so the next run parses it again from the beginning. Rows compacted by
+    `compact_extraction` precede both, and compacting a blob likewise causes it to be parsed again.
+
+    The state of each blob is kept in the `rollups` directory of the cache, mirroring the layout of the extraction
+    directory, apart from the summaries that are published.
+    """
+
+    def __init__(self, *, cache_directory: pathlib.Path, full_reparse: bool = False) -> None:
+        self.extraction_directory = cache_directory / "extraction"
+        self.rollup_directory = cache_directory / "rollups"
+        self.full_reparse = full_reparse
+
+    def get_rollup(self, *, blob_directory: pathlib.Path) -> _BlobRollup:
+        """Return the rollup of all rows of the blob, parsing only the part of each file not yet consumed."""
+        state_file_path = self._get_state_file_path(blob_directory=blob_directory)
+        if state_file_path is None:
+            return _read_blob_rollup(blob_directory=blob_directory)
+
+        stored_rollup, offsets = _BlobRollup(), None
+        if not self.full_reparse and state_file_path.exists():
+            stored_rollup, offsets = _load_state(state_file_path=state_file_path, blob_directory=blob_directory)
+
+        committed_rollup, new_offsets, pending_rollup = _read_blob_tail(blob_directory=blob_directory, offsets=offsets)
+        if offsets is None:
+            stored_rollup = (
+                _read_compacted_rollup(blob_directory=blob_directory)
+                .merge(other=_read_binary_rollup(blob_directory=blob_directory))
+                .merge(other=committed_rollup)
+            )
+        else:
+            stored_rollup = stored_rollup.merge(other=committed_rollup)
+
+        if offsets is None or new_offsets != offsets:
+            _save_state(
+                state_file_path=state_file_path,
+                blob_directory=blob_directory,
+                rollup=stored_rollup,
+                offsets=new_offsets,
+            )
+
+        # Rows that are not yet complete in every column are summarized, but not remembered
+        return stored_rollup.merge(other=pending_rollup)
+
+    def _get_state_file_path(self, *, blob_directory: pathlib.Path) -> pathlib.Path | None:
+        if not blob_directory.is_relative_to(self.extraction_directory):
+            return None
+
+        relative_blob_directory = blob_directory.relative_to(self.extraction_directory)
+        return self.rollup_directory / relative_blob_directory.parent / f"{relative_blob_directory.name}.npz"
+
+
+def _read_blob_rollup(*, blob_directory: pathlib.Path) -> _BlobRollup:
+    """Parse every row of the column files of a blob without consulting or updating any stored state."""
+    committed_rollup, _, pending_rollup = _read_blob_tail(blob_directory=blob_directory)
+    compacted_rollup = _read_compacted_rollup(blob_directory=blob_directory)
+    binary_rollup = _read_binary_rollup(blob_directory=blob_directory)
+    return compacted_rollup.merge(other=binary_rollup).merge(other=committed_rollup).merge(other=pending_rollup)
+
+
+def _read_compacted_rollup(*, blob_directory: pathlib.Path) -> _BlobRollup:
+    """Aggregate the compacted rows of a blob, if any, decompressing a single chunk at a time."""
+    ip_dictionary = _read_compacted_ip_dictionary(blob_directory=blob_directory)
+
+    rollup = _BlobRollup()
+    for epoch_seconds, bytes_sent, ip_indices, downloads in _iterate_compacted_chunks(blob_directory=blob_directory):
+        chunk_rollup = _BlobRollup.from_columns(
+            day_keys=_epoch_seconds_to_day_keys(epoch_seconds=epoch_seconds),
+            bytes_sent=bytes_sent,
+            ips=ip_indices,
+            downloads=downloads,
+            ip_dictionary=ip_dictionary,
+        )
+        rollup = rollup.merge(other=chunk_rollup)
+
+    # The rows are sorted by time, but the dictionary keeps the order in which the IPs were first extracted
+    dictionary_order = numpy.argsort(ip_dictionary, kind="stable")
+    dictionary_indices = dictionary_order[numpy.searchsorted(ip_dictionary[dictionary_order], rollup.ips)]
+    order = numpy.argsort(dictionary_indices, kind="stable")
+    return dataclasses.replace(
+        rollup,
+        ips=rollup.ips[order],
+        bytes_sent_per_ip=rollup.bytes_sent_per_ip[order],
+        requests_per_ip=rollup.requests_per_ip[order],
+        downloads_per_ip=rollup.downloads_per_ip[order],
+    )
+
+
+def _read_binary_rollup(*, blob_directory: pathlib.Path) -> _BlobRollup:
+    """Aggregate the rows of a blob in the binary layout, if any, directly from the memory-mapped columns."""
+    epoch_seconds, bytes_sent, ip_indices, downloads, ip_dictionary = _read_binary_columns(
+        blob_directory=blob_directory
+    )
+    if bytes_sent.size == 0:
+        return _BlobRollup()
+
+    return _BlobRollup.from_columns(
+        day_keys=_epoch_seconds_to_day_keys(epoch_seconds=epoch_seconds),
+        bytes_sent=bytes_sent,
+        ips=ip_indices,
+        downloads=downloads,
+        ip_dictionary=ip_dictionary,
+    )
+
+
+def _read_blob_tail(
+    *, blob_directory: pathlib.Path, offsets: tuple[int, ...] | None = None
+) -> tuple[_BlobRollup, tuple[int, ...], _BlobRollup]:
+    """
+    Parse the column files of a blob starting from the given byte offsets (-1 marks an absent file).
+
+    Returns the rollup of the rows that are complete in every present file, the offsets just past those rows, and
+    the rollup of any remaining partial rows.
+    """
+    offsets = offsets or tuple(0 for _ in _COLUMN_FILE_NAMES)
+
+    tails: list[bytes | None] = []
+    for file_name, offset in zip(_COLUMN_FILE_NAMES, offsets):
+        file_path = blob_directory / file_name
+        if not file_path.exists():
+            tails.append(None)
+            continue
+
+        with file_path.open(mode="rb") as file_stream:
+            file_stream.seek(offset)
+            tails.append(file_stream.read())
+
+    present_line_counts = [tail.count(b"\n") for tail in tails if tail is not None]
+    number_of_committed_rows = min(present_line_counts, default=0)
+
+    committed_tails: list[bytes | None] = []
+    pending_tails: list[bytes | None] = []
+    new_offsets: list[int] = []
+    for tail, offset in zip(tails, offsets):
+        if tail is None:
+            committed_tails.append(None)
+            pending_tails.append(None)
+            new_offsets.append(-1)
+            continue
+
+        split_index = _find_end_of_line(content=tail, number_of_lines=number_of_committed_rows)
+        committed_tails.append(tail[:split_index])
+        pending_tails.append(tail[split_index:])
+        new_offsets.append(offset + split_index)
+
+    committed_rollup = _parse_rollup(tails=committed_tails)
+    pending_rollup = _parse_rollup(tails=pending_tails) if any(pending_tails) else _BlobRollup()
+    return committed_rollup, tuple(new_offsets), pending_rollup
+
+
+def _find_end_of_line(*, content: bytes, number_of_lines: int) -> int:
+    """Return the index just past the newline that ends the given number of leading lines."""
+    if number_of_lines == 0:
+        return 0
+
+    newline_positions = numpy.flatnonzero(numpy.frombuffer(buffer=content, dtype=numpy.uint8) == ord("\n"))
+    return int(newline_positions[number_of_lines - 1]) + 1
+
+
+def _parse_rollup(*, tails: list[bytes | None]) -> _BlobRollup:
+    timestamps_content, bytes_sent_content, ips_content, download_content = tails
+
+    day_keys = (
+        _parse_day_keys(content=timestamps_content)
+        if timestamps_content is not None
+        else numpy.empty(shape=0, dtype=numpy.int32)
+    )
+    bytes_sent = (
+        _parse_integer_column(content=bytes_sent_content, dtype=numpy.uint64)
+        if bytes_sent_content is not None
+        else numpy.empty(shape=0, dtype=numpy.uint64)
+    )
+    ips = _parse_ip_column(content=ips_content) if ips_content is not None else numpy.empty(shape=0, dtype="S1")
+    downloads = (
+        _parse_integer_column(content=download_content, dtype=numpy.uint8)
+        if download_content is not None
+        else numpy.zeros(shape=bytes_sent.size, dtype=numpy.uint8)
+    )
+
+    return _BlobRollup.from_columns(day_keys=day_keys, bytes_sent=bytes_sent, ips=ips, downloads=downloads)
+
+
+def _load_state(
+    *, state_file_path: pathlib.Path, blob_directory: pathlib.Path
+) -> tuple[_BlobRollup, tuple[int, ...] | None]:
+    """Load a stored rollup, or return an empty rollup and no offsets if the files no longer extend the state."""
+    try:
+        with numpy.load(file=state_file_path, allow_pickle=False) as state:
+            if int(state["version"]) != _ROLLUP_FORMAT_VERSION:
+                return _BlobRollup(), None
+
+            offsets = tuple(state["offsets"].tolist())
+            number_of_binary_rows = int(state["binary_rows"])
+            number_of_compacted_rows = int(state["compacted_rows"])
+            inodes = state["inodes"].tolist()
+            fingerprints = [state[f"fingerprint_{index}"].tobytes() for index in range(len(_COLUMN_FILE_NAMES))]
+            totals = state["totals"].tolist()
+            rollup = _BlobRollup(
+                number_of_requests=totals[0],
+                bytes_sent=int(state["bytes_sent"][0]),
+                number_of_downloads=totals[1],
+                **{field: state[field] for field in _ROLLUP_ARRAY_FIELDS},
+            )
+    except _UNREADABLE_STATE_ERRORS:
+        return _BlobRollup(), None  # An unreadable state is treated the same as a missing one
+
+    if (
+        _count_binary_rows(blob_directory=blob_directory) != number_of_binary_rows
+        or _count_compacted_rows(blob_directory=blob_directory) != number_of_compacted_rows
+    ):
+        return _BlobRollup(), None
+
+    for file_name, offset, inode, fingerprint in zip(_COLUMN_FILE_NAMES, offsets, inodes, fingerprints):
+        file_path = blob_directory / file_name
+        if offset == -1:
+            if file_path.exists():
+                return _BlobRollup(), None
+            continue
+
+        if not file_path.exists():
+            return _BlobRollup(), None
+
+        file_stat = file_path.stat()
+        if file_stat.st_ino != inode or file_stat.st_size < offset:
+            return _BlobRollup(), None
+
+        with file_path.open(mode="rb") as file_stream:
+            file_stream.seek(offset - len(fingerprint))
+            if file_stream.read(len(fingerprint)) != fingerprint:
+                return _BlobRollup(), None
+
+    return rollup, offsets
+
+
+def _save_state(
+    *, state_file_path: pathlib.Path, blob_directory: pathlib.Path, rollup: _BlobRollup, offsets: tuple[int, ...]
+) -> None:
+    inodes = []
+    fingerprints = dict()
+    for index, (file_name, offset) in enumerate(zip(_COLUMN_FILE_NAMES, offsets)):
+        fingerprint = b""
+        inode = 0
+        if offset != -1:
+            file_path = blob_directory / file_name
+            inode = file_path.stat().st_ino
+            with file_path.open(mode="rb") as file_stream:
+                file_stream.seek(max(offset - _FINGERPRINT_WIDTH, 0))
+                fingerprint = file_stream.read(offset - max(offset - _FINGERPRINT_WIDTH, 0))
+
+        inodes.append(inode)
+        fingerprints[f"fingerprint_{index}"] = numpy.frombuffer(buffer=fingerprint, dtype=numpy.uint8)
+
+    state_file_path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_file_path = state_file_path.with_name(f"{state_file_path.name}.{os.getpid()}.tmp")
+    with temporary_file_path.open(mode="wb") as file_stream:
+        numpy.savez(
+            file_stream,
+            version=numpy.array(_ROLLUP_FORMAT_VERSION),
+            offsets=numpy.array(offsets, dtype=numpy.int64),
+            binary_rows=numpy.array(_count_binary_rows(blob_directory=blob_directory)),
+            compacted_rows=numpy.array(_count_compacted_rows(blob_directory=blob_directory)),
+            inodes=numpy.array(inodes, dtype=numpy.uint64),
+            totals=numpy.array([rollup.number_of_requests, rollup.number_of_downloads], dtype=numpy.int64),
+            # Stored separately since the total number of bytes sent by a blob may exceed the range of int64
+            bytes_sent=numpy.array([rollup.bytes_sent], dtype=numpy.uint64),
+            **fingerprints,
+            **{field: getattr(rollup, field) for field in _ROLLUP_ARRAY_FIELDS},
+        )
+    os.replace(src=temporary_file_path, dst=state_file_path)
+
+
+def _merge_groups(
+    *,
+    keys: tuple[numpy.ndarray, numpy.ndarray],
+    bytes_sent: tuple[numpy.ndarray, numpy.ndarray],
+    requests: tuple[numpy.ndarray, numpy.ndarray],
+    downloads: tuple[numpy.ndarray, numpy.ndarray],
+    keep_first_appearance_order: bool = False,
+) -> tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+    """Sum two sets of grouped aggregates over the union of their keys, returned in sorted order by default."""
+    unique_keys, first_indices, group_indices = numpy.unique(
+        numpy.concatenate(keys), return_index=True, return_inverse=True
+    )
+
+    bytes_sent_per_group = numpy.zeros(shape=unique_keys.size, dtype=numpy.uint64)
+    numpy.add.at(bytes_sent_per_group, group_indices, numpy.concatenate(bytes_sent).astype(numpy.uint64))
+    requests_per_group = numpy.zeros(shape=unique_keys.size, dtype=numpy.int64)
+    numpy.add.at(requests_per_group, group_indices, numpy.concatenate(requests).astype(numpy.int64))
+    downloads_per_group = numpy.zeros(shape=unique_keys.size, dtype=numpy.int64)
+    numpy.add.at(downloads_per_group, group_indices, numpy.concatenate(downloads).astype(numpy.int64))
+
+    if not keep_first_appearance_order:
+        return unique_keys, bytes_sent_per_group, requests_per_group, downloads_per_group
+
+    order = numpy.argsort(first_indices, kind="stable")
+    return unique_keys[order], bytes_sent_per_group[order], requests_per_group[order], downloads_per_group[order]
+
+
+def _group_sums(
+    *,
+    group_indices: numpy.ndarray,
+    number_of_groups: int,
+    bytes_sent: numpy.ndarray,
+    downloads: numpy.ndarray,
+) -> tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+    """Sum bytes sent, requests, and downloads for each group of rows labelled by `group_indices`."""
+    # Byte counts are summed in integer arithmetic since floating point weights would lose precision
+    bytes_sent_per_group = numpy.zeros(shape=number_of_groups, dtype=numpy.uint64)
+    numpy.add.at(bytes_sent_per_group, group_indices, bytes_sent)
+
+    requests_per_group = numpy.bincount(group_indices, minlength=number_of_groups)
+    downloads_per_group = numpy.bincount(group_indices, weights=downloads, minlength=number_of_groups).astype(
+        numpy.int64
+    )
+
+    return bytes_sent_per_group, requests_per_group, downloads_per_group
@@ -0,0 +1,118 @@
+"""HyperLogLog sketches for approximate, mergeable counts of unique requesters."""
+
+import pathlib
+
+import numpy
+
+# 2**14 registers give a relative standard error of about 0.8%, well within the rounding applied to requester counts
+_SKETCH_PRECISION = 14
+_NUMBER_OF_REGISTERS = 2**_SKETCH_PRECISION
+_SKETCH_DIRECTORY_NAME = "sketches"
+
+
+def _hash_ips(*, ips: numpy.ndarray) -> numpy.ndarray:
+    """Hash an array of IP byte strings into well-mixed 64-bit integers (stable across runs and platforms)."""
+    if ips.size == 0:
+        return numpy.empty(shape=0, dtype=numpy.uint64)
+
+    # Pad each string to a whole number of 64-bit words and fold them together with the SplitMix64 finalizer
+    number_of_words = -(-ips.dtype.itemsize // 8)
+    words = numpy.ascontiguousarray(ips.astype(f"S{number_of_words * 8}")).view("<u8").reshape(-1, number_of_words)
+
+    hashes = numpy.full(shape=ips.size, fill_value=0x9E3779B97F4A7C15, dtype=numpy.uint64)
+    with numpy.errstate(over="ignore"):
+        for word_index in range(number_of_words):
+            hashes ^= words[:, word_index]
+            hashes += numpy.uint64(0x9E3779B97F4A7C15)
+            hashes ^= hashes >> numpy.uint64(30)
+            hashes *= numpy.uint64(0xBF58476D1CE4E5B9)
+            hashes ^= hashes >> numpy.uint64(27)
+            hashes *= numpy.uint64(0x94D049BB133111EB)
+            hashes ^= hashes >> numpy.uint64(31)
+
+    return hashes
+
+
+def _sketch_ips(*, ips: numpy.ndarray) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    Build the sparse HyperLogLog sketch of a set of IPs.
+
+    Returns the indices of the non-empty registers and their values, which take far less space than the dense
+    registers for the typical blob that is only accessed by a handful of requesters.
+    """
+    hashes = _hash_ips(ips=ips)
+    register_indices = (hashes >> numpy.uint64(64 - _SKETCH_PRECISION)).astype(numpy.uint16)
+
+    # The rank is the position of the leftmost set bit among the remaining bits, counting from one
+    remaining_bits = hashes & numpy.uint64((1 << (64 - _SKETCH_PRECISION)) - 1)
+    ranks = (64 - _SKETCH_PRECISION + 1 - _bit_length(values=remaining_bits)).astype(numpy.uint8)
+
+    return _reduce_sparse_sketch(register_indices=register_indices, ranks=ranks)
+
+
+def _reduce_sparse_sketch(
+    *, register_indices: numpy.ndarray, ranks: numpy.ndarray
+) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """Keep the maximum rank of each register, as the union of sketches does."""
+    unique_register_indices, inverse = numpy.unique(register_indices, return_inverse=True)
+    maximum_ranks = numpy.zeros(shape=unique_register_indices.size, dtype=numpy.uint8)
+    numpy.maximum.at(maximum_ranks, inverse, ranks)
+
+    return unique_register_indices.astype(numpy.uint16), maximum_ranks
+
+
+def _add_sparse_sketch(*, registers: numpy.ndarray, register_indices: numpy.ndarray, ranks: numpy.ndarray) -> None:
+    """Union a sparse sketch into dense registers in place."""
+    numpy.maximum.at(registers, register_indices, ranks)
+
+
+def _new_registers() -> numpy.ndarray:
+    return numpy.zeros(shape=_NUMBER_OF_REGISTERS, dtype=numpy.uint8)
+
+
+def _estimate_cardinality(*, registers: numpy.ndarray) -> int:
+    """Estimate the number of distinct items in dense registers, using linear counting for small cardinalities."""
+    number_of_registers = registers.size
+    alpha = 0.7213 / (1 + 1.079 / number_of_registers)
+    raw_estimate = alpha * number_of_registers**2 / numpy.sum(numpy.ldexp(1.0, -registers.astype(numpy.int64)))
+
+    number_of_empty_registers = int(numpy.count_nonzero(registers == 0))
+    if raw_estimate <= 2.5 * number_of_registers and number_of_empty_registers > 0:
+        return round(number_of_registers * numpy.log(number_of_registers / number_of_empty_registers))
+
+    return round(raw_estimate)
+
+
+def _bit_length(*, values: numpy.ndarray) -> numpy.ndarray:
+    """Vectorized `int.bit_length` for unsigned 64-bit integers."""
+    bit_lengths = numpy.zeros(shape=values.size, dtype=numpy.int64)
+    values = values.copy()
+    for shift in (32, 16, 8, 4, 2, 1):
+        is_wide = values >= numpy.uint64(1 << shift)
+        bit_lengths += shift * is_wide
+        values[is_wide] >>= numpy.uint64(shift)
+    bit_lengths += values > 0
+
+    return bit_lengths
+
+
+def _get_sketch_directory(*, summary_directory: pathlib.Path) -> pathlib.Path:
+    """The sketches are kept in the cache next to the summary directory, apart from the summaries that are published."""
+    return summary_directory.parent / _SKETCH_DIRECTORY_NAME
+
+
+def _get_sketch_file_path(*, summary_directory: pathlib.Path, dandiset_id: str) -> pathlib.Path:
+    return _get_sketch_directory(summary_directory=summary_directory) / f"{dandiset_id}.npy"
+
+
+def _union_sketch_files(*, summary_directory: pathlib.Path) -> numpy.ndarray:
+    """Union the sketches saved for every Dandiset (including the `undetermined` bucket) into one."""
+    registers = _new_registers()
+    sketch_directory = _get_sketch_directory(summary_directory=summary_directory)
+    if not sketch_directory.exists():
+        return registers
+
+    for sketch_file_path in sketch_directory.glob(pattern="*.npy"):
+        numpy.maximum(registers, numpy.load(file=sketch_file_path, allow_pickle=False), out=registers)
+
+    return registers
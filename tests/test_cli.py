@@ -33,7 +33,14 @@ def test_extract_remote_mode(tmp_path: pathlib.Path) -> None:
         result = runner.invoke(_dandis3logextraction_cli, ["extract", str(tmp_path), "--mode", "remote"])
 
         assert result.exit_code == 0, result.output
-        mock_extractor_class.assert_called_once_with(cache_directory=None)
+        mock_extractor_class.assert_called_once_with(
+            cache_directory=None,
+            flush_record_threshold=None,
+            flush_byte_threshold=None,
+            files_per_invocation=1,
+            prefilter=False,
+            range_size=None,
+        )
         mock_extractor.extract_s3_bucket.assert_called_once_with(
             s3_root=str(tmp_path), limit=None, workers=-2, inventory_directory=None
         )
@@ -66,7 +73,14 @@ def test_extract_with_limit_and_workers(tmp_path: pathlib.Path) -> None:
         )
 
         assert result.exit_code == 0, result.output
-        mock_extractor_class.assert_called_once_with(cache_directory=None)
+        mock_extractor_class.assert_called_once_with(
+            cache_directory=None,
+            flush_record_threshold=None,
+            flush_byte_threshold=None,
+            files_per_invocation=1,
+            prefilter=False,
+            range_size=None,
+        )
         mock_extractor.extract_s3_bucket.assert_called_once_with(
             s3_root=str(tmp_path), limit=5, workers=2, inventory_directory=None
         )
@@ -90,7 +104,14 @@ def test_extract_remote_with_inventory(tmp_path: pathlib.Path) -> None:
         )
 
         assert result.exit_code == 0, result.output
-        mock_extractor_class.assert_called_once_with(cache_directory=None)
+        mock_extractor_class.assert_called_once_with(
+            cache_directory=None,
+            flush_record_threshold=None,
+            flush_byte_threshold=None,
+            files_per_invocation=1,
+            prefilter=False,
+            range_size=None,
+        )
         mock_extractor.extract_s3_bucket.assert_called_once_with(
             s3_root=str(tmp_path),
             limit=None,
@@ -117,7 +138,14 @@ def test_extract_remote_with_cache(tmp_path: pathlib.Path) -> None:
         )
 
         assert result.exit_code == 0, result.output
-        mock_extractor_class.assert_called_once_with(cache_directory=cache_dir)
+        mock_extractor_class.assert_called_once_with(
+            cache_directory=cache_dir,
+            flush_record_threshold=None,
+            flush_byte_threshold=None,
+            files_per_invocation=1,
+            prefilter=False,
+            range_size=None,
+        )
         mock_extractor.extract_s3_bucket.assert_called_once_with(
             s3_root=str(tmp_path),
             limit=None,
@@ -126,6 +154,74 @@ def test_extract_remote_with_cache(tmp_path: pathlib.Path) -> None:
         )
 
 
+@pytest.mark.ai_generated
+def test_extract_remote_with_flush_thresholds(tmp_path: pathlib.Path) -> None:
+    """Test extract command with --flush-records and --flush-bytes passes the streaming thresholds to the extractor."""
+    runner = CliRunner()
+    with patch(
+        "dandi_s3_log_extraction._command_line_interface._cli.DandiRemoteS3LogAccessExtractor"
+    ) as mock_extractor_class:
+        result = runner.invoke(
+            _dandis3logextraction_cli,
+            ["extract", str(tmp_path), "--mode", "remote", "--flush-records", "100000", "--flush-bytes", "4096"],
+        )
+
+        assert result.exit_code == 0, result.output
+        mock_extractor_class.assert_called_once_with(
+            cache_directory=None,
+            flush_record_threshold=100_000,
+            flush_byte_threshold=4096,
+            files_per_invocation=1,
+            prefilter=False,
+            range_size=None,
+        )
+
+
+@pytest.mark.ai_generated
+def test_extract_remote_with_files_per_invocation_and_prefilter(tmp_path: pathlib.Path) -> None:
+    """Test extract command with --files-per-invocation and --prefilter passes both to the extractor."""
+    runner = CliRunner()
+    with patch(
+        "dandi_s3_log_extraction._command_line_interface._cli.DandiRemoteS3LogAccessExtractor"
+    ) as mock_extractor_class:
+        result = runner.invoke(
+            _dandis3logextraction_cli,
+            ["extract", str(tmp_path), "--mode", "remote", "--files-per-invocation", "50", "--prefilter"],
+        )
+
+        assert result.exit_code == 0, result.output
+        mock_extractor_class.assert_called_once_with(
+            cache_directory=None,
+            flush_record_threshold=None,
+            flush_byte_threshold=None,
+            files_per_invocation=50,
+            prefilter=True,
+            range_size=None,
+        )
+
+
+@pytest.mark.ai_generated
+def test_extract_remote_with_range_size(tmp_path: pathlib.Path) -> None:
+    """Test extract command with --range-size passes it to the extractor."""
+    runner = CliRunner()
+    with patch(
+        "dandi_s3_log_extraction._command_line_interface._cli.DandiRemoteS3LogAccessExtractor"
+    ) as mock_extractor_class:
+        result = runner.invoke(
+            _dandis3logextraction_cli, ["extract", str(tmp_path), "--mode", "remote", "--range-size", "1000000"]
+        )
+
+        assert result.exit_code == 0, result.output
+        mock_extractor_class.assert_called_once_with(
+            cache_directory=None,
+            flush_record_threshold=None,
+            flush_byte_threshold=None,
+            files_per_invocation=1,
+            prefilter=False,
+            range_size=1_000_000,
+        )
+
+
 @pytest.mark.ai_generated
 def test_stop_default_timeout() -> None:
     """Test stop command calls stop_extraction with default timeout of 600 seconds."""
@@ -148,6 +244,53 @@ def test_stop_custom_timeout() -> None:
         mock_s3.extractors.stop_extraction.assert_called_once_with(max_timeout_in_seconds=30)
 
 
+@pytest.mark.ai_generated
+def test_convert_with_workers_and_cache(tmp_path: pathlib.Path) -> None:
+    """Test convert command forwards --workers and --cache to convert_to_binary_columns."""
+    runner = CliRunner()
+    with patch("dandi_s3_log_extraction._command_line_interface._cli.convert_to_binary_columns") as mock_convert:
+        result = runner.invoke(_dandis3logextraction_cli, ["convert", "--workers", "1", "--cache", str(tmp_path)])
+
+        assert result.exit_code == 0, result.output
+        mock_convert.assert_called_once_with(cache_directory=str(tmp_path), workers=1)
+
+
+@pytest.mark.ai_generated
+def test_compact_with_workers_and_cache(tmp_path: pathlib.Path) -> None:
+    """Test compact command forwards --workers and --cache to compact_extraction."""
+    runner = CliRunner()
+    with patch("dandi_s3_log_extraction._command_line_interface._cli.compact_extraction") as mock_compact:
+        result = runner.invoke(_dandis3logextraction_cli, ["compact", "--workers", "1", "--cache", str(tmp_path)])
+
+        assert result.exit_code == 0, result.output
+        mock_compact.assert_called_once_with(cache_directory=str(tmp_path), workers=1)
+
+
+@pytest.mark.ai_generated
+def test_index_with_cache(tmp_path: pathlib.Path) -> None:
+    """Test index command forwards --cache to build_blob_index."""
+    runner = CliRunner()
+    with patch("dandi_s3_log_extraction._command_line_interface._cli.build_blob_index") as mock_build:
+        result = runner.invoke(_dandis3logextraction_cli, ["index", "--cache", str(tmp_path)])
+
+        assert result.exit_code == 0, result.output
+        mock_build.assert_called_once_with(cache_directory=str(tmp_path))
+
+
+@pytest.mark.ai_generated
+def test_metrics_prints_report(tmp_path: pathlib.Path) -> None:
+    """Test metrics command forwards --slowest and --cache and prints the report."""
+    runner = CliRunner()
+    with patch(
+        "dandi_s3_log_extraction._command_line_interface._cli.summarize_extraction_metrics", return_value="report"
+    ) as mock_summarize:
+        result = runner.invoke(_dandis3logextraction_cli, ["metrics", "--slowest", "3", "--cache", str(tmp_path)])
+
+        assert result.exit_code == 0, result.output
+        assert result.output == "report\n"
+        mock_summarize.assert_called_once_with(cache_directory=str(tmp_path), number_of_slowest=3)
+
+
 @pytest.mark.ai_generated
 def test_update_summaries_default_mode() -> None:
     """Test update summaries with default mode calls generate_dandiset_summaries."""
@@ -163,6 +306,11 @@ def test_update_summaries_default_mode() -> None:
             content_id_to_usage_dandiset_path_url=None,
             api_url=None,
             unassociated=False,
+            full_reparse=False,
+            incremental=False,
+            approximate_requester_counts=False,
+            offline=False,
+            dandiset_listing_max_age_hours=24.0,
             cache_directory=None,
         )
 
@@ -178,6 +326,26 @@ def test_update_summaries_archive_mode() -> None:
         mock_s3.summarize.generate_archive_summaries.assert_called_once_with(cache_directory=None)
 
 
+@pytest.mark.ai_generated
+def test_update_summaries_archive_mode_approximate_requester_counts() -> None:
+    """Test update summaries with --mode archive --approximate-requester-counts also merges the Dandiset sketches."""
+    runner = CliRunner()
+    with (
+        patch("dandi_s3_log_extraction._command_line_interface._cli.s3_log_extraction") as mock_s3,
+        patch(
+            "dandi_s3_log_extraction._command_line_interface._cli.generate_approximate_archive_requester_count"
+        ) as mock_generate,
+    ):
+        result = runner.invoke(
+            _dandis3logextraction_cli,
+            ["update", "summaries", "--mode", "archive", "--approximate-requester-counts", "--cache", "/tmp/cache"],
+        )
+
+        assert result.exit_code == 0, result.output
+        mock_s3.summarize.generate_archive_summaries.assert_called_once_with(cache_directory="/tmp/cache")
+        mock_generate.assert_called_once_with(cache_directory="/tmp/cache")
+
+
 @pytest.mark.ai_generated
 def test_update_summaries_with_pick_and_skip() -> None:
     """Test update summaries splits --pick and --skip comma-separated values into lists."""
@@ -193,6 +361,11 @@ def test_update_summaries_with_pick_and_skip() -> None:
             content_id_to_usage_dandiset_path_url=None,
             api_url=None,
             unassociated=False,
+            full_reparse=False,
+            incremental=False,
+            approximate_requester_counts=False,
+            offline=False,
+            dandiset_listing_max_age_hours=24.0,
             cache_directory=None,
         )
 
@@ -214,6 +387,12 @@ def test_update_summaries_with_all_options() -> None:
                 "--api-url",
                 "https://api.example.com",
                 "--unassociated",
+                "--full-reparse",
+                "--incremental",
+                "--approximate-requester-counts",
+                "--offline",
+                "--dandiset-listing-max-age",
+                "0.5",
             ],
         )
 
@@ -225,6 +404,11 @@ def test_update_summaries_with_all_options() -> None:
             content_id_to_usage_dandiset_path_url="https://example.com",
             api_url="https://api.example.com",
             unassociated=True,
+            full_reparse=True,
+            incremental=True,
+            approximate_requester_counts=True,
+            offline=True,
+            dandiset_listing_max_age_hours=0.5,
             cache_directory=None,
         )
 
@@ -247,5 +431,10 @@ def test_update_summaries_with_cache(tmp_path: pathlib.Path) -> None:
             content_id_to_usage_dandiset_path_url=None,
             api_url=None,
             unassociated=False,
+            full_reparse=False,
+            incremental=False,
+            approximate_requester_counts=False,
+            offline=False,
+            dandiset_listing_max_age_hours=24.0,
             cache_directory=str(tmp_path),
         )
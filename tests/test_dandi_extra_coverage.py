@@ -4,24 +4,66 @@ import gzip
 import json
 import os
 import pathlib
+import pickle
 import warnings
 from unittest.mock import MagicMock, patch
 
+import numpy
 import pandas
 import pytest
 
 import dandi_s3_log_extraction
 import dandi_s3_log_extraction.summarize
+from dandi_s3_log_extraction._journal._utils import _prune_journal, _read_journal, _save_journal_cursor
 from dandi_s3_log_extraction._parallel._utils import _handle_max_workers
+from dandi_s3_log_extraction.extractors import compact_extraction, convert_to_binary_columns
+from dandi_s3_log_extraction.extractors._compact_extraction import _compact_blob
+from dandi_s3_log_extraction.extractors._convert_to_binary_columns import _convert_blob_to_binary_columns
+from dandi_s3_log_extraction.summarize._blob_index import _consolidate_blob_index, _load_blob_index
+from dandi_s3_log_extraction.summarize._blob_references import _build_blob_references
+from dandi_s3_log_extraction.summarize._columns import (
+    _BINARY_COLUMN_FILE_NAMES_AND_DTYPES,
+    _count_binary_rows,
+    _count_compacted_rows,
+    _epoch_seconds_to_day_keys,
+    _iterate_compacted_chunks,
+    _parse_epoch_seconds,
+    _read_binary_columns,
+    _read_compacted_ip_dictionary,
+    _read_day_keys,
+    _read_integer_column,
+    _read_ip_column,
+)
+from dandi_s3_log_extraction.summarize._content_id_index import _ContentIDIndex, _write_content_id_index
 from dandi_s3_log_extraction.summarize._generate_dandiset_summaries import (
+    _aggregate_dandiset_activity,
     _collect_unique_ips,
+    _DandisetActivity,
+    _get_calendar_labels,
+    _get_content_id_index,
+    _get_dandiset_ids,
+    _initialize_summary_worker,
+    _plan_summary_tasks,
     _round_requester_count,
     _summarize_archive_by_asset_type_per_week,
     _summarize_archive_unique_requester_count,
-    _summarize_dandiset_by_asset,
-    _summarize_dandiset_by_day,
-    _summarize_dandiset_by_region,
-    _summarize_dandiset_unique_requester_count,
+    _summarize_dandiset,
+    _summarize_dandiset_in_worker,
+    _summarize_dandisets_in_parallel,
+    _timestamp_to_date_format,
+    _timestamp_to_week_start_date,
+    _write_dandiset_by_asset,
+    _write_dandiset_by_day,
+    _write_dandiset_by_region,
+    _write_dandiset_unique_requester_count,
+)
+from dandi_s3_log_extraction.summarize._ip_index import _IPIndex
+from dandi_s3_log_extraction.summarize._rollups import _BlobRollupStore, _read_blob_rollup
+from dandi_s3_log_extraction.summarize._sketches import (
+    _add_sparse_sketch,
+    _estimate_cardinality,
+    _new_registers,
+    _sketch_ips,
 )
 
 # ─── _handle_max_workers ──────────────────────────────────────────────────────
@@ -69,6 +111,442 @@ def test_dandi_remote_extractor_init(tmp_path: pathlib.Path, monkeypatch: pytest
     assert "IPS_TO_SKIP_REGEX" in extractor._awk_env
     assert extractor._awk_env["IPS_TO_SKIP_REGEX"] == "192.168.0.1|10.0.0.1"
     assert extractor.use_encryption is False
+    assert "FLUSH_RECORD_THRESHOLD" not in extractor._awk_env
+    assert "FLUSH_BYTE_THRESHOLD" not in extractor._awk_env
+
+
+@pytest.mark.ai_generated
+def test_dandi_remote_extractor_flush_thresholds(tmp_path: pathlib.Path) -> None:
+    """Streaming thresholds are passed to the awk script through its environment."""
+    from dandi_s3_log_extraction.extractors import DandiRemoteS3LogAccessExtractor
+
+    extractor = DandiRemoteS3LogAccessExtractor(
+        cache_directory=tmp_path, flush_record_threshold=50_000, flush_byte_threshold=1_048_576
+    )
+    assert extractor._awk_env["FLUSH_RECORD_THRESHOLD"] == "50000"
+    assert extractor._awk_env["FLUSH_BYTE_THRESHOLD"] == "1048576"
+
+
+@pytest.mark.ai_generated
+def test_dandi_remote_extractor_ips_to_skip_file(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """A valid file of IPs and CIDR ranges to skip is passed to the awk script, falling back to the environment."""
+    from dandi_s3_log_extraction.extractors import DandiRemoteS3LogAccessExtractor
+
+    ips_to_skip_file_path = tmp_path / "ips_to_skip.txt"
+    ips_to_skip_file_path.write_text("# Drogon\n192.0.2.1\n198.51.100.0/22  # range\n\n2001:db8::1\n10.0.0.0/8\n")
+
+    extractor = DandiRemoteS3LogAccessExtractor(cache_directory=tmp_path, ips_to_skip_file_path=ips_to_skip_file_path)
+    assert extractor._awk_env["IPS_TO_SKIP_FILE_PATH"] == str(ips_to_skip_file_path)
+
+    monkeypatch.setenv("IPS_TO_SKIP_FILE", str(ips_to_skip_file_path))
+    extractor = DandiRemoteS3LogAccessExtractor(cache_directory=tmp_path)
+    assert extractor._awk_env["IPS_TO_SKIP_FILE_PATH"] == str(ips_to_skip_file_path)
+
+
+@pytest.mark.ai_generated
+@pytest.mark.parametrize(
+    ("entry", "match"),
+    [("192.0.2.300", "not an IP or CIDR range"), ("2001:db8::/64", "only individual IPv6 addresses")],
+)
+def test_dandi_remote_extractor_rejects_invalid_ips_to_skip(tmp_path: pathlib.Path, entry: str, match: str) -> None:
+    """Entries that the awk script cannot match are rejected, naming their line."""
+    from dandi_s3_log_extraction.extractors import DandiRemoteS3LogAccessExtractor
+
+    ips_to_skip_file_path = tmp_path / "ips_to_skip.txt"
+    ips_to_skip_file_path.write_text(f"192.0.2.1\n{entry}\n")
+
+    with pytest.raises(ValueError, match=f"Line 2 .* {match}"):
+        DandiRemoteS3LogAccessExtractor(cache_directory=tmp_path, ips_to_skip_file_path=ips_to_skip_file_path)
+
+
+@pytest.mark.ai_generated
+def test_dandi_remote_extractor_prefilter_keeps_only_candidate_lines(tmp_path: pathlib.Path) -> None:
+    """The prefilter passes the lines of every file that may be extracted, in order, to the extraction script."""
+    import subprocess
+
+    from dandi_s3_log_extraction.extractors import DandiRemoteS3LogAccessExtractor
+
+    example_log_file_paths = sorted((pathlib.Path(__file__).parent / "example_logs").iterdir())
+    extractor = DandiRemoteS3LogAccessExtractor(cache_directory=tmp_path, prefilter=True)
+
+    # Substitute the extraction script with `cat` to observe the lines it would receive
+    run = subprocess.run
+    results = []
+
+    def run_cat(*, args: list[str], **kwargs) -> subprocess.CompletedProcess:
+        results.append(run(args=["cat"], **kwargs))
+        return results[-1]
+
+    module_name = "dandi_s3_log_extraction.extractors._dandi_remote_s3_log_access_extractor"
+    with patch(f"{module_name}.subprocess.run", side_effect=run_cat):
+        extractor._run_extraction(file_path=example_log_file_paths[0])
+        extractor._run_group_extraction(file_paths=example_log_file_paths)
+
+        with pytest.raises(RuntimeError, match="Error codes 2 \\(grep\\)"):
+            extractor._run_extraction(file_path=tmp_path / "missing.log")
+
+    def get_candidate_lines(*, file_paths: list[pathlib.Path]) -> list[str]:
+        lines = [line for file_path in file_paths for line in file_path.read_text().splitlines()]
+        return [line for line in lines if "REST.GET.OBJECT blobs" in line or "REST.GET.OBJECT zarr/" in line]
+
+    assert results[0].stdout.splitlines() == get_candidate_lines(file_paths=example_log_file_paths[:1])
+    assert results[1].stdout.splitlines() == get_candidate_lines(file_paths=example_log_file_paths)
+
+
+@pytest.mark.ai_generated
+def test_dandi_remote_extractor_prefilter_keeps_lines_with_invalid_utf8(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Lines with bytes that are not valid UTF-8 pass the prefilter under a UTF-8 locale, as the script reads them."""
+    import subprocess
+
+    from dandi_s3_log_extraction.extractors import DandiRemoteS3LogAccessExtractor
+
+    example_log_file_path = sorted((pathlib.Path(__file__).parent / "example_logs").iterdir())[0]
+    first_line = example_log_file_path.read_bytes().splitlines()[0]
+    invalid_line = first_line.replace(b'"-" "-"', b'"-" "agent \xff\xfe"', 1)
+    assert invalid_line != first_line
+    log_file_path = tmp_path / "2020-01-01-05-06-35-0123456789ABCDEF"
+    log_file_path.write_bytes(invalid_line + b"\n" + first_line + b"\n")
+
+    monkeypatch.setenv("LC_ALL", "C.UTF-8")
+    extractor = DandiRemoteS3LogAccessExtractor(cache_directory=tmp_path, prefilter=True)
+
+    # Substitute the extraction script with `cat` to observe the bytes it would receive
+    run = subprocess.run
+    results = []
+
+    def run_cat(*, args: list[str], **kwargs) -> subprocess.CompletedProcess:
+        results.append(run(args=["cat"], **{**kwargs, "errors": "surrogateescape"}))
+        return results[-1]
+
+    module_name = "dandi_s3_log_extraction.extractors._dandi_remote_s3_log_access_extractor"
+    with patch(f"{module_name}.subprocess.run", side_effect=run_cat):
+        extractor._run_extraction(file_path=log_file_path)
+
+    assert results[0].stdout.encode(errors="surrogateescape") == log_file_path.read_bytes()
+
+
+@pytest.mark.ai_generated
+def test_dandi_remote_extractor_groups_files_per_invocation(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Log files are dispatched in groups, each parsed by one awk call that is bracketed by per-file records."""
+    from dandi_s3_log_extraction.extractors import DandiRemoteS3LogAccessExtractor
+
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "key")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "secret")
+    log_directory = tmp_path / "logs"
+    log_directory.mkdir()
+    s3_urls = []
+    for index in range(5):
+        log_file_path = log_directory / f"2020-01-01-00-00-0{index}-ABC"
+        log_file_path.write_text("")
+        s3_urls.append(str(log_file_path))
+
+    cache_directory = tmp_path / "cache"
+    cache_directory.mkdir()
+    extractor = DandiRemoteS3LogAccessExtractor(cache_directory=cache_directory, files_per_invocation=2)
+    module_name = "dandi_s3_log_extraction.extractors._dandi_remote_s3_log_access_extractor"
+    with (
+        patch.object(extractor, "_get_unprocessed_s3_urls", return_value=s3_urls),
+        patch(f"{module_name}._deploy_subprocess", return_value="12\t3\t2\t2\n") as mock_deploy_subprocess,
+    ):
+        extractor.extract_s3_bucket(s3_root=str(log_directory), limit=4, workers=1)
+
+    gawk_commands = [call.kwargs["command"] for call in mock_deploy_subprocess.call_args_list]
+    assert len(gawk_commands) == 2
+    assert all(command.count(str(extractor.temporary_directory)) == 2 for command in gawk_commands)
+
+    record_keys = [pathlib.Path(s3_url).name for s3_url in s3_urls[:4]]
+    assert extractor.s3_url_processing_start_record_file_path.read_text().splitlines() == record_keys
+    assert extractor.s3_url_processing_end_record_file_path.read_text().splitlines() == record_keys
+
+    metrics = pandas.read_table(extractor.metrics_file_path)
+    assert metrics["log_files"].tolist() == [",".join(record_keys[:2]), ",".join(record_keys[2:])]
+    assert metrics["lines_scanned"].tolist() == [12, 12]
+    assert metrics["lines_kept"].tolist() == [3, 3]
+    assert metrics["worker"].tolist() == [os.getpid(), os.getpid()]
+
+
+@pytest.mark.ai_generated
+def test_dandi_remote_extractor_prefilter_metrics_count_all_input_lines(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """With the prefilter, the lines scanned are those of the log files rather than those that passed the filter."""
+    from dandi_s3_log_extraction.extractors import DandiRemoteS3LogAccessExtractor
+
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "key")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "secret")
+    log_directory = tmp_path / "logs"
+    log_directory.mkdir()
+    s3_urls = []
+    for index, content in enumerate(["a\nb\nc\n", "d\ne"]):
+        log_file_path = log_directory / f"2020-01-01-00-00-0{index}-ABC"
+        log_file_path.write_text(content)
+        s3_urls.append(str(log_file_path))
+
+    cache_directory = tmp_path / "cache"
+    cache_directory.mkdir()
+    extractor = DandiRemoteS3LogAccessExtractor(cache_directory=cache_directory, files_per_invocation=2, prefilter=True)
+    with (
+        patch.object(extractor, "_get_unprocessed_s3_urls", return_value=s3_urls),
+        patch.object(extractor, "_run_prefiltered_extraction", return_value="1\t1\t1\t1\n"),
+    ):
+        extractor.extract_s3_bucket(s3_root=str(log_directory), workers=1)
+
+    metrics = pandas.read_table(extractor.metrics_file_path)
+    assert metrics["lines_scanned"].tolist() == [5]
+    assert metrics["lines_kept"].tolist() == [1]
+
+
+@pytest.mark.ai_generated
+def test_summarize_extraction_metrics_reports_percentiles_and_slowest_units(tmp_path: pathlib.Path) -> None:
+    """The report covers the overall rates, per-unit percentiles, and lists the slowest units first."""
+    from dandi_s3_log_extraction.extractors import summarize_extraction_metrics
+    from dandi_s3_log_extraction.extractors._extraction_metrics import _append_extraction_metrics
+
+    assert "No extraction metrics" in summarize_extraction_metrics(cache_directory=tmp_path)
+
+    records_directory = tmp_path / "records"
+    records_directory.mkdir()
+    metrics = [
+        {
+            "log_files": f"log-{index}",
+            "input_bytes": 1_000_000,
+            "lines_scanned": 1_000,
+            "lines_kept": 100,
+            "number_of_objects": 10,
+            "maximum_rows_per_object": 20,
+            "download_seconds": 0.1,
+            "wall_seconds": float(index + 1),
+            "cpu_seconds": 0.5,
+            "worker": 100 + index % 2,
+        }
+        for index in range(4)
+    ]
+    metrics_file_path = records_directory / "Extractor_extraction-metrics.tsv"
+    _append_extraction_metrics(metrics_file_path=metrics_file_path, metrics=metrics[:2])
+    _append_extraction_metrics(metrics_file_path=metrics_file_path, metrics=metrics[2:])
+
+    report = summarize_extraction_metrics(cache_directory=tmp_path, number_of_slowest=2)
+
+    assert "4 units of work by 2 worker processes, 4.0 MB read, 4000 lines scanned, 400 lines kept" in report
+    assert "Per worker: 400 lines/s, 40 kept lines/s, 0.40 MB/s, 20% of the wall time" in report
+    assert "p50" in report and "p99" in report and "max" in report
+    slowest = report.split("Slowest units of work:")[1]
+    assert slowest.index("log-3") < slowest.index("log-2")
+    assert "log-1" not in slowest
+
+
+@pytest.mark.ai_generated
+def test_plan_extraction_units_splits_large_files_and_groups_small_ones() -> None:
+    """Large files become consecutive byte ranges completed by their last range; small files are grouped."""
+    from dandi_s3_log_extraction.extractors._extraction_units import _plan_extraction_units
+
+    sizes = {"s3://bucket/a": 10, "s3://bucket/b": 250, "s3://bucket/c": 20, "s3://bucket/d": 30}
+    units = _plan_extraction_units(
+        s3_urls=list(sizes), files_per_invocation=2, range_size=100, get_size=sizes.__getitem__
+    )
+
+    assert [unit.segments for unit in units] == [
+        (("s3://bucket/b", 0, 83),),
+        (("s3://bucket/b", 83, 166),),
+        (("s3://bucket/b", 166, 250),),
+        (("s3://bucket/a", 0, None), ("s3://bucket/c", 0, None)),
+        (("s3://bucket/d", 0, None),),
+    ]
+    assert [unit.completed_s3_urls for unit in units] == [
+        (),
+        (),
+        ("s3://bucket/b",),
+        ("s3://bucket/a", "s3://bucket/c"),
+        ("s3://bucket/d",),
+    ]
+
+
+@pytest.mark.ai_generated
+def test_get_s3_url_sizes_looks_up_concurrently(tmp_path: pathlib.Path) -> None:
+    """The sizes of the log files of a round are looked up concurrently, in the order of the URLs."""
+    import threading
+
+    from dandi_s3_log_extraction.extractors import _extraction_units
+
+    s3_urls = []
+    for index in range(8):
+        log_file_path = tmp_path / f"log-{index}"
+        log_file_path.write_bytes(b"x" * index)
+        s3_urls.append(str(log_file_path))
+
+    # Every lookup waits for three others to start, which only completes if they are in flight at the same time
+    barrier = threading.Barrier(parties=4, timeout=10)
+    get_s3_url_size = _extraction_units._get_s3_url_size
+
+    def get_s3_url_size_after_barrier(s3_url: str) -> int:
+        barrier.wait()
+        return get_s3_url_size(s3_url)
+
+    with patch.object(_extraction_units, "_get_s3_url_size", side_effect=get_s3_url_size_after_barrier):
+        s3_url_to_size = _extraction_units._get_s3_url_sizes(s3_urls=s3_urls)
+
+    assert list(s3_url_to_size.items()) == [(s3_url, index) for index, s3_url in enumerate(s3_urls)]
+
+
+@pytest.mark.ai_generated
+@pytest.mark.parametrize("range_size", [1, 7, 30, 1_000])
+def test_read_s3_url_segment_partitions_lines(tmp_path: pathlib.Path, range_size: int) -> None:
+    """Consecutive byte ranges return every line exactly once, including lines longer than a range."""
+    from dandi_s3_log_extraction.extractors._extraction_units import _plan_extraction_units, _read_s3_url_segment
+
+    content = b"first\n\na much longer line than the others\nx\nlast line without a newline"
+    log_file_path = tmp_path / "log"
+    log_file_path.write_bytes(content)
+
+    units = _plan_extraction_units(
+        s3_urls=[str(log_file_path)], files_per_invocation=1, range_size=range_size, get_size=lambda _: len(content)
+    )
+    segments = [
+        _read_s3_url_segment(s3_url=s3_url, start=start, end=end)
+        for unit in units
+        for s3_url, start, end in unit.segments
+    ]
+
+    assert b"".join(segments) == content
+    assert all(segment.endswith(b"\n") or content.endswith(segment) for segment in segments)
+
+
+@pytest.mark.ai_generated
+def test_merge_run_files_appends_aligned_columns_in_run_order(tmp_path: pathlib.Path) -> None:
+    """Sorted runs are merged per object in run order after existing rows; missing runs are skipped."""
+    from dandi_s3_log_extraction.extractors._run_files import _merge_run_files
+
+    extraction_directory = tmp_path / "extraction"
+    existing_directory = extraction_directory / "blobs" / "aaa"
+    existing_directory.mkdir(parents=True)
+    for file_name, value in zip(["timestamps.txt", "bytes_sent.txt", "ips.txt", "download.txt"], ["1", "2", "3", "0"]):
+        (existing_directory / file_name).write_text(f"{value}\n")
+
+    first_run_file_path = tmp_path / "0.tsv"
+    first_run_file_path.write_text(
+        "blobs/aaa\t200101000000\t10\t1.1.1.1\t1\n"
+        "blobs/aaa\t200101000001\t11\t1.1.1.2\t0\n"
+        "blobs/bbb\t200101000002\t12\t1.1.1.3\t1\n"
+    )
+    second_run_file_path = tmp_path / "2.tsv"
+    second_run_file_path.write_text("blobs/aaa\t200101000003\t13\t1.1.1.4\t1\nzarr/ccc\t200101000004\t14\t1.1.1.5\t0\n")
+
+    _merge_run_files(
+        run_file_paths=[first_run_file_path, tmp_path / "1.tsv", second_run_file_path],
+        extraction_directory=extraction_directory,
+    )
+
+    assert (existing_directory / "timestamps.txt").read_text().splitlines() == [
+        "1",
+        "200101000000",
+        "200101000001",
+        "200101000003",
+    ]
+    assert (existing_directory / "bytes_sent.txt").read_text().splitlines() == ["2", "10", "11", "13"]
+    assert (existing_directory / "ips.txt").read_text().splitlines() == ["3", "1.1.1.1", "1.1.1.2", "1.1.1.4"]
+    assert (existing_directory / "download.txt").read_text().splitlines() == ["0", "1", "0", "1"]
+    assert (extraction_directory / "blobs" / "bbb" / "ips.txt").read_text() == "1.1.1.3\n"
+    assert (extraction_directory / "zarr" / "ccc" / "download.txt").read_text() == "0\n"
+
+
+@pytest.mark.ai_generated
+@pytest.mark.skipif(not pathlib.Path("/proc/self/fd").is_dir(), reason="Counts the open files of the process.")
+def test_merge_run_files_bounds_open_files_for_more_runs_than_the_fan_in(tmp_path: pathlib.Path) -> None:
+    """More runs than the fan-in are merged in passes under a limit of open files below the number of runs."""
+    import resource
+
+    from dandi_s3_log_extraction.extractors._run_files import _MERGE_FAN_IN, _merge_run_files
+
+    run_directory = tmp_path / "runs"
+    run_directory.mkdir()
+    number_of_runs = 3 * _MERGE_FAN_IN
+    run_file_paths = [run_directory / f"{run_index}.tsv" for run_index in range(number_of_runs)]
+    for run_index, run_file_path in enumerate(run_file_paths):
+        other_object_line = f"blobs/bbb\t{run_index:012d}\t1\t1.1.1.2\t0\n" if run_index % 2 == 0 else ""
+        run_file_path.write_text(f"blobs/aaa\t{run_index:012d}\t1\t1.1.1.1\t1\n{other_object_line}")
+
+    extraction_directory = tmp_path / "extraction"
+    soft_limit, hard_limit = resource.getrlimit(resource.RLIMIT_NOFILE)
+    number_of_open_files = len(list(pathlib.Path("/proc/self/fd").iterdir()))
+    resource.setrlimit(resource.RLIMIT_NOFILE, (number_of_open_files + _MERGE_FAN_IN + 16, hard_limit))
+    try:
+        _merge_run_files(run_file_paths=run_file_paths, extraction_directory=extraction_directory)
+    finally:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (soft_limit, hard_limit))
+
+    assert (extraction_directory / "blobs" / "aaa" / "timestamps.txt").read_text().splitlines() == [
+        f"{run_index:012d}" for run_index in range(number_of_runs)
+    ]
+    assert (extraction_directory / "blobs" / "bbb" / "timestamps.txt").read_text().splitlines() == [
+        f"{run_index:012d}" for run_index in range(0, number_of_runs, 2)
+    ]
+    assert (extraction_directory / "blobs" / "bbb" / "download.txt").read_text() == "0\n" * (number_of_runs // 2)
+    # The intermediate runs are removed along with their directory
+    assert sorted(run_directory.iterdir()) == sorted(run_file_paths)
+
+
+@pytest.mark.ai_generated
+def test_merge_run_files_keeps_run_order_over_several_passes(tmp_path: pathlib.Path) -> None:
+    """Runs reduced over several merge passes keep the requests of each object in the order of the runs."""
+    from dandi_s3_log_extraction.extractors._run_files import _merge_run_files
+
+    run_file_paths = [tmp_path / f"{run_index}.tsv" for run_index in range(20)]
+    for run_index, run_file_path in enumerate(run_file_paths):
+        run_file_path.write_text(f"blobs/aaa\t{run_index:012d}\t{run_index}\t1.1.1.1\t1\n")
+
+    extraction_directory = tmp_path / "extraction"
+    with patch("dandi_s3_log_extraction.extractors._run_files._MERGE_FAN_IN", 3):
+        _merge_run_files(run_file_paths=run_file_paths, extraction_directory=extraction_directory)
+
+    assert (extraction_directory / "blobs" / "aaa" / "bytes_sent.txt").read_text().splitlines() == [
+        str(run_index) for run_index in range(20)
+    ]
+
+
+@pytest.mark.ai_generated
+def test_roll_back_commit_restores_files_from_before_an_interrupted_commit(tmp_path: pathlib.Path) -> None:
+    """Rolling back truncates appended files, removes created ones, and ignores a partially recorded line."""
+    from dandi_s3_log_extraction.extractors._run_files import _merge_run_files, _roll_back_commit, _start_commit
+
+    records_directory = tmp_path / "records"
+    records_directory.mkdir()
+    start_record_file_path = records_directory / "start.txt"
+    start_record_file_path.write_text("log-0\n")
+    end_record_file_path = records_directory / "end.txt"
+    end_record_file_path.write_text("log-0\n")
+    extraction_directory = tmp_path / "extraction"
+    existing_timestamps_file_path = extraction_directory / "blobs" / "aaa" / "timestamps.txt"
+    existing_timestamps_file_path.parent.mkdir(parents=True)
+    existing_timestamps_file_path.write_text("200101000000\n")
+    commit_file_path = records_directory / "pending-commit.tsv"
+
+    _start_commit(commit_file_path=commit_file_path, file_paths=[start_record_file_path, end_record_file_path])
+    with start_record_file_path.open(mode="a") as file_stream:
+        file_stream.write("log-1\n")
+    run_file_path = tmp_path / "0.tsv"
+    run_file_path.write_text("blobs/aaa\t200101000001\t10\t1.1.1.1\t1\nblobs/bbb\t200101000002\t11\t1.1.1.2\t0\n")
+    _merge_run_files(
+        run_file_paths=[run_file_path], extraction_directory=extraction_directory, commit_file_path=commit_file_path
+    )
+    with end_record_file_path.open(mode="a") as file_stream:
+        file_stream.write("log-1\n")
+    # The process died while recording the next object of the commit
+    with commit_file_path.open(mode="a") as file_stream:
+        file_stream.write("0\t../extraction/blobs/c")
+
+    with pytest.warns(UserWarning, match="Rolled back an interrupted extraction commit of 10 files"):
+        _roll_back_commit(commit_file_path=commit_file_path)
+
+    assert not commit_file_path.exists()
+    assert start_record_file_path.read_text() == "log-0\n"
+    assert end_record_file_path.read_text() == "log-0\n"
+    assert existing_timestamps_file_path.read_text() == "200101000000\n"
+    assert not (existing_timestamps_file_path.parent / "ips.txt").exists()
+    assert list((extraction_directory / "blobs" / "bbb").iterdir()) == []
 
 
 # ─── generate_dandiset_summaries error cases ─────────────────────────────────
@@ -91,6 +569,7 @@ def _make_fake_gz_response(content_map: dict, status_code: int = 200) -> MagicMo
     mock_response = MagicMock()
     mock_response.status_code = status_code
     mock_response.content = gzip.compress(json.dumps(content_map).encode())
+    mock_response.headers = {}
     mock_response.json.return_value = {"error": "request failed"}
     return mock_response
 
@@ -107,6 +586,7 @@ def test_generate_dandiset_summaries_http_error_determinable(tmp_path: pathlib.P
             "dandi_s3_log_extraction.summarize._generate_dandiset_summaries.requests.get",
             return_value=mock_response,
         ),
+        patch("dandi.dandiapi.DandiAPIClient"),
         pytest.raises(RuntimeError),
     ):
         dandi_s3_log_extraction.summarize.generate_dandiset_summaries(
@@ -241,8 +721,8 @@ def test_summarize_archive_only_week_start_column(tmp_path: pathlib.Path) -> Non
 
 
 @pytest.mark.ai_generated
-def test_summarize_dandiset_by_day_number_of_requests(tmp_path: pathlib.Path) -> None:
-    """_summarize_dandiset_by_day thresholds request/download counts below override minimum."""
+def test_write_dandiset_by_day_number_of_requests(tmp_path: pathlib.Path) -> None:
+    """_write_dandiset_by_day thresholds request/download counts below override minimum."""
     blob_dir = tmp_path / "blob1"
     blob_dir.mkdir()
     (blob_dir / "timestamps.txt").write_text("200101050635\n200101224258\n200109050635\n")
@@ -250,9 +730,10 @@ def test_summarize_dandiset_by_day_number_of_requests(tmp_path: pathlib.Path) ->
     (blob_dir / "download.txt").write_text("1\n0\n1\n")
 
     summary_file_path = tmp_path / "by_day.tsv"
-    _summarize_dandiset_by_day(
-        blob_directories=[blob_dir], summary_file_path=summary_file_path, request_count_minimum=5
+    activity = _aggregate_dandiset_activity(
+        blob_directories=[blob_dir], ip_index=_IPIndex(ip_to_region=dict()), blob_id_to_asset_path={}
     )
+    _write_dandiset_by_day(activity=activity, summary_file_path=summary_file_path, request_count_minimum=5)
 
     result = pandas.read_table(filepath_or_buffer=summary_file_path)
     assert "number_of_requests" in result.columns
@@ -268,8 +749,8 @@ def test_summarize_dandiset_by_day_number_of_requests(tmp_path: pathlib.Path) ->
 
 
 @pytest.mark.ai_generated
-def test_summarize_dandiset_by_asset_number_of_requests(tmp_path: pathlib.Path) -> None:
-    """_summarize_dandiset_by_asset thresholds request/download counts below override minimum."""
+def test_write_dandiset_by_asset_number_of_requests(tmp_path: pathlib.Path) -> None:
+    """_write_dandiset_by_asset thresholds request/download counts below override minimum."""
     blob_dir = tmp_path / "blobid1"
     blob_dir.mkdir()
     (blob_dir / "bytes_sent.txt").write_text("512\n1024\n256\n")
@@ -277,12 +758,12 @@ def test_summarize_dandiset_by_asset_number_of_requests(tmp_path: pathlib.Path)
 
     blob_id_to_asset_path = {"blobid1": "path/to/asset.nwb"}
     summary_file_path = tmp_path / "by_asset.tsv"
-    _summarize_dandiset_by_asset(
+    activity = _aggregate_dandiset_activity(
         blob_directories=[blob_dir],
-        summary_file_path=summary_file_path,
+        ip_index=_IPIndex(ip_to_region=dict()),
         blob_id_to_asset_path=blob_id_to_asset_path,
-        request_count_minimum=5,
     )
+    _write_dandiset_by_asset(activity=activity, summary_file_path=summary_file_path, request_count_minimum=5)
 
     result = pandas.read_table(filepath_or_buffer=summary_file_path)
     assert "number_of_requests" in result.columns
@@ -293,8 +774,8 @@ def test_summarize_dandiset_by_asset_number_of_requests(tmp_path: pathlib.Path)
 
 
 @pytest.mark.ai_generated
-def test_summarize_dandiset_by_region_number_of_requests(tmp_path: pathlib.Path) -> None:
-    """_summarize_dandiset_by_region thresholds request/download counts below override minimum."""
+def test_write_dandiset_by_region_number_of_requests(tmp_path: pathlib.Path) -> None:
+    """_write_dandiset_by_region thresholds request/download counts below override minimum."""
     blob_dir = tmp_path / "blob1"
     blob_dir.mkdir()
     (blob_dir / "ips.txt").write_text("192.0.2.1\n192.0.2.2\n192.0.2.1\n")
@@ -303,12 +784,10 @@ def test_summarize_dandiset_by_region_number_of_requests(tmp_path: pathlib.Path)
 
     ip_to_region = {"192.0.2.1": "US/California", "192.0.2.2": "US/New York"}
     summary_file_path = tmp_path / "by_region.tsv"
-    _summarize_dandiset_by_region(
-        blob_directories=[blob_dir],
-        summary_file_path=summary_file_path,
-        ip_to_region=ip_to_region,
-        request_count_minimum=5,
+    activity = _aggregate_dandiset_activity(
+        blob_directories=[blob_dir], ip_index=_IPIndex(ip_to_region=ip_to_region), blob_id_to_asset_path={}
     )
+    _write_dandiset_by_region(activity=activity, summary_file_path=summary_file_path, request_count_minimum=5)
 
     result = pandas.read_table(filepath_or_buffer=summary_file_path)
     assert "number_of_requests" in result.columns
@@ -324,8 +803,8 @@ def test_summarize_dandiset_by_region_number_of_requests(tmp_path: pathlib.Path)
 
 
 @pytest.mark.ai_generated
-def test_summarize_dandiset_by_day_rounds_request_and_download_counts(tmp_path: pathlib.Path) -> None:
-    """_summarize_dandiset_by_day rounds request/download counts when above override minimum."""
+def test_write_dandiset_by_day_rounds_request_and_download_counts(tmp_path: pathlib.Path) -> None:
+    """_write_dandiset_by_day rounds request/download counts when above override minimum."""
     blob_dir = tmp_path / "blob1"
     blob_dir.mkdir()
     (blob_dir / "timestamps.txt").write_text("\n".join(["200101010000"] * 35))
@@ -333,9 +812,10 @@ def test_summarize_dandiset_by_day_rounds_request_and_download_counts(tmp_path:
     (blob_dir / "download.txt").write_text("\n".join(["1"] * 35))
 
     summary_file_path = tmp_path / "by_day.tsv"
-    _summarize_dandiset_by_day(
-        blob_directories=[blob_dir], summary_file_path=summary_file_path, request_count_minimum=30
+    activity = _aggregate_dandiset_activity(
+        blob_directories=[blob_dir], ip_index=_IPIndex(ip_to_region=dict()), blob_id_to_asset_path={}
     )
+    _write_dandiset_by_day(activity=activity, summary_file_path=summary_file_path, request_count_minimum=30)
 
     result = pandas.read_table(filepath_or_buffer=summary_file_path)
     row = result[result["date"] == "2020-01-01"].iloc[0]
@@ -412,28 +892,28 @@ def test_collect_unique_ips_missing_dir(tmp_path: pathlib.Path) -> None:
     assert result == set()
 
 
-# ─── _summarize_dandiset_unique_requester_count ───────────────────────────────
+# ─── _write_dandiset_unique_requester_count ───────────────────────────────────
 
 
 @pytest.mark.ai_generated
-def test_summarize_dandiset_unique_requester_count_writes_rounded_sentinel(tmp_path: pathlib.Path) -> None:
-    """_summarize_dandiset_unique_requester_count writes the sentinel when count < minimum."""
+def test_write_dandiset_unique_requester_count_writes_rounded_sentinel(tmp_path: pathlib.Path) -> None:
+    """_write_dandiset_unique_requester_count writes the sentinel when count < minimum."""
     blob_dir = tmp_path / "blob1"
     blob_dir.mkdir()
     (blob_dir / "ips.txt").write_text("192.0.2.10\n192.0.2.20\n192.0.2.10\n")  # 2 unique IPs < 50 minimum
 
     summary_file_path = tmp_path / "requester_count.tsv"
-    _summarize_dandiset_unique_requester_count(
-        blob_directories=[blob_dir],
-        summary_file_path=summary_file_path,
+    activity = _aggregate_dandiset_activity(
+        blob_directories=[blob_dir], ip_index=_IPIndex(ip_to_region=dict()), blob_id_to_asset_path={}
     )
+    _write_dandiset_unique_requester_count(activity=activity, summary_file_path=summary_file_path)
 
     assert summary_file_path.read_text() == "<50"
 
 
 @pytest.mark.ai_generated
-def test_summarize_dandiset_unique_requester_count_writes_rounded_count(tmp_path: pathlib.Path) -> None:
-    """_summarize_dandiset_unique_requester_count writes a rounded count when count >= minimum."""
+def test_write_dandiset_unique_requester_count_writes_rounded_count(tmp_path: pathlib.Path) -> None:
+    """_write_dandiset_unique_requester_count writes a rounded count when count >= minimum."""
     blob_dir = tmp_path / "blob1"
     blob_dir.mkdir()
     # 55 unique IPs → >= 50 minimum → rounded to nearest 20 = 60
@@ -441,40 +921,40 @@ def test_summarize_dandiset_unique_requester_count_writes_rounded_count(tmp_path
     (blob_dir / "ips.txt").write_text(unique_ips)
 
     summary_file_path = tmp_path / "requester_count.tsv"
-    _summarize_dandiset_unique_requester_count(
-        blob_directories=[blob_dir],
-        summary_file_path=summary_file_path,
+    activity = _aggregate_dandiset_activity(
+        blob_directories=[blob_dir], ip_index=_IPIndex(ip_to_region=dict()), blob_id_to_asset_path={}
     )
+    _write_dandiset_unique_requester_count(activity=activity, summary_file_path=summary_file_path)
 
     assert summary_file_path.read_text() == "60"
 
 
 @pytest.mark.ai_generated
-def test_summarize_dandiset_unique_requester_count_no_ips(tmp_path: pathlib.Path) -> None:
-    """_summarize_dandiset_unique_requester_count returns early when no ips.txt exists."""
+def test_write_dandiset_unique_requester_count_no_ips(tmp_path: pathlib.Path) -> None:
+    """_write_dandiset_unique_requester_count returns early when no ips.txt exists."""
     blob_dir = tmp_path / "blob1"
     blob_dir.mkdir()
     # No ips.txt file
 
     summary_file_path = tmp_path / "requester_count.tsv"
-    _summarize_dandiset_unique_requester_count(
-        blob_directories=[blob_dir],
-        summary_file_path=summary_file_path,
+    activity = _aggregate_dandiset_activity(
+        blob_directories=[blob_dir], ip_index=_IPIndex(ip_to_region=dict()), blob_id_to_asset_path={}
     )
+    _write_dandiset_unique_requester_count(activity=activity, summary_file_path=summary_file_path)
 
     assert not summary_file_path.exists()
 
 
 @pytest.mark.ai_generated
-def test_summarize_dandiset_unique_requester_count_missing_blob_dir(tmp_path: pathlib.Path) -> None:
-    """_summarize_dandiset_unique_requester_count skips non-existent blob directories."""
+def test_write_dandiset_unique_requester_count_missing_blob_dir(tmp_path: pathlib.Path) -> None:
+    """_write_dandiset_unique_requester_count skips non-existent blob directories."""
     missing_dir = tmp_path / "nonexistent"
 
     summary_file_path = tmp_path / "requester_count.tsv"
-    _summarize_dandiset_unique_requester_count(
-        blob_directories=[missing_dir],
-        summary_file_path=summary_file_path,
+    activity = _aggregate_dandiset_activity(
+        blob_directories=[missing_dir], ip_index=_IPIndex(ip_to_region=dict()), blob_id_to_asset_path={}
     )
+    _write_dandiset_unique_requester_count(activity=activity, summary_file_path=summary_file_path)
 
     assert not summary_file_path.exists()
 
@@ -513,3 +993,1261 @@ def test_summarize_archive_unique_requester_count_empty(tmp_path: pathlib.Path)
     )
 
     assert not archive_file.exists()
+
+
+# ─── _summarize_dandiset (single-pass aggregation) ───────────────────────────
+
+
+@pytest.mark.ai_generated
+def test_summarize_dandiset_writes_expected_summaries(tmp_path: pathlib.Path) -> None:
+    """_summarize_dandiset writes every summary table of a Dandiset from a single pass over its blobs."""
+    blob_dir1 = tmp_path / "extraction" / "blobid1"
+    blob_dir1.mkdir(parents=True)
+    (blob_dir1 / "timestamps.txt").write_text("200101050635\n200101224258\n200109050635\n")
+    (blob_dir1 / "bytes_sent.txt").write_text("100\n200\n300\n")
+    (blob_dir1 / "ips.txt").write_text("192.0.2.1\n192.0.2.2\n192.0.2.1\n")
+    (blob_dir1 / "download.txt").write_text("1\n0\n1\n")
+
+    blob_dir2 = tmp_path / "extraction" / "blobid2"
+    blob_dir2.mkdir(parents=True)
+    (blob_dir2 / "timestamps.txt").write_text("200108010101\n")
+    (blob_dir2 / "bytes_sent.txt").write_text("50\n")
+    (blob_dir2 / "ips.txt").write_text("192.0.2.3\n")
+    # No download.txt → counted as zero downloads
+
+    missing_blob_dir = tmp_path / "extraction" / "never_accessed"
+    blob_directories = [blob_dir1, missing_blob_dir, blob_dir2]
+    ip_to_region = {"192.0.2.1": "US/California", "192.0.2.2": "US/New York"}
+    blob_id_to_asset_path = {"blobid1": "sub-1/sub-1_ephys.nwb", "blobid2": "sub-1/sub-1_video.mp4"}
+
+    summary_directory = tmp_path / "summaries"
+    _summarize_dandiset(
+        dandiset_id="000001",
+        blob_directories=blob_directories,
+        summary_directory=summary_directory,
+        ip_index=_IPIndex(ip_to_region=ip_to_region),
+        blob_id_to_asset_path=blob_id_to_asset_path,
+    )
+
+    # 2020-01-01 is a Wednesday, so its week starts on the Monday of 2019-12-30
+    expected_file_name_to_content = {
+        "by_day.tsv": (
+            "date\tbytes_sent\tnumber_of_requests\tnumber_of_downloads\n"
+            "2020-01-01\t300\t<50\t<50\n"
+            "2020-01-08\t50\t<50\t<50\n"
+            "2020-01-09\t300\t<50\t<50\n"
+        ),
+        "by_asset.tsv": (
+            "asset_path\tbytes_sent\tnumber_of_requests\tnumber_of_downloads\n"
+            "sub-1/sub-1_ephys.nwb\t600\t<50\t<50\n"
+            "sub-1/sub-1_video.mp4\t50\t<50\t<50\n"
+        ),
+        "by_asset_per_week.tsv": (
+            "week_start\tsub-1/sub-1_ephys.nwb\tsub-1/sub-1_video.mp4\n2019-12-30\t300\t0\n2020-01-06\t300\t50\n"
+        ),
+        "by_asset_type_per_week.tsv": "week_start\tNeurophysiology\tVideo\n2019-12-30\t300\t0\n2020-01-06\t300\t50\n",
+        "by_region.tsv": (
+            "region\tbytes_sent\tnumber_of_requests\tnumber_of_downloads\n"
+            "US/California\t400\t<50\t<50\n"
+            "US/New York\t200\t<50\t<50\n"
+            "missing\t50\t<50\t<50\n"
+        ),
+        "requester_count.tsv": "<50",
+    }
+    for file_name, expected_content in expected_file_name_to_content.items():
+        assert (summary_directory / "000001" / file_name).read_text() == expected_content, file_name
+
+
+# ─── summary worker initialization ───────────────────────────────────────────
+
+
+@pytest.mark.ai_generated
+def test_summarize_dandiset_in_worker_uses_initialized_mappings(tmp_path: pathlib.Path) -> None:
+    """_summarize_dandiset_in_worker resolves regions and asset paths from the per-worker mappings."""
+    blob_dir = tmp_path / "extraction" / "blobid1"
+    blob_dir.mkdir(parents=True)
+    (blob_dir / "timestamps.txt").write_text("200101050635\n")
+    (blob_dir / "bytes_sent.txt").write_text("100\n")
+    (blob_dir / "ips.txt").write_text("192.0.2.1\n")
+    (blob_dir / "download.txt").write_text("1\n")
+
+    _initialize_summary_worker(
+        _IPIndex(ip_to_region={"192.0.2.1": "US/California"}), {"blobid1": "sub-1/sub-1_ephys.nwb"}
+    )
+    try:
+        summary_directory = tmp_path / "summaries"
+        _summarize_dandiset_in_worker(
+            dandiset_id="000001", blob_directories=[blob_dir], summary_directory=summary_directory
+        )
+    finally:
+        _initialize_summary_worker(_IPIndex(ip_to_region={}), {})
+
+    by_region = pandas.read_table(filepath_or_buffer=summary_directory / "000001" / "by_region.tsv")
+    assert list(by_region["region"]) == ["US/California"]
+    by_asset = pandas.read_table(filepath_or_buffer=summary_directory / "000001" / "by_asset.tsv")
+    assert list(by_asset["asset_path"]) == ["sub-1/sub-1_ephys.nwb"]
+
+
+# ─── column loading ──────────────────────────────────────────────────────────
+
+
+@pytest.mark.ai_generated
+@pytest.mark.parametrize("trailing_newline", [True, False])
+def test_read_day_keys(tmp_path: pathlib.Path, trailing_newline: bool) -> None:
+    """_read_day_keys decodes timestamps into YYMMDD keys with or without the fixed-width fast path."""
+    timestamps_file_path = tmp_path / "timestamps.txt"
+    timestamps_file_path.write_text("200101050635\n211231235959\n220406030553" + ("\n" if trailing_newline else ""))
+
+    day_keys = _read_day_keys(file_path=timestamps_file_path)
+    assert day_keys.tolist() == [200101, 211231, 220406]
+
+
+@pytest.mark.ai_generated
+def test_read_columns_missing_files(tmp_path: pathlib.Path) -> None:
+    """Column readers return empty arrays of the requested type when the file does not exist."""
+    bytes_sent = _read_integer_column(file_path=tmp_path / "bytes_sent.txt", dtype=numpy.uint64)
+    assert bytes_sent.size == 0
+    assert bytes_sent.dtype == numpy.uint64
+    assert _read_day_keys(file_path=tmp_path / "timestamps.txt").size == 0
+    assert _read_ip_column(file_path=tmp_path / "ips.txt").size == 0
+
+
+@pytest.mark.ai_generated
+def test_read_integer_column_large_values(tmp_path: pathlib.Path) -> None:
+    """_read_integer_column parses byte counts beyond float precision exactly."""
+    bytes_sent_file_path = tmp_path / "bytes_sent.txt"
+    bytes_sent_file_path.write_text("9007199254740993\n0\n")
+
+    bytes_sent = _read_integer_column(file_path=bytes_sent_file_path, dtype=numpy.uint64)
+    assert bytes_sent.tolist() == [9007199254740993, 0]
+
+
+# ─── calendar bucketing ──────────────────────────────────────────────────────
+
+
+@pytest.mark.ai_generated
+@pytest.mark.parametrize(
+    ("timestamp", "expected_date", "expected_week_start"),
+    [
+        ("200101050635", "2020-01-01", "2019-12-30"),  # Wednesday; week starts in the previous year
+        ("220404000000", "2022-04-04", "2022-04-04"),  # Monday
+        ("240303235959", "2024-03-03", "2024-02-26"),  # Sunday in a leap year
+    ],
+)
+def test_calendar_labels(timestamp: str, expected_date: str, expected_week_start: str) -> None:
+    """Timestamps share the cached day bucket of their 'YYMMDD' prefix for both date and week labels."""
+    assert _timestamp_to_date_format(timestamp=timestamp) == expected_date
+    assert _timestamp_to_week_start_date(timestamp=timestamp) == expected_week_start
+    assert _get_calendar_labels(date_prefix=timestamp[:6]) == (expected_date, expected_week_start)
+
+
+# ─── incremental rollups ─────────────────────────────────────────────────────
+
+
+def _write_blob_rows(*, blob_directory: pathlib.Path, rows: list[tuple[str, int, str, int]], mode: str = "a") -> None:
+    blob_directory.mkdir(parents=True, exist_ok=True)
+    for file_name, column in zip(("timestamps.txt", "bytes_sent.txt", "ips.txt", "download.txt"), zip(*rows)):
+        with (blob_directory / file_name).open(mode=mode) as file_stream:
+            file_stream.write("".join(f"{value}\n" for value in column))
+
+
+@pytest.mark.ai_generated
+def test_rollup_store_parses_only_appended_tail(tmp_path: pathlib.Path) -> None:
+    """A second run only parses rows appended after the remembered offsets."""
+    blob_directory = tmp_path / "extraction" / "blobs" / "abc" / "def" / "abcdef01"
+    _write_blob_rows(blob_directory=blob_directory, rows=[("200101050635", 100, "192.0.2.1", 1)] * 100)
+
+    rollup_store = _BlobRollupStore(cache_directory=tmp_path)
+    assert rollup_store.get_rollup(blob_directory=blob_directory).bytes_sent == 10_000
+    assert (tmp_path / "rollups" / "blobs" / "abc" / "def" / "abcdef01.npz").exists()
+    assert not (tmp_path / "summaries").exists()
+
+    # Overwrite the first row in place, far before the remembered offset; the consumed prefix is not read again
+    with (blob_directory / "bytes_sent.txt").open(mode="r+b") as file_stream:
+        file_stream.write(b"900")
+    _write_blob_rows(blob_directory=blob_directory, rows=[("200102050635", 5, "192.0.2.2", 0)])
+
+    rollup = rollup_store.get_rollup(blob_directory=blob_directory)
+    assert rollup.number_of_requests == 101
+    assert rollup.bytes_sent == 10_005
+    assert rollup.number_of_downloads == 100
+    assert rollup.day_keys.tolist() == [200101, 200102]
+    assert rollup.ips.tolist() == [b"192.0.2.1", b"192.0.2.2"]
+
+    # A full reparse ignores the remembered state
+    full_rollup = _BlobRollupStore(cache_directory=tmp_path, full_reparse=True).get_rollup(
+        blob_directory=blob_directory
+    )
+    assert full_rollup.bytes_sent == 10_805
+
+
+@pytest.mark.ai_generated
+def test_rollup_store_reparses_rewritten_files(tmp_path: pathlib.Path) -> None:
+    """A column file that shrank or was replaced causes the blob to be parsed from the beginning."""
+    blob_directory = tmp_path / "extraction" / "zarr" / "abcdef01"
+    _write_blob_rows(blob_directory=blob_directory, rows=[("200101050635", 100, "192.0.2.1", 1)] * 3)
+
+    rollup_store = _BlobRollupStore(cache_directory=tmp_path)
+    assert rollup_store.get_rollup(blob_directory=blob_directory).bytes_sent == 300
+
+    _write_blob_rows(blob_directory=blob_directory, rows=[("210101050635", 7, "192.0.2.3", 0)] * 2, mode="w")
+    rollup = rollup_store.get_rollup(blob_directory=blob_directory)
+    assert rollup.number_of_requests == 2
+    assert rollup.bytes_sent == 14
+    assert rollup.day_keys.tolist() == [210101]
+    assert rollup.ips.tolist() == [b"192.0.2.3"]
+
+    # Replacing a file with one of equal length is also detected
+    (blob_directory / "ips.txt").unlink()
+    (blob_directory / "ips.txt").write_text("192.0.2.4\n192.0.2.4\n")
+    assert rollup_store.get_rollup(blob_directory=blob_directory).ips.tolist() == [b"192.0.2.4"]
+
+
+@pytest.mark.ai_generated
+def test_rollup_store_does_not_remember_partial_rows(tmp_path: pathlib.Path) -> None:
+    """Rows not yet complete in every column file are summarized, but consumed again on the next run."""
+    blob_directory = tmp_path / "extraction" / "zarr" / "abcdef01"
+    _write_blob_rows(blob_directory=blob_directory, rows=[("200101050635", 100, "192.0.2.1", 1)] * 2)
+    with (blob_directory / "bytes_sent.txt").open(mode="a") as file_stream:
+        file_stream.write("5")
+
+    rollup_store = _BlobRollupStore(cache_directory=tmp_path)
+    assert rollup_store.get_rollup(blob_directory=blob_directory).bytes_sent == 205
+
+    with (blob_directory / "bytes_sent.txt").open(mode="a") as file_stream:
+        file_stream.write("0\n")
+    for file_name, value in (("timestamps.txt", "200103050635"), ("ips.txt", "192.0.2.2"), ("download.txt", "1")):
+        with (blob_directory / file_name).open(mode="a") as file_stream:
+            file_stream.write(f"{value}\n")
+
+    rollup = rollup_store.get_rollup(blob_directory=blob_directory)
+    assert rollup.number_of_requests == 3
+    assert rollup.bytes_sent == 250
+    assert rollup.number_of_downloads == 3
+    assert rollup.requests_per_ip.tolist() == [2, 1]
+
+
+@pytest.mark.ai_generated
+def test_summarize_dandiset_incremental_matches_full_parse(tmp_path: pathlib.Path) -> None:
+    """Summaries updated from remembered rollups equal those computed from a full parse of the same files."""
+    blob_dir1 = tmp_path / "extraction" / "blobs" / "abc" / "def" / "abcdef01"
+    blob_dir2 = tmp_path / "extraction" / "zarr" / "abcdef02"
+    _write_blob_rows(
+        blob_directory=blob_dir1,
+        rows=[("200101050635", 100, "192.0.2.1", 1), ("200109050635", 300, "192.0.2.2", 0)],
+    )
+    _write_blob_rows(blob_directory=blob_dir2, rows=[("200108010101", 50, "192.0.2.3", 1)])
+    blob_directories = [blob_dir1, blob_dir2]
+    ip_to_region = {"192.0.2.1": "US/California", "192.0.2.2": "US/New York", "192.0.2.4": "DE/Berlin"}
+    blob_id_to_asset_path = {"abcdef01": "sub-1/sub-1_ephys.nwb", "abcdef02": "sub-1/sub-1_image.ome.zarr"}
+
+    summary_directory = tmp_path / "summaries"
+    rollup_store = _BlobRollupStore(cache_directory=tmp_path)
+    _summarize_dandiset(
+        dandiset_id="000001",
+        blob_directories=blob_directories,
+        summary_directory=summary_directory,
+        ip_index=_IPIndex(ip_to_region=ip_to_region),
+        blob_id_to_asset_path=blob_id_to_asset_path,
+        rollup_store=rollup_store,
+    )
+
+    _write_blob_rows(
+        blob_directory=blob_dir1,
+        rows=[("200110050635", 10, "192.0.2.4", 1), ("200101050635", 20, "192.0.2.2", 1)],
+    )
+    _write_blob_rows(blob_directory=blob_dir2, rows=[("200108010101", 60, "192.0.2.1", 0)])
+    _summarize_dandiset(
+        dandiset_id="000001",
+        blob_directories=blob_directories,
+        summary_directory=summary_directory,
+        ip_index=_IPIndex(ip_to_region=ip_to_region),
+        blob_id_to_asset_path=blob_id_to_asset_path,
+        rollup_store=rollup_store,
+    )
+
+    full_directory = tmp_path / "full"
+    _summarize_dandiset(
+        dandiset_id="000001",
+        blob_directories=blob_directories,
+        summary_directory=full_directory,
+        ip_index=_IPIndex(ip_to_region=ip_to_region),
+        blob_id_to_asset_path=blob_id_to_asset_path,
+    )
+    for file_name in (
+        "by_day.tsv",
+        "by_asset.tsv",
+        "by_asset_per_week.tsv",
+        "by_asset_type_per_week.tsv",
+        "by_region.tsv",
+        "requester_count.tsv",
+    ):
+        incremental_content = (summary_directory / "000001" / file_name).read_text()
+        assert incremental_content == (full_directory / "000001" / file_name).read_text(), file_name
+
+    by_region = pandas.read_table(filepath_or_buffer=summary_directory / "000001" / "by_region.tsv")
+    assert list(by_region["region"]) == ["US/California", "US/New York", "DE/Berlin", "missing"]
+
+
+# ─── extraction journal ──────────────────────────────────────────────────────
+
+
+@pytest.mark.ai_generated
+def test_dandi_remote_extractor_sets_journal_file_path(tmp_path: pathlib.Path) -> None:
+    """Each extraction call directs the awk script to the journal file of the current process."""
+    from dandi_s3_log_extraction.extractors import DandiRemoteS3LogAccessExtractor
+
+    extractor = DandiRemoteS3LogAccessExtractor(cache_directory=tmp_path)
+    with patch("s3_log_extraction.extractors.RemoteS3LogAccessExtractor._run_extraction") as mock_run_extraction:
+        extractor._run_extraction(file_path=tmp_path / "log.txt")
+
+    mock_run_extraction.assert_called_once()
+    expected_journal_file_path = tmp_path / "records" / "extraction-journal" / f"{os.getpid()}.txt"
+    assert extractor._awk_env["JOURNAL_FILE_PATH"] == str(expected_journal_file_path)
+    assert expected_journal_file_path.parent.is_dir()
+
+
+@pytest.mark.ai_generated
+def test_dandi_remote_extractor_journals_object_keys_once_committed(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """The keys of a run file are journaled by the commit that merges it, after its rows are in the extraction tree."""
+    from dandi_s3_log_extraction.extractors import DandiRemoteS3LogAccessExtractor
+
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "key")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "secret")
+    log_file_path = tmp_path / "logs" / "2020-01-01-00-00-00-ABC"
+    log_file_path.parent.mkdir()
+    log_file_path.write_text("")
+
+    cache_directory = tmp_path / "cache"
+    cache_directory.mkdir()
+    extractor = DandiRemoteS3LogAccessExtractor(cache_directory=cache_directory)
+    journal_file_path = cache_directory / "records" / "extraction-journal" / f"{os.getpid()}.txt"
+
+    def write_run_file(*, command: str, environment_variables: dict[str, str], error_message: str) -> str:
+        assert "JOURNAL_FILE_PATH" not in environment_variables
+        assert not journal_file_path.exists()
+        pathlib.Path(environment_variables["RUN_FILE_PATH"]).write_text(
+            "blobs/aaa\t200101000000\t10\t1.1.1.1\t1\nzarr/bbb\t200101000001\t11\t1.1.1.2\t0\n"
+        )
+        return "2\t2\t2\t1\n"
+
+    module_name = "dandi_s3_log_extraction.extractors._dandi_remote_s3_log_access_extractor"
+    with (
+        patch.object(extractor, "_get_unprocessed_s3_urls", return_value=[str(log_file_path)]),
+        patch(f"{module_name}._deploy_subprocess", side_effect=write_run_file),
+    ):
+        extractor.extract_s3_bucket(s3_root=str(log_file_path.parent), workers=1)
+
+    assert journal_file_path.read_text() == "blobs/aaa\nzarr/bbb\n"
+    assert (extractor.extraction_directory / "blobs" / "aaa" / "bytes_sent.txt").read_text() == "10\n"
+
+
+@pytest.mark.ai_generated
+def test_prune_journal_removes_files_read_by_every_saved_cursor(tmp_path: pathlib.Path) -> None:
+    """Only journal files that every saved cursor has read to the end are removed, and dropped from the cursors."""
+    journal_directory = tmp_path / "records" / "extraction-journal"
+    journal_directory.mkdir(parents=True)
+    (journal_directory / "101.txt").write_text("blobs/abc/def/abcdef01\n")
+    (journal_directory / "102.txt").write_text("zarr/abcdef02\n")
+    (journal_directory / "103.txt").write_text("zarr/abcdef03\n")
+
+    # Nothing has been read before any cursor is saved
+    _prune_journal(cache_directory=tmp_path)
+    assert len(list(journal_directory.iterdir())) == 3
+
+    associated_cursor_file_path = tmp_path / "journal-cursors" / "associated.json"
+    unassociated_cursor_file_path = tmp_path / "journal-cursors" / "unassociated.json"
+    _save_journal_cursor(cursor_file_path=associated_cursor_file_path, offsets={"101.txt": 23, "102.txt": 14})
+    _save_journal_cursor(cursor_file_path=unassociated_cursor_file_path, offsets={"101.txt": 23, "102.txt": 7})
+    _prune_journal(cache_directory=tmp_path)
+
+    assert sorted(path.name for path in journal_directory.iterdir()) == ["102.txt", "103.txt"]
+    assert json.loads(associated_cursor_file_path.read_text()) == {"102.txt": 14}
+    assert json.loads(unassociated_cursor_file_path.read_text()) == {"102.txt": 7}
+
+    # A later process with the same ID is read from its start
+    (journal_directory / "101.txt").write_text("zarr/abcdef04\n")
+    object_keys, _ = _read_journal(cache_directory=tmp_path, cursor_file_path=associated_cursor_file_path)
+    assert object_keys == {"zarr/abcdef03", "zarr/abcdef04"}
+
+
+@pytest.mark.ai_generated
+def test_read_journal_resumes_from_cursor(tmp_path: pathlib.Path) -> None:
+    """Only complete lines appended after the saved cursor are returned."""
+    journal_directory = tmp_path / "records" / "extraction-journal"
+    journal_directory.mkdir(parents=True)
+    (journal_directory / "101.txt").write_text("blobs/abc/def/abcdef01\nzarr/abcdef02\nzarr/abc")
+    (journal_directory / "102.txt").write_text("blobs/abc/def/abcdef01\n")
+    cursor_file_path = tmp_path / "journal-cursors" / "associated.json"
+
+    object_keys, offsets = _read_journal(cache_directory=tmp_path, cursor_file_path=cursor_file_path)
+    assert object_keys == {"blobs/abc/def/abcdef01", "zarr/abcdef02"}
+    _save_journal_cursor(cursor_file_path=cursor_file_path, offsets=offsets)
+
+    with (journal_directory / "101.txt").open(mode="a") as file_stream:
+        file_stream.write("def03\n")
+    object_keys, _ = _read_journal(cache_directory=tmp_path, cursor_file_path=cursor_file_path)
+    assert object_keys == {"zarr/abcdef03"}
+
+
+@pytest.mark.ai_generated
+def test_generate_dandiset_summaries_incremental(tmp_path: pathlib.Path) -> None:
+    """Incremental mode only summarizes Dandisets touched since the previous complete run."""
+    content_map = {
+        "abcdef01-0000": {"000001": "sub-1/sub-1_ephys.nwb"},
+        "abcdef02-0000": {"000002": "sub-2/sub-2_image.ome.zarr"},
+    }
+    journal_directory = tmp_path / "records" / "extraction-journal"
+    journal_directory.mkdir(parents=True)
+    (journal_directory / "101.txt").write_text("zarr/abcdef02-0000\n")
+
+    with (
+        patch(
+            "dandi_s3_log_extraction.summarize._generate_dandiset_summaries.requests.get",
+            return_value=_make_fake_gz_response(content_map),
+        ),
+        patch("dandi.dandiapi.DandiAPIClient") as mock_client_cls,
+        patch("dandi_s3_log_extraction.summarize._generate_dandiset_summaries._summarize_dandiset") as mock_summarize,
+    ):
+        dandi_s3_log_extraction.summarize.generate_dandiset_summaries(
+            cache_directory=tmp_path, workers=1, incremental=True
+        )
+        assert [call.kwargs["dandiset_id"] for call in mock_summarize.call_args_list] == ["000002"]
+        mock_client_cls.assert_not_called()
+
+        # Nothing was appended since, and the touched blob has a known association
+        mock_summarize.reset_mock()
+        dandi_s3_log_extraction.summarize.generate_dandiset_summaries(
+            cache_directory=tmp_path, workers=1, incremental=True
+        )
+        dandi_s3_log_extraction.summarize.generate_dandiset_summaries(
+            cache_directory=tmp_path, workers=1, incremental=True, unassociated=True
+        )
+        mock_summarize.assert_not_called()
+
+        with (journal_directory / "101.txt").open(mode="a") as file_stream:
+            file_stream.write("blobs/abc/def/abcdef01-0000\nblobs/fff/fff/ffffff09-0000\n")
+        dandi_s3_log_extraction.summarize.generate_dandiset_summaries(
+            cache_directory=tmp_path, workers=1, incremental=True
+        )
+        dandi_s3_log_extraction.summarize.generate_dandiset_summaries(
+            cache_directory=tmp_path, workers=1, incremental=True, unassociated=True
+        )
+        assert [call.kwargs["dandiset_id"] for call in mock_summarize.call_args_list] == ["000001", "undetermined"]
+
+    # The cursors are kept in the cache, apart from the published summaries
+    assert sorted(path.name for path in (tmp_path / "journal-cursors").iterdir()) == [
+        "associated.json",
+        "unassociated.json",
+    ]
+    assert list((tmp_path / "summaries").iterdir()) == []
+
+
+# ─── sharded aggregation ─────────────────────────────────────────────────────
+
+
+@pytest.mark.ai_generated
+def test_summarize_dandisets_in_parallel_shards_match_single_pass(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Reducing the activity of shards aggregated by separate workers reproduces the single-pass tables."""
+    blob_directories = []
+    for index, (ip, region_ip) in enumerate([("192.0.2.2", "192.0.2.1"), ("192.0.2.3", "192.0.2.2")] * 2):
+        blob_directory = tmp_path / "extraction" / "zarr" / f"abcdef0{index}"
+        _write_blob_rows(
+            blob_directory=blob_directory,
+            rows=[(f"20010{index + 1}050635", 100 * (index + 1), ip, 1), ("200101050635", 7, region_ip, 0)],
+        )
+        blob_directories.append(blob_directory)
+    blob_directories.insert(1, tmp_path / "extraction" / "zarr" / "never_accessed")
+    ip_to_region = {"192.0.2.1": "US/California", "192.0.2.2": "US/New York", "192.0.2.3": "DE/Berlin"}
+    blob_id_to_asset_path = {"abcdef00": "sub-1/sub-1_ephys.nwb", "abcdef03": "sub-1/sub-1_video.mp4"}
+
+    single_pass_directory = tmp_path / "single_pass"
+    _summarize_dandiset(
+        dandiset_id="undetermined",
+        blob_directories=blob_directories,
+        summary_directory=single_pass_directory,
+        ip_index=_IPIndex(ip_to_region=ip_to_region),
+        blob_id_to_asset_path=blob_id_to_asset_path,
+    )
+
+    monkeypatch.setattr(
+        "dandi_s3_log_extraction.summarize._generate_dandiset_summaries._BLOBS_PER_SHARD", 2, raising=True
+    )
+    sharded_directory = tmp_path / "sharded"
+    _summarize_dandisets_in_parallel(
+        dandiset_id_to_blob_directories={"undetermined": blob_directories, "000001": blob_directories[:1]},
+        summary_directory=sharded_directory,
+        ip_index=_IPIndex(ip_to_region=ip_to_region),
+        blob_id_to_asset_path=blob_id_to_asset_path,
+        rollup_store=None,
+        approximate_requester_counts=False,
+        max_workers=2,
+    )
+
+    for file_name in (
+        "by_day.tsv",
+        "by_asset.tsv",
+        "by_asset_per_week.tsv",
+        "by_asset_type_per_week.tsv",
+        "by_region.tsv",
+        "requester_count.tsv",
+    ):
+        sharded_content = (sharded_directory / "undetermined" / file_name).read_text()
+        assert sharded_content == (single_pass_directory / "undetermined" / file_name).read_text(), file_name
+    assert (sharded_directory / "000001" / "by_asset.tsv").exists()
+
+
+# ─── cost-aware scheduling ───────────────────────────────────────────────────
+
+
+@pytest.mark.ai_generated
+def test_plan_summary_tasks_orders_by_cost_and_batches_small_dandisets(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Tasks are sized from the column files on disk, small Dandisets are batched, and the largest come first."""
+    module = "dandi_s3_log_extraction.summarize._generate_dandiset_summaries"
+    monkeypatch.setattr(f"{module}._SMALL_DANDISET_BYTES", 100)
+    monkeypatch.setattr(f"{module}._BLOBS_PER_SHARD", 2)
+
+    def make_blob(name: str, number_of_bytes: int) -> pathlib.Path:
+        blob_directory = tmp_path / "extraction" / "zarr" / name
+        blob_directory.mkdir(parents=True)
+        (blob_directory / "bytes_sent.txt").write_bytes(b"0" * number_of_bytes)
+        return blob_directory
+
+    dandiset_id_to_blob_directories = {
+        "000001": [make_blob(name="tiny1", number_of_bytes=30)],
+        "000002": [make_blob(name="medium", number_of_bytes=150)],
+        "000003": [make_blob(name="tiny2", number_of_bytes=40), tmp_path / "extraction" / "zarr" / "missing"],
+        "000004": [make_blob(name=f"large{index}", number_of_bytes=200) for index in range(3)],
+        "000005": [make_blob(name="tiny3", number_of_bytes=50)],
+    }
+    tasks = _plan_summary_tasks(dandiset_id_to_blob_directories=dandiset_id_to_blob_directories)
+
+    assert [(list(task.dandiset_id_to_blob_directories), task.cost, task.shard_index) for task in tasks] == [
+        (["000004"], 400, 0),
+        (["000004"], 200, 1),
+        (["000002"], 150, None),
+        (["000001", "000003"], 70, None),
+        (["000005"], 50, None),
+    ]
+
+
+# ─── approximate requester counts ────────────────────────────────────────────
+
+
+@pytest.mark.ai_generated
+def test_sketch_estimate_is_close_to_exact_count(tmp_path: pathlib.Path) -> None:
+    """The HyperLogLog estimate of the unique requesters is within a few percent of the exact count."""
+    blob_dir = tmp_path / "blob1"
+    blob_dir.mkdir()
+    (blob_dir / "ips.txt").write_text("".join(f"10.{i // 65536}.{i // 256 % 256}.{i % 256}\n" for i in range(50_000)))
+
+    exact_count = len(_collect_unique_ips(blob_directories=[blob_dir]))
+    register_indices, ranks = _sketch_ips(ips=_read_ip_column(file_path=blob_dir / "ips.txt"))
+    registers = _new_registers()
+    _add_sparse_sketch(registers=registers, register_indices=register_indices, ranks=ranks)
+
+    assert abs(_estimate_cardinality(registers=registers) - exact_count) / exact_count < 0.03
+    assert _estimate_cardinality(registers=_new_registers()) == 0
+
+
+@pytest.mark.ai_generated
+def test_rollup_store_merges_requester_sketch(tmp_path: pathlib.Path) -> None:
+    """The sketch of an incrementally updated rollup equals the sketch of all of its IPs."""
+    blob_directory = tmp_path / "extraction" / "blobs" / "blobid1"
+    _write_blob_rows(blob_directory=blob_directory, rows=[("200101050635", 1, f"192.0.2.{i}", 1) for i in range(100)])
+    rollup_store = _BlobRollupStore(cache_directory=tmp_path)
+    rollup_store.get_rollup(blob_directory=blob_directory)
+
+    _write_blob_rows(blob_directory=blob_directory, rows=[("200102050635", 1, f"198.51.100.{i}", 1) for i in range(50)])
+    rollup = _BlobRollupStore(cache_directory=tmp_path).get_rollup(blob_directory=blob_directory)
+
+    expected_register_indices, expected_ranks = _sketch_ips(ips=numpy.unique(rollup.ips))
+    numpy.testing.assert_array_equal(rollup.sketch_register_indices, expected_register_indices)
+    numpy.testing.assert_array_equal(rollup.sketch_register_ranks, expected_ranks)
+
+
+@pytest.mark.ai_generated
+def test_summarize_dandiset_approximate_requester_counts(tmp_path: pathlib.Path) -> None:
+    """Approximate mode writes a requester count from the sketch and saves the sketch for the archive union."""
+    blob_dir = tmp_path / "extraction" / "blobid1"
+    _write_blob_rows(blob_directory=blob_dir, rows=[("200101050635", 1, f"192.0.2.{i}", 1) for i in range(55)])
+    summary_directory = tmp_path / "summaries"
+
+    _summarize_dandiset(
+        dandiset_id="000001",
+        blob_directories=[blob_dir],
+        summary_directory=summary_directory,
+        ip_index=_IPIndex(ip_to_region={}),
+        blob_id_to_asset_path={"blobid1": "sub-01/file.nwb"},
+        approximate_requester_counts=True,
+    )
+
+    assert (summary_directory / "000001" / "requester_count.tsv").read_text() == "60"
+    sketch_file_path = tmp_path / "sketches" / "000001.npy"
+    assert sketch_file_path.exists()
+
+    # A later run without any activity removes the sketch, which would otherwise still count towards the archive
+    _summarize_dandiset(
+        dandiset_id="000001",
+        blob_directories=[],
+        summary_directory=summary_directory,
+        ip_index=_IPIndex(ip_to_region={}),
+        blob_id_to_asset_path={"blobid1": "sub-01/file.nwb"},
+        approximate_requester_counts=True,
+    )
+    assert not sketch_file_path.exists()
+
+
+@pytest.mark.ai_generated
+def test_summarize_archive_unique_requester_count_from_sketches(tmp_path: pathlib.Path) -> None:
+    """The union of the Dandiset sketches gives the same rounded archive count as the exact union of IPs."""
+    blob_dir1 = tmp_path / "extraction" / "blobid1"
+    _write_blob_rows(blob_directory=blob_dir1, rows=[("200101050635", 1, f"192.0.2.{i}", 1) for i in range(200)])
+    blob_dir2 = tmp_path / "extraction" / "blobid2"
+    _write_blob_rows(blob_directory=blob_dir2, rows=[("200101050635", 1, f"192.0.2.{i}", 1) for i in range(100, 300)])
+    summary_directory = tmp_path / "summaries"
+    for dandiset_id, blob_dir in (("000001", blob_dir1), ("000002", blob_dir2)):
+        _summarize_dandiset(
+            dandiset_id=dandiset_id,
+            blob_directories=[blob_dir],
+            summary_directory=summary_directory,
+            ip_index=_IPIndex(ip_to_region={}),
+            blob_id_to_asset_path={},
+            approximate_requester_counts=True,
+        )
+
+    exact_file_path = tmp_path / "exact.tsv"
+    _summarize_archive_unique_requester_count(
+        blob_directories=[blob_dir1, blob_dir2], summary_file_path=exact_file_path
+    )
+    approximate_file_path = summary_directory / "archive" / "requester_count.tsv"
+    dandi_s3_log_extraction.summarize.generate_approximate_archive_requester_count(cache_directory=tmp_path)
+
+    assert approximate_file_path.read_text() == exact_file_path.read_text() == "300"
+
+
+# ─── integer IP indices ──────────────────────────────────────────────────────
+
+
+@pytest.mark.ai_generated
+def test_ip_index_resolves_regions_and_counts_requesters(tmp_path: pathlib.Path) -> None:
+    """Cached IPs resolve through dense indices while uncached IPs fall back to 'missing' and are still counted."""
+    ip_index = _IPIndex(
+        ip_to_region={"192.0.2.20": "US/New York", "192.0.2.3": "US/California", "10.0.0.1": "US/New York"}
+    )
+    ip_indices = ip_index.get_indices(ips=numpy.array([b"192.0.2.3", b"198.51.100.7", b"10.0.0.1", b"192.0.2.2"]))
+
+    assert (ip_indices >= 0).tolist() == [True, False, True, False]
+    region_names = [ip_index.region_names[code] for code in ip_index.get_region_codes(indices=ip_indices).tolist()]
+    assert region_names == ["US/California", "missing", "US/New York", "missing"]
+    assert _IPIndex(ip_to_region={}).get_region_codes(indices=numpy.array([-1])).tolist() == [0]
+
+    blob_dir = tmp_path / "extraction" / "blobid1"
+    _write_blob_rows(
+        blob_directory=blob_dir,
+        rows=[
+            ("200101050635", 10, "198.51.100.7", 1),
+            ("200101050635", 20, "192.0.2.3", 0),
+            ("200101050635", 30, "10.0.0.1", 1),
+            ("200101050635", 40, "192.0.2.20", 1),
+            ("200101050635", 50, "198.51.100.7", 1),
+        ],
+    )
+    activity = _aggregate_dandiset_activity(blob_directories=[blob_dir], ip_index=ip_index, blob_id_to_asset_path={})
+
+    assert dict(activity.bytes_sent_by_region) == {"missing": 60, "US/California": 20, "US/New York": 70}
+    assert list(activity.bytes_sent_by_region) == ["missing", "US/California", "US/New York"]
+    assert dict(activity.number_of_requests_by_region) == {"missing": 2, "US/California": 1, "US/New York": 2}
+    assert activity.number_of_unique_requesters == 4
+
+
+@pytest.mark.ai_generated
+def test_dandiset_activity_requesters_scale_with_dandiset_not_ip_cache(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Only the requester indices that were seen are kept, sent between processes, and merged across shards."""
+    from dandi_s3_log_extraction.summarize import _generate_dandiset_summaries
+
+    monkeypatch.setattr(_generate_dandiset_summaries, "_PENDING_REQUESTERS_MINIMUM", 2)
+    ip_index = _IPIndex(ip_to_region={f"10.{index // 256}.{index % 256}.1": "US/New York" for index in range(50_000)})
+
+    blob_directories = []
+    for blob_number, ips in enumerate([["10.0.1.1", "10.0.2.1"], ["10.0.2.1", "10.0.3.1", "192.0.2.9"], ["10.0.1.1"]]):
+        blob_directory = tmp_path / "extraction" / f"blobid{blob_number}"
+        _write_blob_rows(blob_directory=blob_directory, rows=[("200101050635", 1, ip, 1) for ip in ips])
+        blob_directories.append(blob_directory)
+
+    shards = [
+        _aggregate_dandiset_activity(blob_directories=shard, ip_index=ip_index, blob_id_to_asset_path={})
+        for shard in (blob_directories[:2], blob_directories[2:])
+    ]
+    # The requester sketch has a fixed size, to which a dense bitmap would add one byte per cached IP
+    assert len(pickle.dumps(shards[0])) < len(pickle.dumps(_DandisetActivity())) + 5_000
+
+    activity, other_activity = (pickle.loads(pickle.dumps(shard)) for shard in shards)
+    assert activity.indexed_requesters.size == 3
+    activity.merge(other=other_activity)
+    assert activity.number_of_unique_requesters == 4
+    assert activity.indexed_requesters.tolist() == sorted(activity.indexed_requesters.tolist())
+
+
+# ─── binary columns ──────────────────────────────────────────────────────────
+
+
+@pytest.mark.ai_generated
+def test_epoch_seconds_round_trip_to_day_keys() -> None:
+    """Timestamps decode to epoch seconds that map back to the same YYMMDD day keys, including leap days."""
+    content = b"200101050635\n200229235959\n241231000000\n"
+    epoch_seconds = _parse_epoch_seconds(content=content)
+
+    assert epoch_seconds[0] == 1577855195
+    assert _epoch_seconds_to_day_keys(epoch_seconds=epoch_seconds).tolist() == [200101, 200229, 241231]
+
+
+@pytest.mark.ai_generated
+def test_convert_to_binary_columns_matches_text_summaries(tmp_path: pathlib.Path) -> None:
+    """Summaries of converted blobs, with text rows appended after the conversion, equal those of the text columns."""
+    rows_before = [
+        ("200101050635", 100, "192.0.2.1", 1),
+        ("200109050635", 300, "192.0.2.2", 0),
+        ("200101080000", 18_000_000_000_000_000_000, "192.0.2.1", 1),
+    ]
+    rows_after = [("200110050635", 10, "192.0.2.4", 1), ("200101050635", 20, "192.0.2.2", 1)]
+    ip_to_region = {"192.0.2.1": "US/California", "192.0.2.2": "US/New York"}
+    blob_id_to_asset_path = {"abcdef01": "sub-1/sub-1_ephys.nwb"}
+
+    summary_files = {}
+    for layout in ("text", "binary"):
+        cache_directory = tmp_path / layout
+        blob_directory = cache_directory / "extraction" / "blobs" / "abc" / "def" / "abcdef01"
+        _write_blob_rows(blob_directory=blob_directory, rows=rows_before)
+        if layout == "binary":
+            convert_to_binary_columns(cache_directory=cache_directory, workers=1)
+            assert not (blob_directory / "timestamps.txt").exists()
+            assert (blob_directory / "ip_dictionary.txt").read_text() == "192.0.2.1\n192.0.2.2\n"
+            assert _count_binary_rows(blob_directory=blob_directory) == 3
+        _write_blob_rows(blob_directory=blob_directory, rows=rows_after)
+
+        _summarize_dandiset(
+            dandiset_id="000001",
+            blob_directories=[blob_directory],
+            summary_directory=cache_directory / "summaries",
+            ip_index=_IPIndex(ip_to_region=ip_to_region),
+            blob_id_to_asset_path=blob_id_to_asset_path,
+            rollup_store=_BlobRollupStore(cache_directory=cache_directory),
+        )
+        summary_files[layout] = {
+            file_path.name: file_path.read_text() for file_path in (cache_directory / "summaries" / "000001").iterdir()
+        }
+        assert _collect_unique_ips(blob_directories=[blob_directory]) == {"192.0.2.1", "192.0.2.2", "192.0.2.4"}
+
+    assert summary_files["binary"] == summary_files["text"]
+
+
+@pytest.mark.ai_generated
+@pytest.mark.parametrize("timestamps_removed", [False, True])
+def test_convert_blob_recovers_interrupted_conversion(tmp_path: pathlib.Path, timestamps_removed: bool) -> None:
+    """An interrupted conversion is rolled back while the text timestamps remain, and rolled forward otherwise."""
+    blob_directory = tmp_path / "abcdef01"
+    _write_blob_rows(blob_directory=blob_directory, rows=[("200101050635", 100, "192.0.2.1", 1)])
+    assert _convert_blob_to_binary_columns(blob_directory=blob_directory)
+
+    # Simulate a second conversion that stopped after appending its binary rows
+    _write_blob_rows(blob_directory=blob_directory, rows=[("200102050635", 5, "192.0.2.2", 0)] * 2)
+    (blob_directory / ".binary-conversion-pending").write_text("1")
+    for file_name, dtype in _BINARY_COLUMN_FILE_NAMES_AND_DTYPES:
+        with (blob_directory / file_name).open(mode="ab") as file_stream:
+            file_stream.write(numpy.zeros(shape=2, dtype=dtype).tobytes())
+    if timestamps_removed:
+        (blob_directory / "timestamps.txt").unlink()
+
+    converted = _convert_blob_to_binary_columns(blob_directory=blob_directory)
+
+    assert converted is not timestamps_removed
+    assert not (blob_directory / ".binary-conversion-pending").exists()
+    assert not (blob_directory / "bytes_sent.txt").exists()
+    assert _count_binary_rows(blob_directory=blob_directory) == 3
+    bytes_sent = _read_binary_columns(blob_directory=blob_directory)[1]
+    assert bytes_sent.tolist() == ([100, 0, 0] if timestamps_removed else [100, 5, 5])
+
+
+@pytest.mark.ai_generated
+def test_convert_blob_skips_incomplete_rows(tmp_path: pathlib.Path) -> None:
+    """A blob whose text columns end in a partial row is left for a later conversion."""
+    blob_directory = tmp_path / "abcdef01"
+    _write_blob_rows(blob_directory=blob_directory, rows=[("200101050635", 100, "192.0.2.1", 1)])
+    with (blob_directory / "ips.txt").open(mode="a") as file_stream:
+        file_stream.write("192.0.2")
+
+    assert not _convert_blob_to_binary_columns(blob_directory=blob_directory)
+    assert (blob_directory / "timestamps.txt").exists()
+    assert _count_binary_rows(blob_directory=blob_directory) == 0
+
+
+# ─── compacted archive ───────────────────────────────────────────────────────
+
+
+@pytest.mark.ai_generated
+def test_compact_extraction_matches_text_summaries(tmp_path: pathlib.Path) -> None:
+    """Summaries of compacted blobs, with binary and text rows appended afterwards, equal those of the text columns."""
+    rows_before = [
+        ("200109050635", 300, "192.0.2.2", 0),
+        ("200101050635", 100, "192.0.2.1", 1),
+        ("200101080000", 18_000_000_000_000_000_000, "192.0.2.3", 1),
+    ]
+    rows_converted = [("200102050635", 7, "192.0.2.1", 0)]
+    rows_after = [("200110050635", 10, "192.0.2.4", 1), ("200101050635", 20, "192.0.2.2", 1)]
+    ip_to_region = {"192.0.2.1": "US/California", "192.0.2.2": "US/New York", "192.0.2.3": "DE/Berlin"}
+    blob_id_to_asset_path = {"abcdef01": "sub-1/sub-1_ephys.nwb"}
+
+    summary_files = {}
+    for layout in ("text", "compacted"):
+        cache_directory = tmp_path / layout
+        blob_directory = cache_directory / "extraction" / "blobs" / "abc" / "def" / "abcdef01"
+        rollup_store = _BlobRollupStore(cache_directory=cache_directory)
+        _write_blob_rows(blob_directory=blob_directory, rows=rows_before)
+        rollup_store.get_rollup(blob_directory=blob_directory)
+        if layout == "compacted":
+            compact_extraction(cache_directory=cache_directory, workers=1)
+            assert not (blob_directory / "timestamps.txt").exists()
+            assert _count_compacted_rows(blob_directory=blob_directory) == 3
+            chunks = list(_iterate_compacted_chunks(blob_directory=blob_directory))
+            assert [epoch_seconds.tolist() for epoch_seconds, *_ in chunks] == [[1577855195, 1577865600, 1578546395]]
+            _write_blob_rows(blob_directory=blob_directory, rows=rows_converted)
+            convert_to_binary_columns(cache_directory=cache_directory, workers=1)
+        else:
+            _write_blob_rows(blob_directory=blob_directory, rows=rows_converted)
+        _write_blob_rows(blob_directory=blob_directory, rows=rows_after)
+
+        _summarize_dandiset(
+            dandiset_id="000001",
+            blob_directories=[blob_directory],
+            summary_directory=cache_directory / "summaries",
+            ip_index=_IPIndex(ip_to_region=ip_to_region),
+            blob_id_to_asset_path=blob_id_to_asset_path,
+            rollup_store=rollup_store,
+        )
+        summary_files[layout] = {
+            file_path.name: file_path.read_text() for file_path in (cache_directory / "summaries" / "000001").iterdir()
+        }
+        assert _collect_unique_ips(blob_directories=[blob_directory]) == {f"192.0.2.{index}" for index in range(1, 5)}
+
+    assert summary_files["compacted"] == summary_files["text"]
+
+
+@pytest.mark.ai_generated
+def test_compact_blob_keeps_first_appearance_order_of_ips(tmp_path: pathlib.Path) -> None:
+    """Compacting twice keeps the IPs in the order in which they were extracted, not the order of time."""
+    blob_directory = tmp_path / "abcdef01"
+    _write_blob_rows(blob_directory=blob_directory, rows=[("200109050635", 1, "192.0.2.9", 0)])
+    assert _compact_blob(blob_directory=blob_directory)
+    _write_blob_rows(blob_directory=blob_directory, rows=[("200101050635", 2, "192.0.2.1", 0)] * 2)
+    assert _compact_blob(blob_directory=blob_directory)
+    assert not _compact_blob(blob_directory=blob_directory)
+
+    assert _read_compacted_ip_dictionary(blob_directory=blob_directory).tolist() == [b"192.0.2.9", b"192.0.2.1"]
+    assert _read_blob_rollup(blob_directory=blob_directory).ips.tolist() == [b"192.0.2.9", b"192.0.2.1"]
+    ((_, bytes_sent, ip_indices, _),) = _iterate_compacted_chunks(blob_directory=blob_directory)
+    assert bytes_sent.tolist() == [2, 2, 1]
+    assert ip_indices.tolist() == [1, 1, 0]
+
+
+@pytest.mark.ai_generated
+@pytest.mark.parametrize("archive_replaced", [False, True])
+def test_compact_blob_recovers_interrupted_compaction(tmp_path: pathlib.Path, archive_replaced: bool) -> None:
+    """An interrupted compaction is discarded until its archive is moved into place, and finished afterwards."""
+    blob_directory = tmp_path / "abcdef01"
+    _write_blob_rows(blob_directory=blob_directory, rows=[("200101050635", 100, "192.0.2.1", 1)])
+    assert _compact_blob(blob_directory=blob_directory)
+
+    # Simulate a second compaction that stopped after writing its archive
+    _write_blob_rows(blob_directory=blob_directory, rows=[("200102050635", 5, "192.0.2.2", 0)] * 2)
+    (blob_directory / "compacted.npz.tmp").write_bytes(b"partial")
+    if archive_replaced:
+        (blob_directory / ".compaction-pending").touch()
+        (blob_directory / "compacted.npz.tmp").unlink()
+
+    compacted = _compact_blob(blob_directory=blob_directory)
+
+    assert compacted is not archive_replaced
+    assert not (blob_directory / ".compaction-pending").exists()
+    assert not (blob_directory / "compacted.npz.tmp").exists()
+    assert not (blob_directory / "bytes_sent.txt").exists()
+    assert _read_blob_rollup(blob_directory=blob_directory).bytes_sent == (100 if archive_replaced else 110)
+
+
+@pytest.mark.ai_generated
+def test_compact_blob_skips_incomplete_rows(tmp_path: pathlib.Path) -> None:
+    """A blob whose text columns end in a partial row is left for a later compaction."""
+    blob_directory = tmp_path / "abcdef01"
+    _write_blob_rows(blob_directory=blob_directory, rows=[("200101050635", 100, "192.0.2.1", 1)])
+    with (blob_directory / "ips.txt").open(mode="a") as file_stream:
+        file_stream.write("192.0.2")
+
+    assert not _compact_blob(blob_directory=blob_directory)
+    assert (blob_directory / "timestamps.txt").exists()
+    assert _count_compacted_rows(blob_directory=blob_directory) == 0
+
+
+# ─── blob index ──────────────────────────────────────────────────────────────
+
+
+@pytest.mark.ai_generated
+def test_merge_run_files_appends_rows_and_bytes_to_blob_index(tmp_path: pathlib.Path) -> None:
+    """Each merge appends one line per object, which the index sums over commits and consolidates when they pile up."""
+    from dandi_s3_log_extraction.extractors._run_files import _merge_run_files
+
+    records_directory = tmp_path / "records"
+    records_directory.mkdir()
+    blob_index_file_path = records_directory / "blob-index.tsv"
+    blob_index_file_path.touch()
+    run_file_path = tmp_path / "0.tsv"
+    for _ in range(3):
+        run_file_path.write_text("blobs/aaa\t200101000000\t10\t1.1.1.1\t1\nzarr/bbb\t200101000001\t200\t1.1.1.22\t0\n")
+        _merge_run_files(
+            run_file_paths=[run_file_path],
+            extraction_directory=tmp_path / "extraction",
+            blob_index_file_path=blob_index_file_path,
+        )
+    # A line still being written is not read
+    with blob_index_file_path.open(mode="a") as file_stream:
+        file_stream.write("blobs/ccc\t1")
+
+    blob_index = _load_blob_index(cache_directory=tmp_path)
+    assert list(blob_index) == ["blobs/aaa", "zarr/bbb"]
+    assert "blobs/ccc" not in blob_index
+    assert blob_index.object_key_to_totals == {"blobs/aaa": (3, 3 * 26), "zarr/bbb": (3, 3 * 28)}
+    assert blob_index.get_number_of_bytes(blob_directory=tmp_path / "extraction" / "blobs" / "aaa") == sum(
+        file_path.stat().st_size for file_path in (tmp_path / "extraction" / "blobs" / "aaa").iterdir()
+    )
+
+    _consolidate_blob_index(blob_index_file_path=blob_index_file_path)
+    assert blob_index_file_path.read_text() == "blobs/aaa\t3\t78\nzarr/bbb\t3\t84\n"
+    _consolidate_blob_index(blob_index_file_path=blob_index_file_path)
+    assert blob_index_file_path.read_text() == "blobs/aaa\t3\t78\nzarr/bbb\t3\t84\n"
+
+
+@pytest.mark.ai_generated
+def test_build_blob_index_counts_rows_of_every_layout(tmp_path: pathlib.Path) -> None:
+    """The index built from a walk of the extraction tree counts the text, binary, and compacted rows of each blob."""
+    extraction_directory = tmp_path / "extraction"
+    compacted_directory = extraction_directory / "blobs" / "abc" / "def" / "abcdef01"
+    _write_blob_rows(blob_directory=compacted_directory, rows=[("200101050635", 100, "192.0.2.1", 1)] * 3)
+    compact_extraction(cache_directory=tmp_path, workers=1)
+    _write_blob_rows(blob_directory=compacted_directory, rows=[("200102050635", 5, "192.0.2.2", 0)] * 2)
+    convert_to_binary_columns(cache_directory=tmp_path, workers=1)
+    _write_blob_rows(blob_directory=compacted_directory, rows=[("200103050635", 5, "192.0.2.2", 0)])
+    text_directory = extraction_directory / "zarr" / "abcdef02"
+    _write_blob_rows(blob_directory=text_directory, rows=[("200101050635", 100, "192.0.2.1", 1)] * 4)
+
+    dandi_s3_log_extraction.summarize.build_blob_index(cache_directory=tmp_path)
+
+    blob_index = _load_blob_index(cache_directory=tmp_path)
+    assert sorted(blob_index) == ["blobs/abc/def/abcdef01", "zarr/abcdef02"]
+    assert blob_index.object_key_to_totals["blobs/abc/def/abcdef01"][0] == 6
+    assert blob_index.object_key_to_totals["zarr/abcdef02"] == (4, 4 * (13 + 4 + 10 + 2))
+
+
+@pytest.mark.ai_generated
+@pytest.mark.parametrize("unassociated", [False, True])
+def test_generate_dandiset_summaries_finds_blobs_through_index(tmp_path: pathlib.Path, unassociated: bool) -> None:
+    """With an index, the summaries only consider the objects it lists, without walking the extraction tree."""
+    content_map = {
+        "abcdef01-0000": {"000001": "sub-1/sub-1_ephys.nwb"},
+        "abcdef02-0000": {"000002": "sub-2/sub-2_image.ome.zarr"},
+    }
+    for object_key in ("blobs/abc/def/abcdef01-0000", "blobs/fff/fff/ffffff09-0000", "blobs/eee/eee/eeeeee08-0000"):
+        _write_blob_rows(
+            blob_directory=tmp_path / "extraction" / object_key, rows=[("200101050635", 100, "192.0.2.1", 1)]
+        )
+    records_directory = tmp_path / "records"
+    records_directory.mkdir()
+    # Only the objects extracted since the index was started are listed
+    (records_directory / "blob-index.tsv").write_text(
+        "blobs/abc/def/abcdef01-0000\t1\t29\nblobs/fff/fff/ffffff09-0000\t1\t29\n"
+    )
+
+    with (
+        patch(
+            "dandi_s3_log_extraction.summarize._generate_dandiset_summaries.requests.get",
+            return_value=_make_fake_gz_response(content_map),
+        ),
+        patch("dandi.dandiapi.DandiAPIClient") as mock_client_cls,
+        patch("dandi_s3_log_extraction.summarize._generate_dandiset_summaries._summarize_dandiset") as mock_summarize,
+        patch("pathlib.Path.rglob") as mock_rglob,
+    ):
+        mock_client_cls.return_value.get_dandisets.return_value = [
+            MagicMock(identifier="000001"),
+            MagicMock(identifier="000002"),
+        ]
+        dandi_s3_log_extraction.summarize.generate_dandiset_summaries(
+            cache_directory=tmp_path, workers=1, unassociated=unassociated
+        )
+
+    mock_rglob.assert_not_called()
+    dandiset_id_to_blob_directories = {
+        call.kwargs["dandiset_id"]: call.kwargs["blob_directories"] for call in mock_summarize.call_args_list
+    }
+    if unassociated:
+        assert dandiset_id_to_blob_directories == {
+            "undetermined": [tmp_path / "extraction" / "blobs" / "fff" / "fff" / "ffffff09-0000"]
+        }
+    else:
+        assert dandiset_id_to_blob_directories == {
+            "000001": [tmp_path / "extraction" / "blobs" / "abc" / "def" / "abcdef01-0000"],
+            "000002": [],
+        }
+
+
+@pytest.mark.ai_generated
+def test_roll_back_commit_truncates_blob_index(tmp_path: pathlib.Path) -> None:
+    """The lines appended to the index by an interrupted commit are rolled back along with its column files."""
+    from dandi_s3_log_extraction.extractors._run_files import _merge_run_files, _roll_back_commit, _start_commit
+
+    blob_index_file_path = tmp_path / "blob-index.tsv"
+    blob_index_file_path.write_text("blobs/aaa\t1\t26\n")
+    commit_file_path = tmp_path / "pending-commit.tsv"
+    _start_commit(commit_file_path=commit_file_path, file_paths=[blob_index_file_path])
+    run_file_path = tmp_path / "0.tsv"
+    run_file_path.write_text("blobs/aaa\t200101000000\t10\t1.1.1.1\t1\n")
+    _merge_run_files(
+        run_file_paths=[run_file_path],
+        extraction_directory=tmp_path / "extraction",
+        commit_file_path=commit_file_path,
+        blob_index_file_path=blob_index_file_path,
+    )
+    assert blob_index_file_path.read_text() == "blobs/aaa\t1\t26\nblobs/aaa\t1\t26\n"
+
+    with pytest.warns(UserWarning, match="Rolled back an interrupted extraction commit"):
+        _roll_back_commit(commit_file_path=commit_file_path)
+
+    assert blob_index_file_path.read_text() == "blobs/aaa\t1\t26\n"
+
+
+# ─── content ID index ────────────────────────────────────────────────────────
+
+
+@pytest.mark.ai_generated
+def test_content_id_index_looks_up_first_usage_in_mapping_order(tmp_path: pathlib.Path) -> None:
+    """The index keeps the order of the mapping and the first usage of each content ID, and pickles as its path."""
+    content_map = {
+        "ffff-2": {"000002": "sub-2/sub-2_ecephys.nwb"},
+        "0000-1": {"000001": "sub-1/sub-1_β.nwb", "000003": "sub-3/sub-3.nwb"},
+        "aaaa-3": {"000004": "sub-4/sub-4_image.ome.zarr"},
+    }
+    _write_content_id_index(directory=tmp_path, content_id_to_usage_dandiset_path=content_map, source={"url": "x"})
+
+    content_id_index = _ContentIDIndex(directory=tmp_path)
+    assert list(content_id_index.iterate_associations()) == [
+        ("ffff-2", "000002", "sub-2/sub-2_ecephys.nwb"),
+        ("0000-1", "000001", "sub-1/sub-1_β.nwb"),
+        ("aaaa-3", "000004", "sub-4/sub-4_image.ome.zarr"),
+    ]
+    assert dict(content_id_index) == {
+        content_id: next(iter(usage.values())) for content_id, usage in content_map.items()
+    }
+    assert content_id_index.get("bbbb-4", "undetermined") == "undetermined"
+    assert "0000-1" in content_id_index and "0000" not in content_id_index and "zzzz-9" not in content_id_index
+    assert content_id_index.contains(content_ids=["aaaa-3", "aaaa-30", "0000", "ffff-2"]).tolist() == [
+        True,
+        False,
+        False,
+        True,
+    ]
+
+    pickled = pickle.dumps(content_id_index)
+    assert len(pickled) < 1_000
+    assert dict(pickle.loads(pickled)) == dict(content_id_index)
+
+    _write_content_id_index(directory=tmp_path, content_id_to_usage_dandiset_path=dict(), source={"url": "x"})
+    empty_index = _ContentIDIndex(directory=tmp_path)
+    assert len(empty_index) == 0
+    assert "ffff-2" not in empty_index
+    assert empty_index.contains(content_ids=["ffff-2"]).tolist() == [False]
+
+
+@pytest.mark.ai_generated
+def test_get_content_id_index_revalidates_remote_mapping(tmp_path: pathlib.Path) -> None:
+    """An unchanged remote mapping is not downloaded again, and the copy in the cache is used while offline."""
+    import requests
+
+    url = "https://example.com/mapping.json.gz"
+    response = _make_fake_gz_response({"abcdef01": {"000001": "sub-1/sub-1.nwb"}})
+    response.headers = {"ETag": '"v1"', "Last-Modified": "Wed, 01 Jan 2025 00:00:00 GMT"}
+    module = "dandi_s3_log_extraction.summarize._generate_dandiset_summaries"
+    with patch(f"{module}.requests.get", return_value=response) as mock_get:
+        assert dict(_get_content_id_index(content_id_to_usage_dandiset_path_url=url, cache_directory=tmp_path)) == {
+            "abcdef01": "sub-1/sub-1.nwb"
+        }
+        mock_get.assert_called_once_with(url, headers=dict())
+
+        mock_get.return_value = MagicMock(status_code=304)
+        assert "abcdef01" in _get_content_id_index(content_id_to_usage_dandiset_path_url=url, cache_directory=tmp_path)
+        assert mock_get.call_args.kwargs["headers"] == {
+            "If-None-Match": '"v1"',
+            "If-Modified-Since": "Wed, 01 Jan 2025 00:00:00 GMT",
+        }
+
+        mock_get.side_effect = requests.ConnectionError()
+        with pytest.warns(UserWarning, match="using the copy of the content ID mapping in the cache"):
+            content_id_index = _get_content_id_index(
+                content_id_to_usage_dandiset_path_url=url, cache_directory=tmp_path
+            )
+        assert "abcdef01" in content_id_index
+
+        # Another mapping has no copy in the cache yet
+        with pytest.raises(requests.ConnectionError):
+            _get_content_id_index(content_id_to_usage_dandiset_path_url=f"{url}?v=2", cache_directory=tmp_path)
+
+
+@pytest.mark.ai_generated
+@pytest.mark.parametrize("as_file_url", [False, True])
+def test_get_content_id_index_reads_local_mapping(tmp_path: pathlib.Path, as_file_url: bool) -> None:
+    """A local mapping, compressed or not, is only read again once it changes."""
+    mapping_file_path = tmp_path / "mapping.json.gz"
+    mapping_file_path.write_bytes(gzip.compress(json.dumps({"abcdef01": {"000001": "sub-1/sub-1.nwb"}}).encode()))
+    url = mapping_file_path.as_uri() if as_file_url else str(mapping_file_path)
+    cache_directory = tmp_path / "cache"
+
+    with patch("dandi_s3_log_extraction.summarize._generate_dandiset_summaries.requests.get") as mock_get:
+        assert dict(
+            _get_content_id_index(content_id_to_usage_dandiset_path_url=url, cache_directory=cache_directory)
+        ) == {"abcdef01": "sub-1/sub-1.nwb"}
+        with patch(
+            "dandi_s3_log_extraction.summarize._generate_dandiset_summaries._write_content_id_index"
+        ) as mock_write:
+            _get_content_id_index(content_id_to_usage_dandiset_path_url=url, cache_directory=cache_directory)
+            mock_write.assert_not_called()
+
+        mapping_file_path.write_text(json.dumps({"abcdef02": {"000002": "sub-2/sub-2.nwb"}}))
+        assert dict(
+            _get_content_id_index(content_id_to_usage_dandiset_path_url=url, cache_directory=cache_directory)
+        ) == {"abcdef02": "sub-2/sub-2.nwb"}
+    mock_get.assert_not_called()
+
+
+# ─── Dandiset listing ────────────────────────────────────────────────────────
+
+
+@pytest.mark.ai_generated
+def test_get_dandiset_ids_reuses_recent_listing(tmp_path: pathlib.Path) -> None:
+    """A listing is reused until it is older than the maximum age, or at any age if the API cannot be reached."""
+    import requests
+
+    mock_client = MagicMock()
+    mock_client.get_dandisets.return_value = [MagicMock(identifier="000001"), MagicMock(identifier="000002")]
+    with patch("dandi.dandiapi.DandiAPIClient", return_value=mock_client) as mock_client_cls:
+        assert _get_dandiset_ids(api_url=None, cache_directory=tmp_path, max_age_hours=1) == ["000001", "000002"]
+        mock_client.get_dandisets.return_value = [MagicMock(identifier="000003")]
+        assert _get_dandiset_ids(api_url=None, cache_directory=tmp_path, max_age_hours=1) == ["000001", "000002"]
+        mock_client_cls.assert_called_once_with(api_url=None)
+
+        # Listings of another server are not shared
+        assert _get_dandiset_ids(api_url="https://api.example.com", cache_directory=tmp_path, max_age_hours=1) == [
+            "000003"
+        ]
+        assert _get_dandiset_ids(api_url="https://api.example.com", cache_directory=tmp_path, max_age_hours=0) == [
+            "000003"
+        ]
+        assert mock_client_cls.call_count == 3
+
+        mock_client.get_dandisets.side_effect = requests.ConnectionError()
+        with pytest.warns(UserWarning, match="using the list of Dandisets in the cache"):
+            dandiset_ids = _get_dandiset_ids(
+                api_url="https://api.example.com", cache_directory=tmp_path, max_age_hours=0
+            )
+        assert dandiset_ids == ["000003"]
+        with pytest.raises(requests.ConnectionError):
+            _get_dandiset_ids(api_url="https://other.example.com", cache_directory=tmp_path, max_age_hours=0)
+
+
+@pytest.mark.ai_generated
+def test_generate_dandiset_summaries_offline_uses_dandisets_of_mapping(tmp_path: pathlib.Path) -> None:
+    """Offline runs neither request the mapping nor list the Dandisets, which are taken from the mapping instead."""
+    content_map = {
+        "abcdef01-0000": {"000002": "sub-1/sub-1_ephys.nwb"},
+        "abcdef02-0000": {"000001": "sub-2/sub-2_image.ome.zarr", "000003": "sub-2/sub-2_image.ome.zarr"},
+    }
+    module = "dandi_s3_log_extraction.summarize._generate_dandiset_summaries"
+    with (
+        patch(f"{module}.requests.get", return_value=_make_fake_gz_response(content_map)) as mock_get,
+        patch("dandi.dandiapi.DandiAPIClient") as mock_client_cls,
+        patch(f"{module}._summarize_dandiset") as mock_summarize,
+    ):
+        with pytest.raises(RuntimeError, match="no copy of the content ID mapping"):
+            dandi_s3_log_extraction.summarize.generate_dandiset_summaries(
+                cache_directory=tmp_path, workers=1, offline=True
+            )
+
+        dandi_s3_log_extraction.summarize.generate_dandiset_summaries(
+            cache_directory=tmp_path, workers=1, unassociated=True
+        )
+        mock_get.reset_mock()
+        mock_summarize.reset_mock()
+        dandi_s3_log_extraction.summarize.generate_dandiset_summaries(
+            cache_directory=tmp_path, workers=1, offline=True, skip=["000002"]
+        )
+
+    mock_get.assert_not_called()
+    mock_client_cls.assert_not_called()
+    assert [call.kwargs["dandiset_id"] for call in mock_summarize.call_args_list] == ["000001"]
+
+
+# ─── blob references ─────────────────────────────────────────────────────────
+
+
+@pytest.mark.ai_generated
+def test_blob_references_derive_directories_in_order(tmp_path: pathlib.Path) -> None:
+    """Blobs are grouped by Dandiset in order of first appearance, and their directories follow the bucket layout."""
+    blob_references = _build_blob_references(
+        extraction_directory=tmp_path,
+        dandiset_ids=["000002", "000001", "000002", "000001"],
+        content_ids=["abcdef01-0000", "fedcba02-0000", "abcdef03-0000", "fedcba04-0000"],
+        is_zarr=[False, True, False, False],
+    )
+
+    assert list(blob_references) == ["000002", "000001"]
+    assert blob_references["000002"] == [
+        tmp_path / "blobs" / "abc" / "def" / "abcdef01-0000",
+        tmp_path / "blobs" / "abc" / "def" / "abcdef03-0000",
+    ]
+    blob_directories = blob_references["000001"]
+    assert len(blob_directories) == 2
+    assert blob_directories[0] == tmp_path / "zarr" / "fedcba02-0000"
+    assert list(blob_directories[1:]) == [tmp_path / "blobs" / "fed" / "cba" / "fedcba04-0000"]
+
+    assert blob_references.find_dandiset_ids(content_ids=["fedcba04-0000", "abcdef01-0000", "unknown"]) == {
+        "000001",
+        "000002",
+    }
+    assert blob_references.find_dandiset_ids(content_ids=["unknown"]) == set()
+
+
+@pytest.mark.ai_generated
+def test_blob_references_shards_pickle_only_their_content_ids(tmp_path: pathlib.Path) -> None:
+    """Each shard of a large Dandiset is a view that pickles its own content IDs, more compactly than paths."""
+    content_ids = [f"{index:08x}-0000-0000-0000-000000000000" for index in range(2_500)]
+    blob_references = _build_blob_references(
+        extraction_directory=tmp_path,
+        dandiset_ids=["undetermined"] * len(content_ids),
+        content_ids=content_ids,
+        is_zarr=[False] * len(content_ids),
+    )
+
+    tasks = _plan_summary_tasks(dandiset_id_to_blob_directories=blob_references)
+    shards = sorted(
+        (task.dandiset_id_to_blob_directories["undetermined"] for task in tasks), key=lambda shard: -len(shard)
+    )
+    assert [len(shard) for shard in shards] == [1_000, 1_000, 500]
+    assert [path.name for shard in shards for path in shard] == content_ids
+
+    unpickled_shard = pickle.loads(pickle.dumps(shards[-1]))
+    assert unpickled_shard == list(shards[-1])
+    assert len(pickle.dumps(shards[-1])) < len(pickle.dumps(list(shards[-1])))
+    assert len(pickle.dumps(shards[-1])) < len(pickle.dumps(blob_references)) / 4